@@ -1,10 +1,20 @@
 import asyncio
+import collections.abc
 import contextvars  # noqa
+import functools
 import inspect
+import json
 import logging
+import math
+import secrets
+import sys
+import time
 import typing
-from collections import ChainMap
+import weakref
+import zlib
+from collections import ChainMap, OrderedDict, deque
 from collections.abc import Coroutine
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from contextlib import AsyncExitStack, AbstractAsyncContextManager, asynccontextmanager, contextmanager
 from json import JSONDecodeError
 from types import FunctionType
@@ -13,6 +23,7 @@ from typing import List, Union, Any, Callable, Type, Optional, Dict, Sequence, A
 from pydantic import DictError  # noqa
 from pydantic import StrictStr, ValidationError
 from pydantic import BaseModel, BaseConfig
+from pydantic.error_wrappers import ErrorWrapper
 from pydantic.fields import ModelField, Field, Undefined
 from pydantic.main import ModelMetaclass  # noqa
 from fastapi.dependencies.models import Dependant
@@ -20,14 +31,19 @@ from fastapi.encoders import jsonable_encoder
 from fastapi.params import Depends
 from fastapi import FastAPI, Body
 from fastapi.dependencies.utils import solve_dependencies, get_dependant, get_flat_dependant, \
-    get_parameterless_sub_dependant
+    get_parameterless_sub_dependant, solve_generator, request_params_to_args, request_body_to_args, \
+    is_gen_callable, is_async_gen_callable, is_coroutine_callable
 from fastapi.exceptions import RequestValidationError, HTTPException
 from fastapi.routing import APIRoute, APIRouter, serialize_response
+from fastapi.utils import create_response_field
+from fastapi.security import SecurityScopes
 from starlette.background import BackgroundTasks
 from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
-from starlette.responses import Response, JSONResponse
-from starlette.routing import Match, request_response, compile_path
+from starlette.responses import Response, JSONResponse, StreamingResponse
+from starlette.routing import Match, request_response, compile_path, BaseRoute, NoMatchFound, WebSocketRoute
+from starlette.types import Scope, Receive, Send
+from starlette.websockets import WebSocket
 import fastapi.params
 import aiojobs
 
@@ -56,6 +72,29 @@ except ImportError:
     sentry_sdk = None
     sentry_transaction_from_function = None
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+if typing.TYPE_CHECKING:
+    from fastapi_jsonrpc.client import JsonRpcClient  # noqa
+
 
 class Params(fastapi.params.Body):
     def __init__(
@@ -96,28 +135,274 @@ class Params(fastapi.params.Body):
         )
 
 
-components = {}
+class AppDependency:
+    """Dependency resolved once per Entrypoint (on startup or on first use) and injected into every call
+
+    Resolved value is put into dependency cache, so this object itself is never called by FastAPI.
+    Use AppDepends to declare it.
+    """
+    def __init__(self, dependency: Callable[..., Any]):
+        self.dependency = dependency
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.dependency!r})'
+
+    async def __call__(self):
+        raise RuntimeError(f"{self!r} is not resolved by Entrypoint")
+
+
+# Wrappers are held weakly, they are referenced by dependants of routes
+_app_dependencies: typing.MutableMapping[Callable[..., Any], AppDependency] = weakref.WeakValueDictionary()
+
+
+class AppDepends(fastapi.params.Depends):
+    """Like Depends, but dependency is resolved once per Entrypoint and torn down on Entrypoint.shutdown
+
+    Dependency is resolved again when dependency_overrides are changed.
+    """
+    def __init__(self, dependency: Callable[..., Any]):
+        app_dependency = _app_dependencies.get(dependency)
+        if app_dependency is None:
+            app_dependency = _app_dependencies[dependency] = AppDependency(dependency)
+        super().__init__(dependency=app_dependency, use_cache=True)
+
+
+class CachedDependency:
+    """Dependency wrapper with in-process TTL cache of results keyed by declared inputs
+
+    Key is built from header, cookie, query, path, body params and sub-dependencies values of wrapped dependency
+    (results are not cached if values are unhashable), so wrapped dependency can't take Request, Response
+    and other request bound params directly. BaseError raised by wrapped dependency
+    is cached for errors_ttl seconds, every call raises new instance of it.
+
+    dependency_overrides for wrapped dependency replace wrapper too (and bypass cache),
+    see CachedDependencyOverrides. Use CachedDepends to declare it.
+    """
+    def __init__(
+        self,
+        dependency: Callable[..., Any],
+        *,
+        ttl: float,
+        maxsize: int = 1024,
+        errors_ttl: float = None,
+    ):
+        if is_gen_callable(dependency) or is_async_gen_callable(dependency):
+            raise RuntimeError(f"Yield dependency {dependency!r} can't be cached")
+        self.dependency = dependency
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.errors_ttl = errors_ttl
+        self.is_coroutine = is_coroutine_callable(dependency)
+        self.cache: typing.MutableMapping[Any, typing.Tuple[float, bool, Any]] = OrderedDict()
+
+        # FastAPI must see params of wrapped dependency
+        self.__signature__ = inspect.signature(dependency)
+        self.__globals__ = getattr(dependency, '__globals__', {})
+
+        dependant = get_dependant(path='', call=dependency)
+        for param_name in (
+            dependant.request_param_name,
+            dependant.websocket_param_name,
+            dependant.response_param_name,
+            dependant.background_tasks_param_name,
+            dependant.security_scopes_param_name,
+        ):
+            if param_name is not None:
+                # Such params are not part of cache key, result of one caller would be returned to everyone
+                raise RuntimeError(f"Dependency {dependency!r} with param {param_name!r} can't be cached")
+        params = (
+            dependant.path_params + dependant.query_params + dependant.header_params + dependant.cookie_params
+            + dependant.body_params
+        )
+        self.key_params = [param.name for param in params]
+        self.key_params.extend(sub_dependant.name for sub_dependant in dependant.dependencies if sub_dependant.name)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.dependency!r}, ttl={self.ttl!r})'
+
+    async def call(self, kwargs: dict) -> Any:
+        if self.is_coroutine:
+            return await self.dependency(**kwargs)
+        return await run_in_threadpool(self.dependency, **kwargs)
+
+    async def __call__(self, **kwargs):
+        key = tuple(kwargs.get(name) for name in self.key_params)
+        try:
+            hash(key)
+        except TypeError:
+            return await self.call(kwargs)
+
+        now = time.monotonic()
+        entry = self.cache.get(key)
+        if entry is not None:
+            expires_at, is_error, value = entry
+            if expires_at > now:
+                self.cache.move_to_end(key)
+                if is_error:
+                    # Cached error is shared by concurrent calls, so it is raised as new instance
+                    error_cls, data = value
+                    raise error_cls(data=data)
+                return value
+            del self.cache[key]
+
+        try:
+            value = await self.call(kwargs)
+        except BaseError as error:
+            if self.errors_ttl:
+                self.put(key, now + self.errors_ttl, True, (type(error), error.raw_data))
+            raise
+
+        self.put(key, now + self.ttl, False, value)
+        return value
+
+    def put(self, key, expires_at: float, is_error: bool, value: Any):
+        self.cache[key] = (expires_at, is_error, value)
+        self.cache.move_to_end(key)
+        while len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+
+    def clear(self):
+        self.cache.clear()
+
+
+# Wrappers are held weakly, they are referenced by dependants of routes
+_cached_dependencies: typing.MutableMapping[tuple, CachedDependency] = weakref.WeakValueDictionary()
+
+
+class CachedDepends(fastapi.params.Depends):
+    """Like Depends, but results are cached for ttl seconds, see CachedDependency"""
+    def __init__(
+        self,
+        dependency: Callable[..., Any],
+        *,
+        ttl: float,
+        maxsize: int = 1024,
+        errors_ttl: float = None,
+    ):
+        key = (dependency, ttl, maxsize, errors_ttl)
+        cached_dependency = _cached_dependencies.get(key)
+        if cached_dependency is None:
+            cached_dependency = _cached_dependencies[key] = CachedDependency(
+                dependency, ttl=ttl, maxsize=maxsize, errors_ttl=errors_ttl,
+            )
+        super().__init__(dependency=cached_dependency, use_cache=True)
+
+
+class CachedDependencyOverrides(collections.abc.Mapping):
+    """dependency_overrides where override of dependency wrapped by CachedDepends replaces its wrappers too"""
+    def __init__(self, overrides: typing.Mapping[Callable[..., Any], Callable[..., Any]]):
+        self.overrides = overrides
+
+    def __getitem__(self, key):
+        if isinstance(key, CachedDependency) and key not in self.overrides:
+            return self.overrides[key.dependency]
+        return self.overrides[key]
+
+    def __iter__(self):
+        return iter(self.overrides)
+
+    def __len__(self):
+        return len(self.overrides)
+
+
+class CachedDependencyOverridesProvider:
+    """dependency_overrides_provider with dependency_overrides wrapped by CachedDependencyOverrides"""
+    def __init__(self, provider: Any):
+        self.provider = provider
+
+    @property
+    def dependency_overrides(self) -> CachedDependencyOverrides:
+        return CachedDependencyOverrides(getattr(self.provider, 'dependency_overrides', None) or {})
+
+
+# Models are held weakly, so models of discarded entrypoints/apps do not stay here forever
+components: typing.MutableMapping[typing.Tuple[str, str], type] = weakref.WeakValueDictionary()
+
+_global_components = components
+
+_components_fingerprints: typing.MutableMapping[type, tuple] = weakref.WeakKeyDictionary()
+
 
+def _field_info_fingerprint(field_info) -> tuple:
+    state = {name: getattr(field_info, name, None) for name in getattr(field_info, '__slots__', ())}
+    state.update(getattr(field_info, '__dict__', {}))
+    return (type(field_info), ) + tuple((name, repr(value)) for name, value in sorted(state.items()))
 
-def component_name(name: str, module: str = None):
+
+def component_fingerprint(model: type) -> tuple:
+    """Structural fingerprint of model, cached per model class
+
+    Equal fingerprints mean equal schemas, much cheaper than schema generation
+    """
+    fingerprint = _components_fingerprints.get(model)
+    if fingerprint is not None:
+        return fingerprint
+
+    config = getattr(model, '__config__', None)
+    fingerprint = (
+        model.__doc__,
+        getattr(config, 'extra', None),
+        getattr(config, 'title', None),
+        repr(getattr(config, 'schema_extra', None)),
+        tuple(
+            (
+                name,
+                field.alias,
+                field.required,
+                field.outer_type_,
+                _field_info_fingerprint(field.field_info),
+            )
+            for name, field in getattr(model, '__fields__', {}).items()
+        ),
+    )
+    _components_fingerprints[model] = fingerprint
+    return fingerprint
+
+
+def is_same_component(existing: type, obj: type) -> bool:
+    if existing is obj:
+        return True
+    if component_fingerprint(existing) == component_fingerprint(obj):
+        return True
+    # Fingerprint is stricter than schema (validators, reprs), so confirm difference
+    return existing.schema() == obj.schema()
+
+
+def component_name(name: str, module: str = None, registry: typing.MutableMapping = None):
     """OpenAPI components must be unique by name"""
+    if registry is None:
+        registry = components
+
     def decorator(obj):
         obj.__name__ = name
         obj.__qualname__ = name
         if module is not None:
             obj.__module__ = module  # see: pydantic.schema.get_long_model_name
         key = (obj.__name__, obj.__module__)
-        if key in components:
-            if components[key].schema() != obj.schema():
+        existing = registry.get(key)
+        if existing is not None:
+            if not is_same_component(existing, obj):
                 raise RuntimeError(
-                    f"Different models with the same name detected: {obj!r} != {components[key]}"
+                    f"Different models with the same name detected: {obj!r} != {existing}"
                 )
-            return components[key]
-        components[key] = obj
+            return existing
+        registry[key] = obj
         return obj
     return decorator
 
 
+def get_caller_module_name(depth: int = 1) -> Optional[str]:
+    """Cheap replacement of inspect.getmodule(inspect.stack()[depth][0]).__name__
+
+    inspect.stack() reads source lines for every frame on the stack, we only need globals of one frame
+    """
+    frame = sys._getframe(depth + 1) if hasattr(sys, '_getframe') else None  # noqa
+    if frame is None:
+        module = inspect.getmodule(inspect.stack()[depth + 1][0])
+        return module.__name__ if module is not None else None
+    return frame.f_globals.get('__name__')
+
+
 def is_scope_child(owner: type, child: type):
     return (
         (
@@ -334,6 +619,21 @@ class InternalError(BaseError):
     MESSAGE = "Internal error"
 
 
+class ServerBusy(BaseError):
+    """Server is shutting down and does not accept calls, retry later"""
+    CODE = -32010
+    MESSAGE = "Server busy"
+
+
+class RemoteError(BaseError):
+    """Error received from remote side or storage, with code unknown to this process"""
+
+    def __init__(self, code: int, message: str, data=None):
+        self.CODE = code
+        self.MESSAGE = message
+        super().__init__(data)
+
+
 class NoContent(Exception):
     pass
 
@@ -372,6 +672,18 @@ class JsonRpcRequest(BaseModel):
         extra = 'forbid'
 
 
+# Call options outside of params, e.g. {"idempotency_key": ...}, accepted by idempotent methods only
+request_meta_field = ModelField(
+    name='meta',
+    type_=dict,
+    class_validators={},
+    default=None,
+    required=False,
+    model_config=BaseConfig,
+    field_info=Field(None),
+)
+
+
 @component_name(f'_Response')
 class JsonRpcResponse(BaseModel):
     jsonrpc: StrictStr = Field('2.0', const=True, example='2.0')
@@ -382,6 +694,340 @@ class JsonRpcResponse(BaseModel):
         extra = 'forbid'
 
 
+def body_too_large_error(max_body_bytes: int) -> InvalidRequest:
+    return InvalidRequest(data={'errors': [
+        {'loc': (), 'type': 'value_error.body_too_large', 'msg': f"request body exceeds {max_body_bytes} bytes"}
+    ]})
+
+
+def batch_too_large_error(max_batch_size: int) -> InvalidRequest:
+    return InvalidRequest(data={'errors': [
+        {'loc': (), 'type': 'value_error.batch_too_large', 'msg': f"rpc call with more than {max_batch_size} requests"}
+    ]})
+
+
+def subscriptions_not_supported_error() -> InvalidRequest:
+    return InvalidRequest(data={'errors': [
+        {'loc': (), 'type': 'value_error.subscription', 'msg': "subscriptions require persistent connection"}
+    ]})
+
+
+def subscription_notification_error() -> InvalidRequest:
+    return InvalidRequest(data={'errors': [
+        {'loc': ('id',), 'type': 'value_error.subscription', 'msg': "subscription requires request id"}
+    ]})
+
+
+def subscriptions_limit_error(max_subscriptions: int) -> InvalidRequest:
+    return InvalidRequest(data={'errors': [
+        {'loc': (), 'type': 'value_error.subscription', 'msg': f"connection has {max_subscriptions} subscriptions"}
+    ]})
+
+
+def idempotency_key_reused_error() -> InvalidRequest:
+    return InvalidRequest(data={'errors': [
+        {'loc': (), 'type': 'value_error.idempotency_key', 'msg': "idempotency key is reused with other params"}
+    ]})
+
+
+def loads_limited_batch(body: bytes, max_batch_size: int) -> Any:
+    """Same as json.loads, but batch items are decoded one by one and decoding stops after max_batch_size items"""
+    s = body.decode(json.detect_encoding(body))
+    match_ws = json.decoder.WHITESPACE.match
+
+    idx = match_ws(s, 0).end()
+    if not s.startswith('[', idx):
+        return json.loads(s)
+
+    decoder = json.JSONDecoder()
+    items = []
+    idx = match_ws(s, idx + 1).end()
+    if s.startswith(']', idx):
+        idx += 1
+    else:
+        while True:
+            item, idx = decoder.raw_decode(s, idx)
+            items.append(item)
+            if len(items) > max_batch_size:
+                raise batch_too_large_error(max_batch_size)
+            idx = match_ws(s, idx).end()
+            if s.startswith(',', idx):
+                idx = match_ws(s, idx + 1).end()
+            elif s.startswith(']', idx):
+                idx += 1
+                break
+            else:
+                raise JSONDecodeError("Expecting ',' delimiter", s, idx)
+
+    idx = match_ws(s, idx).end()
+    if idx != len(s):
+        raise JSONDecodeError("Extra data", s, idx)
+    return items
+
+
+def unsupported_content_encoding_error(content_encoding: str) -> InvalidRequest:
+    return InvalidRequest(data={'errors': [
+        {'loc': (), 'type': 'value_error.content_encoding', 'msg': f"unsupported content encoding: {content_encoding}"}
+    ]})
+
+
+class StreamCompressor:
+    """Incremental compressor.
+
+    flush() emits everything compressed so far, so that client can decode data sent before
+    (e.g. after each item of streaming response), finish() ends compressed stream.
+    """
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def flush(self) -> bytes:
+        raise NotImplementedError
+
+    def finish(self) -> bytes:
+        raise NotImplementedError
+
+
+class ZlibCompressor(StreamCompressor):
+    def __init__(self, wbits: int, level: int = 6):
+        self.compressobj = zlib.compressobj(level, zlib.DEFLATED, wbits)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressobj.compress(data)
+
+    def flush(self) -> bytes:
+        return self.compressobj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self.compressobj.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor(StreamCompressor):
+    def __init__(self, quality: int = 4):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.process(data)
+
+    def flush(self) -> bytes:
+        return self.compressor.flush()
+
+    def finish(self) -> bytes:
+        return self.compressor.finish()
+
+
+class ZstdCompressor(StreamCompressor):
+    def __init__(self, level: int = 3):
+        self.compressobj = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressobj.compress(data)
+
+    def flush(self) -> bytes:
+        return self.compressobj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self.compressobj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+class StreamDecompressor:
+    """Incremental decoder of compressed stream.
+
+    decompress(data, max_length) stops decoding soon after max_length bytes are produced,
+    so output of max_length bytes or more means that input may be not decoded entirely
+    and decompressor must not be used anymore. Zero max_length means unlimited output.
+    """
+
+    def decompress(self, data: bytes, max_length: int = 0) -> bytes:
+        raise NotImplementedError
+
+    @property
+    def eof(self) -> bool:
+        """End of compressed stream is reached"""
+        raise NotImplementedError
+
+
+class ZlibDecompressor(StreamDecompressor):
+    def __init__(self, wbits: int):
+        self.decompressobj = zlib.decompressobj(wbits)
+
+    def decompress(self, data: bytes, max_length: int = 0) -> bytes:
+        # input is left in unconsumed_tail only when max_length is reached
+        data = self.decompressobj.decompress(data, max_length)
+        if self.decompressobj.unused_data:
+            raise ValueError("data after end of compressed stream")
+        return data
+
+    @property
+    def eof(self) -> bool:
+        return self.decompressobj.eof
+
+
+class BrotliDecompressor(StreamDecompressor):
+    def __init__(self):
+        self.decompressor = brotli.Decompressor()
+
+    def decompress(self, data: bytes, max_length: int = 0) -> bytes:
+        if not max_length:
+            return self.decompressor.process(data)
+        chunks = [self.decompressor.process(data, output_buffer_limit=max_length)]
+        size = len(chunks[0])
+        while size < max_length and not self.decompressor.can_accept_more_data():
+            chunk = self.decompressor.process(b'', output_buffer_limit=max_length - size)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+        return b''.join(chunks)
+
+    @property
+    def eof(self) -> bool:
+        return self.decompressor.is_finished()
+
+
+class ZstdDecompressor(StreamDecompressor):
+    # zstandard decompressobj has no output limit, so input is fed by small slices:
+    # each block (up to 128KiB of output) takes at least 4 bytes of input
+    input_slice_size = 64
+
+    def __init__(self):
+        self.decompressobj = zstandard.ZstdDecompressor().decompressobj()
+
+    def decompress(self, data: bytes, max_length: int = 0) -> bytes:
+        if not max_length:
+            return self.decompressobj.decompress(data)
+        chunks = []
+        size = 0
+        view = memoryview(data)
+        for offset in range(0, len(view), self.input_slice_size):
+            chunk = self.decompressobj.decompress(view[offset:offset + self.input_slice_size])
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= max_length:
+                break
+        return b''.join(chunks)
+
+    @property
+    def eof(self) -> bool:
+        return self.decompressobj.eof
+
+
+class ContentCoding:
+    """Content-Encoding codec.
+
+    compressor_factory() returns StreamCompressor,
+    decompressor_factory() returns StreamDecompressor.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        compressor_factory: Callable[[], StreamCompressor],
+        decompressor_factory: Callable[[], StreamDecompressor],
+    ):
+        self.name = name
+        self.compressor_factory = compressor_factory
+        self.decompressor_factory = decompressor_factory
+
+    def compressor(self) -> StreamCompressor:
+        return self.compressor_factory()
+
+    def decompressor(self) -> StreamDecompressor:
+        return self.decompressor_factory()
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = self.compressor()
+        return compressor.compress(data) + compressor.finish()
+
+
+# Supported codings by Content-Encoding names, brotli and zstd are available if their packages are installed
+content_codings: Dict[str, ContentCoding] = {
+    'gzip': ContentCoding(
+        'gzip',
+        functools.partial(ZlibCompressor, 31),
+        functools.partial(ZlibDecompressor, 31),
+    ),
+    'deflate': ContentCoding(
+        'deflate',
+        functools.partial(ZlibCompressor, 15),
+        functools.partial(ZlibDecompressor, 15),
+    ),
+}
+
+if brotli is not None:
+    content_codings['br'] = ContentCoding(
+        'br',
+        BrotliCompressor,
+        BrotliDecompressor,
+    )
+
+if zstandard is not None:
+    content_codings['zstd'] = ContentCoding(
+        'zstd',
+        ZstdCompressor,
+        ZstdDecompressor,
+    )
+
+
+def parse_accept_header(header: str) -> Dict[str, float]:
+    """Accept or Accept-Encoding header as {value: qvalue}"""
+    accepted = {}
+    for item in header.split(','):
+        name, _, params = item.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        qvalue = 1.0
+        for param in params.split(';'):
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    qvalue = float(value)
+                except ValueError:
+                    qvalue = 0.0
+        accepted[name] = qvalue
+    return accepted
+
+
+class BodyCodec:
+    """Binary alternative to JSON for request and response bodies, negotiated by Content-Type and Accept.
+
+    JSON-RPC envelopes are the same, loads() raises one of decode_errors for malformed body.
+    """
+
+    def __init__(
+        self,
+        media_type: str,
+        loads: Callable[[bytes], Any],
+        dumps: Callable[[Any], bytes],
+        decode_errors: typing.Tuple[Type[Exception], ...] = (ValueError, ),
+    ):
+        self.media_type = media_type
+        self.loads = loads
+        self.dumps = dumps
+        self.decode_errors = decode_errors
+
+
+# Supported body codecs by media types, JSON is always used by default
+body_codecs: Dict[str, BodyCodec] = {}
+
+if msgpack is not None:
+    for _media_type in ('application/msgpack', 'application/x-msgpack'):
+        body_codecs[_media_type] = BodyCodec(
+            _media_type,
+            msgpack.unpackb,
+            msgpack.packb,
+            (ValueError, msgpack.UnpackException),
+        )
+
+if cbor2 is not None:
+    body_codecs['application/cbor'] = BodyCodec(
+        'application/cbor',
+        cbor2.loads,
+        cbor2.dumps,
+    )
+
+
 def invalid_request_from_validation_error(exc: ValidationError) -> InvalidRequest:
     return InvalidRequest(data={'errors': exc.errors()})
 
@@ -435,6 +1081,274 @@ def clone_dependant(dependant: Dependant) -> Dependant:
     return new_dependant
 
 
+class LayeredDependencyCache(ChainMap):
+    """Dependency cache view: reads through shared cache, writes go to own small overlay"""
+    def __bool__(self):
+        # solve_dependencies replaces falsy cache with new dict
+        return True
+
+    def update(self, other=(), **kwargs):
+        # solve_dependencies does dependency_cache.update(sub_dependency_cache) with the same cache object
+        if other is self and not kwargs:
+            return
+        super().update(other, **kwargs)
+
+
+def iter_error_wrappers(errors) -> typing.Iterator[ErrorWrapper]:
+    if isinstance(errors, ErrorWrapper):
+        yield errors
+    else:
+        for error in errors:
+            yield from iter_error_wrappers(error)
+
+
+def iter_dependants(dependant: Dependant) -> typing.Iterator[Dependant]:
+    yield dependant
+    for sub_dependant in dependant.dependencies:
+        yield from iter_dependants(sub_dependant)
+
+
+class ConcurrentDependencySolver:
+    """Replacement of fastapi solve_dependencies which solves independent sub-dependencies concurrently
+
+    Sub-dependencies of one dependant may depend on each other only through the dependency cache,
+    so they are solved concurrently and same cached dependency is solved only once.
+    Yield dependencies of every branch are entered into own exit stack, these stacks are entered in declaration
+    order, so teardown order is the same as with sequential solving.
+
+    First leading sub-dependencies of solved dependant are solved before the others (e.g. rate limits).
+
+    Context variables set by dependencies are not visible to the method (every branch is separate task).
+    """
+    GENERATOR = 'generator'
+    COROUTINE = 'coroutine'
+    SYNC = 'sync'
+
+    def __init__(self, dependant: Dependant, leading: int = 0):
+        self.dependant = dependant
+        self.dependants = {id(dependant)}
+        self.leading = leading
+        self.kinds: Dict[int, str] = {}
+        self.with_generators: Dict[int, bool] = {}
+        self.use_background_tasks = False
+        self._prepare(dependant)
+
+    def add_dependant(self, dependant: Dependant):
+        """Prepare one more dependant for solving (e.g. with the same sub-dependencies)"""
+        self.dependants.add(id(dependant))
+        self._prepare(dependant)
+
+    def _prepare(self, dependant: Dependant) -> bool:
+        key = id(dependant)
+        if key in self.kinds:
+            return self.with_generators[key]
+        self.kinds[key] = self.get_call_kind(dependant.call)
+        with_generators = self.kinds[key] == self.GENERATOR
+        for sub_dependant in dependant.dependencies:
+            with_generators = self._prepare(sub_dependant) or with_generators
+        self.with_generators[key] = with_generators
+        if dependant.background_tasks_param_name:
+            self.use_background_tasks = True
+        return with_generators
+
+    @classmethod
+    def get_call_kind(cls, call) -> Optional[str]:
+        if call is None:
+            return None
+        if is_gen_callable(call) or is_async_gen_callable(call):
+            return cls.GENERATOR
+        if is_coroutine_callable(call):
+            return cls.COROUTINE
+        return cls.SYNC
+
+    async def __call__(
+        self,
+        *,
+        request: Union[Request, WebSocket],
+        dependant: Dependant,
+        body: Optional[Dict[str, Any]] = None,
+        background_tasks: Optional[BackgroundTasks] = None,
+        response: Optional[Response] = None,
+        dependency_overrides_provider: Optional[Any] = None,
+        dependency_cache: Optional[dict] = None,
+    ):
+        if id(dependant) not in self.dependants or getattr(dependency_overrides_provider, 'dependency_overrides', None):
+            # Overrides replace dependants on the fly, there is no prepared graph for them
+            return await solve_dependencies(
+                request=request,
+                dependant=dependant,
+                body=body,
+                background_tasks=background_tasks,
+                response=response,
+                dependency_overrides_provider=dependency_overrides_provider,
+                dependency_cache=dependency_cache,
+            )
+
+        if response is None:
+            response = Response()
+            del response.headers["content-length"]
+            response.status_code = None  # type: ignore
+        if background_tasks is None and self.use_background_tasks:
+            background_tasks = BackgroundTasks()
+        if dependency_cache is None:
+            dependency_cache = {}
+
+        solving = _ConcurrentSolving(
+            request=request,
+            body=body,
+            background_tasks=background_tasks,
+            response=response,
+            dependency_cache=dependency_cache,
+        )
+        values, errors = await self._solve(solving, dependant, request.scope.get('fastapi_astack'))
+        return values, errors, background_tasks, response, dependency_cache
+
+    async def _solve(self, solving: '_ConcurrentSolving', dependant: Dependant, stack: Optional[AsyncExitStack]):
+        values: Dict[str, Any] = {}
+        errors = []
+
+        sub_dependants = dependant.dependencies
+        leading = self.leading if id(dependant) in self.dependants else 0
+        results = await self._solve_subs(solving, sub_dependants[:leading], stack)
+        results += await self._solve_subs(solving, sub_dependants[leading:], stack)
+
+        for sub_dependant, (solved, sub_errors) in zip(sub_dependants, results):
+            if sub_errors:
+                errors.extend(sub_errors)
+                continue
+            if sub_dependant.name is not None:
+                values[sub_dependant.name] = solved
+
+        request = solving.request
+        path_values, path_errors = request_params_to_args(dependant.path_params, request.path_params)
+        query_values, query_errors = request_params_to_args(dependant.query_params, request.query_params)
+        header_values, header_errors = request_params_to_args(dependant.header_params, request.headers)
+        cookie_values, cookie_errors = request_params_to_args(dependant.cookie_params, request.cookies)
+        values.update(path_values)
+        values.update(query_values)
+        values.update(header_values)
+        values.update(cookie_values)
+        errors += path_errors + query_errors + header_errors + cookie_errors
+        if dependant.body_params:
+            body_values, body_errors = await request_body_to_args(
+                required_params=dependant.body_params,
+                received_body=solving.body,
+            )
+            values.update(body_values)
+            errors.extend(body_errors)
+        if getattr(dependant, 'http_connection_param_name', None):
+            values[dependant.http_connection_param_name] = request
+        if dependant.request_param_name and isinstance(request, Request):
+            values[dependant.request_param_name] = request
+        elif dependant.websocket_param_name and isinstance(request, WebSocket):
+            values[dependant.websocket_param_name] = request
+        if dependant.background_tasks_param_name:
+            values[dependant.background_tasks_param_name] = solving.background_tasks
+        if dependant.response_param_name:
+            values[dependant.response_param_name] = solving.response
+        if dependant.security_scopes_param_name:
+            values[dependant.security_scopes_param_name] = SecurityScopes(scopes=dependant.security_scopes)
+
+        return values, errors
+
+    async def _solve_subs(
+        self,
+        solving: '_ConcurrentSolving',
+        sub_dependants: List[Dependant],
+        stack: Optional[AsyncExitStack],
+    ) -> list:
+        if len(sub_dependants) == 1:
+            return [await self._solve_sub(solving, sub_dependants[0], stack)]
+        if not sub_dependants:
+            return []
+
+        branch_stacks = [
+            AsyncExitStack() if self.with_generators.get(id(sub_dependant), True) else None
+            for sub_dependant in sub_dependants
+        ]
+        results = await asyncio.gather(
+            *(
+                self._solve_sub(solving, sub_dependant, branch_stack)
+                for sub_dependant, branch_stack in zip(sub_dependants, branch_stacks)
+            ),
+            return_exceptions=True,
+        )
+        # Deterministic teardown order regardless of which branch was solved first
+        for branch_stack in branch_stacks:
+            if branch_stack is not None:
+                assert isinstance(stack, AsyncExitStack)
+                await stack.enter_async_context(branch_stack)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    async def _solve_sub(self, solving: '_ConcurrentSolving', dependant: Dependant, stack: Optional[AsyncExitStack]):
+        cache_key = dependant.cache_key
+        dependency_cache = solving.dependency_cache
+
+        if dependant.use_cache:
+            if cache_key in dependency_cache:
+                return dependency_cache[cache_key], []
+            pending = solving.pending.get(cache_key)
+            if pending is not None:
+                return await pending
+            pending = solving.pending[cache_key] = asyncio.get_running_loop().create_future()
+        else:
+            pending = None
+
+        try:
+            result = await self._call(solving, dependant, stack)
+        except BaseException as exc:
+            if pending is not None:
+                solving.pending.pop(cache_key, None)
+                pending.set_exception(exc)
+                pending.exception()  # mark as retrieved, waiters re-raise it
+            raise
+
+        if pending is not None:
+            solving.pending.pop(cache_key, None)
+            pending.set_result(result)
+        return result
+
+    async def _call(self, solving: '_ConcurrentSolving', dependant: Dependant, stack: Optional[AsyncExitStack]):
+        sub_values, sub_errors = await self._solve(solving, dependant, stack)
+        if sub_errors:
+            return None, sub_errors
+
+        call = dependant.call
+        kind = self.kinds.get(id(dependant)) or self.get_call_kind(call)
+        if kind == self.GENERATOR:
+            assert isinstance(stack, AsyncExitStack)
+            solved = await solve_generator(call=call, stack=stack, sub_values=sub_values)
+        elif kind == self.COROUTINE:
+            solved = await call(**sub_values)
+        else:
+            solved = await run_in_threadpool(call, **sub_values)
+
+        if dependant.cache_key not in solving.dependency_cache:
+            solving.dependency_cache[dependant.cache_key] = solved
+        return solved, []
+
+
+class _ConcurrentSolving:
+    """State of one ConcurrentDependencySolver call"""
+    def __init__(
+        self,
+        request: Union[Request, WebSocket],
+        body: Optional[Dict[str, Any]],
+        background_tasks: Optional[BackgroundTasks],
+        response: Response,
+        dependency_cache: dict,
+    ):
+        self.request = request
+        self.body = body
+        self.background_tasks = background_tasks
+        self.response = response
+        self.dependency_cache = dependency_cache
+        self.pending: Dict[Any, asyncio.Future] = {}
+
+
 def insert_dependencies(target: Dependant, dependencies: Sequence[Depends] = None):
     assert target.path
     if not dependencies:
@@ -446,7 +1360,13 @@ def insert_dependencies(target: Dependant, dependencies: Sequence[Depends] = Non
         )
 
 
-def make_request_model(name, module, body_params: List[ModelField]):
+def make_request_model(
+    name,
+    module,
+    body_params: List[ModelField],
+    registry: typing.MutableMapping = None,
+    with_meta: bool = False,
+):
     whole_params_list = [p for p in body_params if isinstance(p.field_info, Params)]
     if len(whole_params_list):
         if len(whole_params_list) > 1:
@@ -473,7 +1393,7 @@ def make_request_model(name, module, body_params: List[ModelField]):
                 f.field_info.extra['example'] = jsonable_encoder(example)
             _JsonRpcRequestParams.__fields__[f.name] = f
 
-        _JsonRpcRequestParams = component_name(f'_Params[{name}]', module)(_JsonRpcRequestParams)
+        _JsonRpcRequestParams = component_name(f'_Params[{name}]', module, registry)(_JsonRpcRequestParams)
 
         params_field = ModelField(
             name='params',
@@ -494,51 +1414,240 @@ def make_request_model(name, module, body_params: List[ModelField]):
             extra = 'forbid'
 
     _Request.__fields__[params_field.name] = params_field
+    if with_meta:
+        _Request.__fields__['meta'] = request_meta_field
 
-    _Request = component_name(f'_Request[{name}]', module)(_Request)
+    _Request = component_name(f'_Request[{name}]', module, registry)(_Request)
 
     return _Request
 
 
-class JsonRpcContext:
+class IdempotencyStore:
+    """Bounded in-process store of method outcomes by idempotency key, see MethodRoute idempotent.
+
+    Duplicate of in-flight call waits for the original, duplicate of completed call gets its result
+    (or BaseError) without execution. Outcomes are kept for ttl seconds, unhandled exceptions are not kept.
+    """
     def __init__(
         self,
-        entrypoint: 'Entrypoint',
-        raw_request: Any,
-        http_request: Request,
-        background_tasks: BackgroundTasks,
-        http_response: Response,
-        json_rpc_request_class: Type[JsonRpcRequest] = JsonRpcRequest,
-        method_route: typing.Optional['MethodRoute'] = None,
+        *,
+        ttl: float = 86400,
+        maxsize: int = 10000,
     ):
-        self.entrypoint: Entrypoint = entrypoint
-        self.raw_request: Any = raw_request
-        self.http_request: Request = http_request
-        self.background_tasks: BackgroundTasks = background_tasks
-        self.http_response: Response = http_response
-        self.request_class: Type[JsonRpcRequest] = json_rpc_request_class
-        self.method_route: typing.Optional[MethodRoute] = method_route
-        self._raw_response: Optional[dict] = None
-        self.exception: Optional[Exception] = None
-        self.is_unhandled_exception: bool = False
-        self.exit_stack: Optional[AsyncExitStack] = None
-        self.jsonrpc_context_token: Optional[contextvars.Token] = None
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.entries: typing.MutableMapping[Any, typing.Tuple[float, str, asyncio.Future]] = OrderedDict()
+
+    async def call(self, key: Any, fingerprint: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Outcome of func or of earlier call with the same key, fingerprint of params must be the same"""
+        now = time.monotonic()
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] <= now:
+            del self.entries[key]
+            entry = None
+
+        if entry is not None:
+            _, entry_fingerprint, fut = entry
+            if entry_fingerprint != fingerprint:
+                raise idempotency_key_reused_error()
+            try:
+                if fut.done():
+                    return fut.result()
+                # Cancelled duplicate must not cancel the original
+                return await asyncio.shield(fut)
+            except BaseError as error:
+                raise error.with_traceback(None)
+
+        fut = asyncio.get_running_loop().create_future()
+        self.entries[key] = (now + self.ttl, fingerprint, fut)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
 
-    def on_raw_response(
-        self,
-        raw_response: Union[dict, Exception],
-    ):
-        exception = None
-        is_unhandled_exception = False
+        try:
+            result = await func()
+        except BaseError as error:
+            fut.set_exception(error)
+            # Retrieved, there may be no duplicates
+            fut.exception()
+            raise
+        except BaseException:
+            if self.entries.get(key, (None, None, None))[2] is fut:
+                del self.entries[key]
+            fut.set_exception(InternalError())
+            fut.exception()
+            raise
 
-        if isinstance(raw_response, Exception):
-            exception = raw_response
-            if isinstance(exception, BaseError):
-                raw_response = exception.get_resp()
-            elif isinstance(exception, HTTPException):
-                raw_response = None
-            else:
-                raw_response = InternalError().get_resp()
+        fut.set_result(result)
+        return result
+
+    def clear(self):
+        self.entries.clear()
+
+
+def depends_idempotency_scope(scope: Callable[..., Any]) -> Depends:
+    """Dependency keeping value of scope dependency in context of call, see MethodRoute idempotency_scope"""
+    async def set_idempotency_scope(value: Any = Depends(scope)):
+        get_jsonrpc_context().idempotency_scope = value
+
+    return Depends(set_idempotency_scope, use_cache=False)
+
+
+class RateLimitBackend:
+    """Storage of token buckets, implement it with shared storage to limit calls across processes"""
+
+    async def acquire(self, key: Any, rate: float, burst: float, cost: float = 1) -> float:
+        """Take cost tokens from bucket of key, returns 0 if taken or seconds until bucket has enough tokens"""
+        raise NotImplementedError
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """In-process token buckets split into shards by key hash.
+
+    Each shard is ordered by last use, so buckets idle long enough to be full again are evicted
+    from the head of shard without scanning all keys.
+    """
+
+    def __init__(self, *, shards: int = 16):
+        self.shards: List[typing.MutableMapping[Any, typing.Tuple[float, float, float]]] = [
+            OrderedDict() for _ in range(shards)
+        ]
+
+    def get_shard(self, key: Any) -> typing.MutableMapping[Any, typing.Tuple[float, float, float]]:
+        return self.shards[hash(key) % len(self.shards)]
+
+    async def acquire(self, key: Any, rate: float, burst: float, cost: float = 1) -> float:
+        now = time.monotonic()
+        shard = self.get_shard(key)
+        entry = shard.get(key)
+        if entry is None:
+            tokens = burst
+        else:
+            tokens, updated_at, _ = entry
+            tokens = min(burst, tokens + (now - updated_at) * rate)
+
+        retry_after = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            retry_after = (cost - tokens) / rate
+
+        # Bucket is full again (same as absent) after full_at
+        shard[key] = (tokens, now, now + (burst - tokens) / rate)
+        shard.move_to_end(key)
+        self.evict_idle(shard, now)
+        return retry_after
+
+    @staticmethod
+    def evict_idle(shard: typing.MutableMapping[Any, typing.Tuple[float, float, float]], now: float):
+        while shard:
+            key, (_, _, full_at) = next(iter(shard.items()))
+            if full_at > now:
+                break
+            del shard[key]
+
+    def clear(self):
+        for shard in self.shards:
+            shard.clear()
+
+
+class RateLimitExceeded(BaseError):
+    """Too many calls, retry after data.retry_after seconds"""
+    CODE = -32011
+    MESSAGE = "Rate limit exceeded"
+
+    class DataModel(BaseModel):
+        retry_after: float
+
+
+class RateLimit:
+    """Token bucket limit of rate calls per second with burst capacity, per value of key dependency.
+
+    Without key all callers share one bucket. Bucket of method limit is per method,
+    bucket of entrypoint limit is common for all its methods. Every call in batch takes own token.
+    Limited calls fail with RateLimitExceeded and Retry-After header.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        *,
+        burst: float = None,
+        key: Callable[..., Any] = None,
+        backend: RateLimitBackend = None,
+    ):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(rate, 1)
+        self.key = key
+        self.backend = backend if backend is not None else MemoryRateLimitBackend()
+
+    async def check(self, scope: str, key: Any, response: Response):
+        try:
+            hash(key)
+        except TypeError:
+            key = repr(key)
+        retry_after = await self.backend.acquire((scope, key), self.rate, self.burst)
+        if retry_after > 0:
+            response.headers['Retry-After'] = str(math.ceil(retry_after))
+            raise RateLimitExceeded(data={'retry_after': round(retry_after, 3)})
+
+    def depends(self, scope: str) -> Depends:
+        """Dependency taking token of scope bucket, never cached to count every call"""
+        limit = self
+
+        if self.key is None:
+            async def check_rate_limit(response: Response):
+                await limit.check(scope, None, response)
+        else:
+            async def check_rate_limit(response: Response, key: Any = Depends(self.key)):
+                await limit.check(scope, key, response)
+
+        return Depends(check_rate_limit, use_cache=False)
+
+
+class JsonRpcContext:
+    def __init__(
+        self,
+        entrypoint: 'Entrypoint',
+        raw_request: Any,
+        http_request: Request,
+        background_tasks: BackgroundTasks,
+        http_response: Response,
+        json_rpc_request_class: Type[JsonRpcRequest] = JsonRpcRequest,
+        method_route: typing.Optional['MethodRoute'] = None,
+        in_process: bool = False,
+    ):
+        self.entrypoint: Entrypoint = entrypoint
+        self.raw_request: Any = raw_request
+        self.http_request: Request = http_request
+        self.background_tasks: BackgroundTasks = background_tasks
+        self.http_response: Response = http_response
+        self.request_class: Type[JsonRpcRequest] = json_rpc_request_class
+        self.method_route: typing.Optional[MethodRoute] = method_route
+        # Call by Entrypoint.call, result is returned as is
+        self.in_process: bool = in_process
+        self._raw_response: Optional[dict] = None
+        self.exception: Optional[Exception] = None
+        self.is_unhandled_exception: bool = False
+        self.exit_stack: Optional[AsyncExitStack] = None
+        self.jsonrpc_context_token: Optional[contextvars.Token] = None
+        # Value of idempotency_scope dependency of method, see depends_idempotency_scope
+        self.idempotency_scope: Any = None
+
+    def on_raw_response(
+        self,
+        raw_response: Union[dict, Exception],
+    ):
+        exception = None
+        is_unhandled_exception = False
+
+        if isinstance(raw_response, Exception):
+            exception = raw_response
+            if isinstance(exception, BaseError):
+                raw_response = exception.get_resp()
+            elif isinstance(exception, HTTPException):
+                raw_response = None
+            else:
+                raw_response = InternalError().get_resp()
                 is_unhandled_exception = True
 
         if raw_response is not None:
@@ -562,8 +1671,12 @@ class JsonRpcContext:
 
     @cached_property
     def request(self) -> JsonRpcRequest:
+        raw_request = self.raw_request
+        if isinstance(raw_request, dict) and 'meta' in raw_request and 'meta' not in self.request_class.__fields__:
+            # meta is validated by method, see MethodRoute.get_meta
+            raw_request = {key: value for key, value in raw_request.items() if key != 'meta'}
         try:
-            return self.request_class.validate(self.raw_request)
+            return self.request_class.validate(raw_request)
         except DictError:
             raise InvalidRequest(data={'errors': [{
                 'loc': (),
@@ -591,6 +1704,9 @@ class JsonRpcContext:
     async def _handle_exception(self, reraise=True):
         try:
             yield
+        except asyncio.CancelledError:
+            # Exception subclass before python 3.8, cancelled call has no response
+            raise
         except Exception as exception:
             if exception is not self.exception:
                 try:
@@ -634,6 +1750,158 @@ class JsonRpcContext:
 JsonRpcMiddleware = Callable[[JsonRpcContext], AbstractAsyncContextManager]
 
 
+class CircuitOpen(BaseError):
+    """Method is unavailable while its downstream is failing, retry after data.retry_after seconds"""
+    CODE = -32012
+    MESSAGE = "Circuit open"
+
+    class DataModel(BaseModel):
+        circuit: str
+        retry_after: float
+
+
+class CircuitBreaker:
+    """Method middleware failing fast with CircuitOpen while calls fail, see MethodRoute circuit_breaker.
+
+    Failures are unhandled exceptions and failure_errors (timeouts by default) of JsonRpcContext.
+    Circuit opens when at least min_calls calls within last window seconds have failure_rate of failures,
+    after open_timeout seconds up to half_open_calls probe calls are allowed: circuit closes when
+    all of them succeed and opens again on first failure. One breaker may guard several methods
+    using the same downstream, name is method name by default.
+    """
+
+    def __init__(
+        self,
+        name: str = None,
+        *,
+        failure_rate: float = 0.5,
+        min_calls: int = 10,
+        window: float = 30,
+        open_timeout: float = 30,
+        half_open_calls: int = 1,
+        failure_errors: Sequence[Type[Exception]] = (asyncio.TimeoutError, ),
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.window = window
+        self.open_timeout = open_timeout
+        self.half_open_calls = half_open_calls
+        self.failure_errors = tuple(failure_errors)
+        self.state = 'closed'
+        self.opened_at: Optional[float] = None
+        # Outcomes of calls within window as (finished_at, failed)
+        self.outcomes: typing.Deque[typing.Tuple[float, bool]] = deque()
+        self.window_failures = 0
+        self.half_open_in_flight = 0
+        self.half_open_successes = 0
+        # Metrics
+        self.calls = 0
+        self.failed_calls = 0
+        self.timeouts = 0
+        self.rejected_calls = 0
+        self.transitions: Dict[str, int] = {}
+
+    def __call__(self, ctx: JsonRpcContext) -> AbstractAsyncContextManager:
+        return self.guard(ctx)
+
+    @asynccontextmanager
+    async def guard(self, ctx: JsonRpcContext):
+        probe = self.before_call()
+        try:
+            yield
+        except asyncio.CancelledError:
+            if probe:
+                self.half_open_in_flight -= 1
+            raise
+        except Exception as exc:
+            if isinstance(exc, asyncio.TimeoutError):
+                self.timeouts += 1
+            self.after_call(probe, ctx.is_unhandled_exception or isinstance(exc, self.failure_errors))
+            raise
+        self.after_call(probe, False)
+
+    def before_call(self) -> bool:
+        """Raises CircuitOpen if call is not allowed, returns true for probe call"""
+        if self.state == 'open':
+            retry_after = self.opened_at + self.open_timeout - time.monotonic()
+            if retry_after > 0:
+                self.reject(retry_after)
+            self.transition('half_open')
+        if self.state == 'half_open':
+            if self.half_open_in_flight >= self.half_open_calls:
+                self.reject(0)
+            self.half_open_in_flight += 1
+            return True
+        return False
+
+    def after_call(self, probe: bool, failed: bool):
+        self.calls += 1
+        if failed:
+            self.failed_calls += 1
+
+        if probe:
+            self.half_open_in_flight -= 1
+            if self.state != 'half_open':
+                return
+            if failed:
+                self.transition('open')
+            else:
+                self.half_open_successes += 1
+                if self.half_open_successes >= self.half_open_calls:
+                    self.transition('closed')
+            return
+
+        if self.state != 'closed':
+            # Call started before circuit was opened
+            return
+
+        now = time.monotonic()
+        self.outcomes.append((now, failed))
+        if failed:
+            self.window_failures += 1
+        while self.outcomes and self.outcomes[0][0] <= now - self.window:
+            _, expired_failed = self.outcomes.popleft()
+            if expired_failed:
+                self.window_failures -= 1
+
+        if len(self.outcomes) >= self.min_calls and self.window_failures >= self.failure_rate * len(self.outcomes):
+            self.transition('open')
+
+    def reject(self, retry_after: float):
+        self.rejected_calls += 1
+        raise CircuitOpen(data={'circuit': self.name, 'retry_after': round(retry_after, 3)})
+
+    def transition(self, state: str):
+        transition = f'{self.state}->{state}'
+        self.transitions[transition] = self.transitions.get(transition, 0) + 1
+        if state == 'open':
+            logger.warning("Circuit %s: %s, %r", self.name, transition, self.metrics())
+        else:
+            logger.info("Circuit %s: %s", self.name, transition)
+
+        self.state = state
+        if state == 'open':
+            self.opened_at = time.monotonic()
+        elif state == 'half_open':
+            self.half_open_successes = 0
+        elif state == 'closed':
+            self.outcomes.clear()
+            self.window_failures = 0
+
+    def metrics(self) -> dict:
+        return {
+            'state': self.state,
+            'calls': self.calls,
+            'failed_calls': self.failed_calls,
+            'timeouts': self.timeouts,
+            'rejected_calls': self.rejected_calls,
+            'window_calls': len(self.outcomes),
+            'window_failures': self.window_failures,
+            'transitions': dict(self.transitions),
+        }
+
+
 _jsonrpc_context = contextvars.ContextVar('_fastapi_jsonrpc__jsonrpc_context')
 
 
@@ -657,27 +1925,66 @@ class MethodRoute(APIRoute):
         func: Union[FunctionType, Coroutine],
         *,
         result_model: Type[Any] = None,
+        item_model: Type[Any] = None,
         name: str = None,
         errors: List[Type[BaseError]] = None,
         dependencies: Sequence[Depends] = None,
         response_class: Type[Response] = JSONResponse,
         request_class: Type[JsonRpcRequest] = JsonRpcRequest,
         middlewares: Sequence[JsonRpcMiddleware] = None,
+        concurrent_dependencies: bool = None,
+        idempotent: bool = False,
+        idempotency_scope: Callable[..., Any] = None,
+        shared_idempotency_keys: bool = None,
+        rate_limit: RateLimit = None,
+        circuit_breaker: CircuitBreaker = None,
         **kwargs,
     ):
         name = name or func.__name__
+        # Async generator result is list of items, see StreamingResult
+        streaming = inspect.isasyncgenfunction(func)
+        if streaming and idempotent:
+            raise RuntimeError(f"Async generator {func!r} can't be idempotent method")
+        if streaming:
+            item_model = item_model or get_iterator_item_type(func.__annotations__.get('return')) or Any
+            result_model = result_model or List[item_model]
         result_model = result_model or func.__annotations__.get('return')
 
         _, path_format, _ = compile_path(path)
         func_dependant = get_dependant(path=path_format, call=func)
         insert_dependencies(func_dependant, dependencies)
         insert_dependencies(func_dependant, entrypoint.common_dependencies)
+        if idempotency_scope is None:
+            idempotency_scope = entrypoint.idempotency_scope
+        if shared_idempotency_keys is None:
+            shared_idempotency_keys = entrypoint.shared_idempotency_keys
+        if idempotent and idempotency_scope is None and not shared_idempotency_keys:
+            # Any caller knowing the key would get stored outcome of another caller
+            raise RuntimeError(
+                f"Idempotent method {name!r} requires idempotency_scope, or explicit shared_idempotency_keys"
+            )
+        if idempotent and idempotency_scope is not None:
+            insert_dependencies(func_dependant, [depends_idempotency_scope(idempotency_scope)])
+        # Limits are checked before other dependencies of each call, concurrent solver solves them first
+        rate_limits = []
+        if entrypoint.rate_limit is not None:
+            entrypoint_scope = f'entrypoint:{entrypoint.entrypoint_route.path}'
+            rate_limits.append(entrypoint.rate_limit.depends(entrypoint_scope))
+        if rate_limit is not None:
+            rate_limits.append(rate_limit.depends(f'method:{name}'))
+        insert_dependencies(func_dependant, rate_limits)
         fix_query_dependencies(func_dependant)
         flat_dependant = get_flat_dependant(func_dependant, skip_repeats=True)
 
-        _Request = make_request_model(name, func.__module__, flat_dependant.body_params)
+        _Request = make_request_model(
+            name,
+            func.__module__,
+            flat_dependant.body_params,
+            entrypoint.components,
+            with_meta=idempotent,
+        )
 
-        @component_name(f'_Response[{name}]', func.__module__)
+        @component_name(f'_Response[{name}]', func.__module__, entrypoint.components)
         class _Response(BaseModel):
             jsonrpc: StrictStr = Field('2.0', const=True, example='2.0')
             id: Union[StrictStr, int] = Field(None, example=0)
@@ -716,10 +2023,65 @@ class MethodRoute(APIRoute):
         self.func = func
         self.func_dependant = func_dependant
         self.entrypoint = entrypoint
-        self.middlewares = middlewares or []
+        self.streaming = streaming
+        self.item_model = item_model
+        if item_model is None or item_model is Any:
+            self.item_field = None
+        else:
+            self.item_field = create_response_field(name='result', type_=item_model)
+        middlewares = list(middlewares or [])
+        if circuit_breaker is not None:
+            if circuit_breaker.name is None:
+                circuit_breaker.name = name
+            # Open circuit is checked before other middlewares and dependencies
+            middlewares.insert(0, circuit_breaker)
+        self.circuit_breaker = circuit_breaker
+        self.middlewares = middlewares
         self.app = request_response(self.handle_http_request)
         self.request_class = request_class
         self.errors = errors or []
+        # Calls with idempotency key are executed once, see IdempotencyStore and get_idempotency_key.
+        # Keys are per value of idempotency_scope dependency (e.g. principal),
+        # keys shared by all callers are allowed only with shared_idempotency_keys
+        self.idempotent = idempotent
+        self.idempotency_scope = idempotency_scope
+        self.shared_idempotency_keys = shared_idempotency_keys
+
+        # Params of same method items in batch are validated by one call, see validate_batch_params
+        self.batch_params_field: Optional[ModelField] = None
+        self.batch_params_whole = False
+        self.func_dependant_without_body: Optional[Dependant] = None
+        body_in_sub_dependencies = any(
+            sub_dependant.body_params
+            for dependency in func_dependant.dependencies
+            for sub_dependant in iter_dependants(dependency)
+        )
+        if func_dependant.body_params and not body_in_sub_dependencies:
+            self.batch_params_whole = any(isinstance(p.field_info, Params) for p in func_dependant.body_params)
+            if self.batch_params_whole:
+                params_type = func_dependant.body_params[0].outer_type_
+            else:
+                params_type = _Request.__fields__['params'].type_
+            self.batch_params_field = ModelField(
+                name='params',
+                type_=List[params_type],
+                class_validators={},
+                default=None,
+                required=True,
+                model_config=BaseConfig,
+                field_info=Field(...),
+            )
+            self.func_dependant_without_body = clone_dependant(func_dependant)
+            self.func_dependant_without_body.body_params = []
+
+        if concurrent_dependencies is None:
+            concurrent_dependencies = entrypoint.concurrent_dependencies
+        if concurrent_dependencies:
+            self.dependencies_solver = ConcurrentDependencySolver(func_dependant, leading=len(rate_limits))
+            if self.func_dependant_without_body is not None:
+                self.dependencies_solver.add_dependant(self.func_dependant_without_body)
+        else:
+            self.dependencies_solver = solve_dependencies
 
     def __hash__(self):
         return hash(self.path)
@@ -731,11 +2093,81 @@ class MethodRoute(APIRoute):
             and self.func == other.func
         )
 
+    def validate_batch_params(self, params_list: List[dict]) -> List[Optional[typing.Tuple[dict, list]]]:
+        """Validate params of many requests to this method by one call
+
+        Returns (values, errors) for every request, errors are in the same form as from solve_dependencies.
+        None means the request must be validated as usual.
+        """
+        if self.batch_params_whole:
+            bodies = params_list
+        else:
+            # solve_dependencies treats None as missing value
+            bodies = [{k: v for k, v in params.items() if v is not None} for params in params_list]
+
+        validated, errors = self.batch_params_field.validate(bodies, {}, loc='params')
+
+        if not errors:
+            if self.batch_params_whole:
+                return [({self.func_dependant.body_params[0].name: value}, []) for value in validated]
+            names = [field.name for field in self.func_dependant.body_params]
+            return [({name: getattr(value, name) for name in names}, []) for value in validated]
+
+        # Values of valid requests are not returned by validation if there are errors
+        result: List[Optional[typing.Tuple[dict, list]]] = [None] * len(params_list)
+        for error in iter_error_wrappers(errors):
+            loc = error.loc_tuple()
+            index = loc[1]
+            if result[index] is None:
+                result[index] = ({}, [])
+            result[index][1].append(ErrorWrapper(error.exc, loc=('body', ) + loc[2:]))
+        return result
+
+    def get_meta(self, ctx: JsonRpcContext) -> dict:
+        """Validated meta of request, only idempotent methods (or custom request_class with meta) accept it"""
+        if 'meta' in ctx.request_class.__fields__:
+            return getattr(ctx.request, 'meta', None) or {}
+        if not isinstance(ctx.raw_request, dict) or 'meta' not in ctx.raw_request:
+            return {}
+        if not self.idempotent:
+            raise InvalidRequest(data={'errors': [
+                {'loc': ('meta', ), 'type': 'value_error.extra', 'msg': "extra fields not permitted"}
+            ]})
+        meta, errors = request_meta_field.validate(ctx.raw_request['meta'], {}, loc=('meta', ))
+        if errors:
+            raise invalid_request_from_validation_error(ValidationError([errors], ctx.request_class))
+        return meta or {}
+
+    def get_idempotency_key(self, http_request: Request, ctx: JsonRpcContext, meta: dict) -> Optional[str]:
+        """Key from request meta {"idempotency_key": ...}, or from header combined with request id"""
+        key = meta.get('idempotency_key')
+        if key is not None:
+            return str(key)
+        key = http_request.headers.get(self.entrypoint.idempotency_header)
+        if key is not None:
+            # Header is common for all requests in batch
+            return f'{key}:{ctx.request.id}'
+        return None
+
+    def is_streamed(self, req: Any) -> bool:
+        """Result of single call may be streamed to client, notifications are not responded"""
+        return self.streaming and isinstance(req, dict) and 'id' in req
+
+    async def call_func(self, http_request: Request, values: dict) -> Any:
+        if self.streaming:
+            return self.func(**values)
+        return await call_sync_async(self.func, **values)
+
+    async def serialize_item(self, item: Any) -> Any:
+        if self.item_field is None:
+            return jsonable_encoder(item)
+        return await serialize_response(field=self.item_field, response_content=item)
+
     async def parse_body(self, http_request) -> Any:
-        try:
-            req = await http_request.json()
-        except JSONDecodeError:
-            raise ParseError()
+        req = await self.entrypoint.decode_body(
+            await self.entrypoint.read_body(http_request),
+            self.entrypoint.get_request_codec(http_request),
+        )
         return req
 
     async def handle_http_request(self, http_request: Request):
@@ -745,24 +2177,42 @@ class MethodRoute(APIRoute):
         del sub_response.headers["content-length"]
         sub_response.status_code = None  # type: ignore
 
+        response_codec = self.entrypoint.get_response_codec(http_request)
+
         try:
+            http_request = await self.entrypoint.read_request(http_request)
             body = await self.parse_body(http_request)
         except Exception as exc:
             resp = await self.entrypoint.handle_exception_to_resp(exc)
-            response = self.response_class(content=resp, background=background_tasks)
+            response = await self.entrypoint.make_response(
+                self.response_class, resp, background_tasks, codec=response_codec,
+            )
         else:
             try:
-                resp = await self.handle_body(http_request, background_tasks, sub_response, body)
+                resp = await self.handle_body(
+                    http_request, background_tasks, sub_response, body,
+                    stream_results=response_codec is None,
+                )
             except NoContent:
                 # no content for successful notifications
                 response = Response(media_type='application/json', background=background_tasks)
             else:
-                response = self.response_class(content=resp, background=background_tasks)
+                if is_streaming_resp(resp):
+                    response = self.entrypoint.make_streaming_response(http_request, resp, background_tasks)
+                else:
+                    # Response size is unknown before rendering, large requests usually have large responses
+                    response = await self.entrypoint.make_response(
+                        self.response_class, resp, background_tasks,
+                        offload=self.entrypoint.should_offload(len(await http_request.body())),
+                        codec=response_codec,
+                    )
 
         response.headers.raw.extend(sub_response.headers.raw)
         if sub_response.status_code:
             response.status_code = sub_response.status_code
 
+        await self.entrypoint.compress_response(http_request, response)
+
         return response
 
     async def handle_body(
@@ -771,6 +2221,7 @@ class MethodRoute(APIRoute):
         background_tasks: BackgroundTasks,
         sub_response: Response,
         body: Any,
+        stream_results: bool = False,
     ) -> dict:
         # Shared dependencies for all requests in one json-rpc batch request
         shared_dependencies_error = None
@@ -784,11 +2235,16 @@ class MethodRoute(APIRoute):
             shared_dependencies_error = error
             dependency_cache = None
 
-        resp = await self.handle_req_to_resp(
+        call = functools.partial(
+            self.handle_req_to_resp,
             http_request, background_tasks, sub_response, body,
             dependency_cache=dependency_cache,
             shared_dependencies_error=shared_dependencies_error,
         )
+        if stream_results and self.is_streamed(body):
+            resp = await self.entrypoint.admit_calls(body, functools.partial(self.entrypoint.run_result_stream, call))
+        else:
+            resp = await self.entrypoint.admit_calls(body, call)
 
         # No response for successful notifications
         has_content = 'error' in resp or 'id' in resp
@@ -804,7 +2260,8 @@ class MethodRoute(APIRoute):
         sub_response: Response,
         req: Any,
         dependency_cache: dict = None,
-        shared_dependencies_error: BaseError = None
+        shared_dependencies_error: BaseError = None,
+        result_stream: 'ResultStream' = None,
     ) -> dict:
         async with JsonRpcContext(
             entrypoint=self.entrypoint,
@@ -824,6 +2281,7 @@ class MethodRoute(APIRoute):
                 http_request, background_tasks, sub_response, ctx,
                 dependency_cache=dependency_cache,
                 shared_dependencies_error=shared_dependencies_error,
+                result_stream=result_stream,
             )
             ctx.on_raw_response(resp)
 
@@ -836,32 +2294,76 @@ class MethodRoute(APIRoute):
         sub_response: Response,
         ctx: JsonRpcContext,
         dependency_cache: dict = None,
-        shared_dependencies_error: BaseError = None
+        shared_dependencies_error: BaseError = None,
+        validated_params: typing.Tuple[dict, list] = None,
+        result_stream: 'ResultStream' = None,
     ):
         await ctx.enter_middlewares(self.middlewares)
 
+        meta = self.get_meta(ctx)
+
         if shared_dependencies_error:
             raise shared_dependencies_error
 
         # dependency_cache - there are shared dependencies, we pass them to each method, since
         # they are common to all methods in the batch.
         # But if the methods have their own dependencies, they are resolved separately.
-        dependency_cache = dependency_cache.copy()
+        dependency_cache = LayeredDependencyCache({}, dependency_cache)
 
-        values, errors, background_tasks, _, _ = await solve_dependencies(
+        if validated_params is None:
+            dependant = self.func_dependant
+            body = ctx.request.params
+        else:
+            # Params are already validated for the whole batch
+            dependant = self.func_dependant_without_body
+            body = None
+
+        values, errors, background_tasks, _, _ = await self.dependencies_solver(
             request=http_request,
-            dependant=self.func_dependant,
-            body=ctx.request.params,
+            dependant=dependant,
+            body=body,
             background_tasks=background_tasks,
             response=sub_response,
             dependency_overrides_provider=self.dependency_overrides_provider,
             dependency_cache=dependency_cache,
         )
 
+        if validated_params is not None:
+            params_values, params_errors = validated_params
+            values.update(params_values)
+            errors = errors + params_errors
+
         if errors:
             raise invalid_params_from_validation_error(RequestValidationError(errors))
 
-        result = await call_sync_async(self.func, **values)
+        idempotency_key = None
+        if self.idempotent and not ctx.in_process:
+            idempotency_key = self.get_idempotency_key(http_request, ctx, meta)
+        if idempotency_key is None:
+            result = await self.call_func(http_request, values)
+        else:
+            scope = ctx.idempotency_scope
+            try:
+                hash(scope)
+            except TypeError:
+                scope = repr(scope)
+            result = await self.entrypoint.idempotency_store.call(
+                (self.name, scope, idempotency_key),
+                json.dumps(ctx.request.params, sort_keys=True, default=repr),
+                functools.partial(self.call_func, http_request, values),
+            )
+
+        if ctx.in_process:
+            if self.streaming:
+                result = [item async for item in result]
+            return {'jsonrpc': '2.0', 'result': result}
+
+        if self.streaming:
+            result = StreamingResult(self, result)
+            if result_stream is not None:
+                # Items are validated while response is sent, call ends with the last item
+                return {'jsonrpc': '2.0', 'result': await result_stream.send(ctx, result)}
+            return {'jsonrpc': '2.0', 'result': await result.collect()}
 
         response = {
             'jsonrpc': '2.0',
@@ -881,117 +2383,561 @@ class MethodRoute(APIRoute):
         return resp
 
 
-class RequestShadow(Request):
-    def __init__(self, request: Request):
-        super().__init__(scope=ChainMap({}, request.scope))
-        self.request = request
+def get_iterator_item_type(annotation: Any) -> Any:
+    """Item type of AsyncIterator[X], AsyncIterable[X] or AsyncGenerator[X, ...] annotation"""
+    origin = getattr(annotation, '__origin__', None)
+    if origin in (
+        collections.abc.AsyncIterator, collections.abc.AsyncIterable, collections.abc.AsyncGenerator,
+    ) and annotation.__args__:
+        return annotation.__args__[0]
+    return None
 
-    async def stream(self):
-        async for body in self.request.stream():
-            yield body
 
-    async def body(self):
-        return await self.request.body()
+class StreamingResult:
+    """Result of method returning async generator, items are validated and encoded one by one while iterating"""
 
-    async def json(self):
-        return await self.request.json()
+    def __init__(self, route: MethodRoute, iterator: typing.AsyncIterator):
+        self.route = route
+        self.iterator = iterator
 
-    async def form(self):
-        return await self.request.form()
+    async def __aiter__(self):
+        async for item in self.iterator:
+            yield await self.route.serialize_item(item)
+
+    async def collect(self) -> list:
+        return [item async for item in self]
+
+
+class ResultStream:
+    """Streamed result of single call, see Entrypoint.iter_streaming_resp.
+
+    Call runs as job of entrypoint scheduler, so that JsonRpcContext and middlewares of the call stay entered
+    while items are sent and errors of iteration are handled as errors of the call.
+    Response is started with the first item, so errors before it are responded as usual.
+    Call is cancelled when its response ends (see ResultStreamResponse) or doesn't take an item
+    for send_timeout seconds.
+    """
+
+    end = object()
+
+    def __init__(self, send_timeout: float = None):
+        loop = asyncio.get_running_loop()
+        self.started: asyncio.Future = loop.create_future()
+        # Call is done or cancelled
+        self.finished: asyncio.Future = loop.create_future()
+        self.items: asyncio.Queue = asyncio.Queue()
+        self.job: Optional[aiojobs.Job] = None
+        self.send_timeout = send_timeout
+        # Error of call after response is started
+        self.error: Optional[dict] = None
+
+    async def run(self, scheduler: aiojobs.Scheduler, call: Callable[..., Awaitable[dict]]) -> dict:
+        """Response of call(result_stream=self), its result is this stream once the first item is produced"""
+        self.job = await scheduler.spawn(self.run_call(call(result_stream=self)))
+        # Job.wait is shielded, cancelled waiter doesn't cancel the job
+        waiter = asyncio.ensure_future(self.job.wait())
+        try:
+            await asyncio.wait([self.started, waiter], return_when=asyncio.FIRST_COMPLETED)
+        except BaseException:
+            waiter.cancel()
+            await self.close()
+            raise
+        if self.started.done():
+            waiter.cancel()
+            return self.started.result()
+        resp = waiter.result()
+        if resp is None:
+            # Job is closed before it's done (e.g. by shutdown)
+            self.set_finished()
+            raise asyncio.CancelledError
+        return resp
+
+    async def run_call(self, call: Awaitable[dict]) -> dict:
+        resp = None
+        try:
+            resp = await call
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            if not self.started.done():
+                raise
+            resp = InternalError().get_resp()
+        finally:
+            if resp is not None and 'error' in resp:
+                self.error = resp['error']
+            self.items.put_nowait(self.end)
+            self.set_finished()
+        return resp
+
+    async def send(self, ctx: JsonRpcContext, result: StreamingResult) -> Any:
+        """Pass items to response, result of call is this stream or empty list if there are no items"""
+        async for item in result:
+            self.items.put_nowait(item)
+            if not self.started.done():
+                self.started.set_result({'jsonrpc': '2.0', 'id': ctx.request.id, 'result': self})
+            # Next item is produced while previous one is sent
+            try:
+                await asyncio.wait_for(self.items.join(), self.send_timeout)
+            except asyncio.TimeoutError:
+                # Response doesn't take items (e.g. it's never sent), call is abandoned as if client is gone
+                raise asyncio.CancelledError
+        if not self.started.done():
+            return []
+        return self
+
+    def set_finished(self):
+        if not self.finished.done():
+            self.finished.set_result(None)
 
     async def close(self):
-        raise NotImplementedError
+        """Cancel call if it's still running (e.g. client is gone)"""
+        if self.job is not None:
+            await self.job.close()
+        self.set_finished()
 
-    async def is_disconnected(self):
-        return await self.request.is_disconnected()
+    async def __aiter__(self):
+        try:
+            while True:
+                item = await self.items.get()
+                self.items.task_done()
+                if item is self.end:
+                    break
+                yield item
+        finally:
+            await self.close()
+
+
+class ResultStreamResponse(StreamingResponse):
+    """Response with ResultStream, which is closed when response ends, even if it's never iterated"""
+    def __init__(self, result_stream: ResultStream, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.result_stream = result_stream
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.result_stream.close()
 
 
-class EntrypointRoute(APIRoute):
+def is_streaming_resp(resp: Any) -> bool:
+    return isinstance(resp, dict) and isinstance(resp.get('result'), ResultStream)
+
+
+class SubscriptionRoute(MethodRoute):
+    """Method returning async iterator, available over persistent connections only.
+
+    Result of call is subscription id, then items are pushed as notifications
+    {"method": <name>, "params": {"subscription": <id>, "result": <item>}} validated by item_model.
+    Dependencies with yield are closed when subscription ends.
+    """
+
     def __init__(
         self,
         entrypoint: 'Entrypoint',
         path: str,
+        func: Union[FunctionType, Coroutine],
         *,
-        name: str = None,
-        errors: List[Type[BaseError]] = None,
-        common_dependencies: Sequence[Depends] = None,
-        response_class: Type[Response] = JSONResponse,
-        request_class: Type[JsonRpcRequest] = JsonRpcRequest,
+        item_model: Type[Any] = None,
         **kwargs,
     ):
-        name = name or 'entrypoint'
+        item_model = item_model or get_iterator_item_type(func.__annotations__.get('return'))
+        super().__init__(entrypoint, path, func, result_model=str, item_model=item_model, **kwargs)
+        # Items are pushed as notifications instead of streaming result
+        self.streaming = False
 
-        _, path_format, _ = compile_path(path)
+    async def handle_req(
+        self,
+        http_request: Request,
+        background_tasks: BackgroundTasks,
+        sub_response: Response,
+        ctx: JsonRpcContext,
+        **kwargs,
+    ):
+        if 'jsonrpc_connection' not in http_request.scope:
+            raise subscriptions_not_supported_error()
+        if 'id' not in ctx.raw_request:
+            # Notification gets no subscription id, so it can't unsubscribe
+            raise subscription_notification_error()
+
+        exit_stack = AsyncExitStack()
+        http_request.scope['fastapi_astack'] = exit_stack
+        try:
+            return await super().handle_req(http_request, background_tasks, sub_response, ctx, **kwargs)
+        except BaseException:
+            await exit_stack.aclose()
+            raise
 
-        _Request = request_class
+    async def call_func(self, http_request: Request, values: dict) -> Any:
+        iterator = self.func(**values)
+        if inspect.isawaitable(iterator):
+            iterator = await iterator
+        connection: WebSocketConnection = http_request.scope['jsonrpc_connection']
+        try:
+            subscription = connection.subscribe(self, iterator, http_request.scope['fastapi_astack'])
+        except BaseError:
+            aclose = getattr(iterator, 'aclose', None)
+            if aclose is not None:
+                await aclose()
+            raise
+        http_request.scope['jsonrpc_subscriptions'].append(subscription)
+        return subscription.id
 
-        common_dependant = Dependant(path=path_format)
-        if common_dependencies:
-            insert_dependencies(common_dependant, common_dependencies)
-            fix_query_dependencies(common_dependant)
-            common_dependant = get_flat_dependant(common_dependant, skip_repeats=True)
 
-            if common_dependant.body_params:
-                _Request = make_request_model(name, entrypoint.callee_module, common_dependant.body_params)
+async def unsubscribe(
+    http_request: Request,
+    subscription: str = Body(..., example='0123456789abcdef'),
+) -> bool:
+    """Cancel subscription, false if there is no such subscription"""
+    connection = http_request.scope.get('jsonrpc_connection')
+    if connection is None:
+        raise subscriptions_not_supported_error()
+    return await connection.unsubscribe(subscription)
 
-        # This is only necessary for generating OpenAPI
-        def endpoint(__request__: _Request):
-            del __request__
 
-        responses = errors_responses(errors)
+class JobNotFound(BaseError):
+    """Background job does not exist or its state is expired"""
+    CODE = -32020
+    MESSAGE = "Job not found"
 
-        super().__init__(
-            path,
-            endpoint,
-            methods=['POST'],
-            name=name,
-            response_class=response_class,
-            response_model=JsonRpcResponse,
-            responses=responses,
-            **kwargs,
-        )
 
-        flat_dependant = get_flat_dependant(self.dependant, skip_repeats=True)
+class JobNotFinished(BaseError):
+    """Background job is pending or running, poll its status"""
+    CODE = -32021
+    MESSAGE = "Job not finished"
 
-        if len(flat_dependant.body_params) > 1:
-            body_params = [p for p in flat_dependant.body_params if p.type_ is not _Request]
-            raise RuntimeError(
-                f"Entrypoint shared dependencies can't use 'Body' parameters: "
-                f"params={body_params}"
-            )
 
-        if flat_dependant.query_params:
-            raise RuntimeError(
-                f"Entrypoint shared dependencies can't use 'Query' parameters: "
-                f"params={flat_dependant.query_params}"
-            )
+class JobCancelled(BaseError):
+    """Background job was cancelled"""
+    CODE = -32022
+    MESSAGE = "Job cancelled"
 
-        self.shared_dependant = clone_dependant(self.dependant)
 
-        # No shared 'Body' params, because each JSON-RPC request in batch has own body
-        self.shared_dependant.body_params = []
+class JobError(BaseModel):
+    code: int
+    message: str
+    data: Any = None
 
-        # Add dependencies and other parameters from common_dependant for correct OpenAPI generation
-        self.dependant.path_params.extend(common_dependant.path_params)
-        self.dependant.header_params.extend(common_dependant.header_params)
-        self.dependant.cookie_params.extend(common_dependant.cookie_params)
-        self.dependant.dependencies.extend(common_dependant.dependencies)
-        self.dependant.security_requirements.extend(common_dependant.security_requirements)
 
-        self.app = request_response(self.handle_http_request)
-        self.entrypoint = entrypoint
-        self.common_dependencies = common_dependencies
-        self.request_class = request_class
-        self.errors = errors or []
+class JobStatus(BaseModel):
+    id: str = Field(..., example='0123456789abcdef0123456789abcdef')
+    # pending, running, done, failed or cancelled
+    status: str = Field(..., example='running')
+    error: Optional[JobError] = None
 
-    def __hash__(self):
-        return hash(self.path)
 
-    def __eq__(self, other):
-        return (
-            isinstance(other, EntrypointRoute)
-            and self.path == other.path
-        )
+class JobStore:
+    """Storage of background job states (JSON-compatible dicts) expiring after ttl seconds.
+
+    Implement it with shared storage to poll jobs through any process.
+    """
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def set(self, job_id: str, state: dict, ttl: float) -> None:
+        raise NotImplementedError
+
+
+class MemoryJobStore(JobStore):
+    def __init__(self):
+        self.states: typing.MutableMapping[str, typing.Tuple[float, dict]] = OrderedDict()
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        entry = self.states.get(job_id)
+        if entry is None:
+            return None
+        expires_at, state = entry
+        if expires_at <= time.monotonic():
+            del self.states[job_id]
+            return None
+        return state
+
+    async def set(self, job_id: str, state: dict, ttl: float) -> None:
+        now = time.monotonic()
+        self.states[job_id] = (now + ttl, state)
+        self.states.move_to_end(job_id)
+        # Recently set states are at the end, so expired ones are usually at the beginning
+        while self.states:
+            key, (expires_at, _) = next(iter(self.states.items()))
+            if expires_at > now:
+                break
+            del self.states[key]
+
+
+class BackgroundMethodRoute(MethodRoute):
+    """Long-running method, result of call is job id and function runs in background.
+
+    Job state is kept in Entrypoint.job_store for job_ttl seconds and available with companion methods
+    '<name>.status', '<name>.result' and '<name>.cancel'. Dependencies with yield are closed when job ends.
+    """
+
+    def __init__(
+        self,
+        entrypoint: 'Entrypoint',
+        path: str,
+        func: Union[FunctionType, Coroutine],
+        *,
+        result_model: Type[Any] = None,
+        **kwargs,
+    ):
+        if inspect.isasyncgenfunction(func):
+            raise RuntimeError(f"Async generator {func!r} can't be background method")
+        job_result_model = result_model or func.__annotations__.get('return')
+        super().__init__(entrypoint, path, func, result_model=str, **kwargs)
+        self.job_result_model = job_result_model
+        if job_result_model is None or job_result_model is Any:
+            self.job_result_field = None
+        else:
+            self.job_result_field = create_response_field(name='result', type_=job_result_model)
+
+    async def handle_req(
+        self,
+        http_request: Request,
+        background_tasks: BackgroundTasks,
+        sub_response: Response,
+        ctx: JsonRpcContext,
+        **kwargs,
+    ):
+        exit_stack = AsyncExitStack()
+        http_request.scope['fastapi_astack'] = exit_stack
+        try:
+            return await super().handle_req(http_request, background_tasks, sub_response, ctx, **kwargs)
+        except BaseException:
+            await exit_stack.aclose()
+            raise
+
+    async def call_func(self, http_request: Request, values: dict) -> Any:
+        job_id = secrets.token_hex(16)
+        exit_stack = http_request.scope['fastapi_astack']
+        await self.set_job_state(job_id, 'pending')
+        scheduler = await self.entrypoint.get_jobs_scheduler()
+        job = await scheduler.spawn(self.run_job(job_id, values, exit_stack))
+        if not job.closed:
+            self.entrypoint.running_jobs[job_id] = (job, exit_stack)
+        return job_id
+
+    async def set_job_state(self, job_id: str, status: str, **state):
+        await self.entrypoint.job_store.set(
+            job_id,
+            {'id': job_id, 'method': self.name, 'status': status, **state},
+            self.entrypoint.job_ttl,
+        )
+
+    async def serialize_job_result(self, result: Any) -> Any:
+        if self.job_result_field is None:
+            return jsonable_encoder(result)
+        return await serialize_response(field=self.job_result_field, response_content=result)
+
+    async def run_job(self, job_id: str, values: dict, exit_stack: AsyncExitStack):
+        try:
+            await self.set_job_state(job_id, 'running')
+            async with exit_stack:
+                result = await call_sync_async(self.func, **values)
+            await self.set_job_state(job_id, 'done', result=await self.serialize_job_result(result))
+        except asyncio.CancelledError:
+            await self.set_job_state(job_id, 'cancelled')
+            raise
+        except BaseError as error:
+            await self.set_job_state(job_id, 'failed', error=error.get_resp()['error'])
+        except Exception as exc:
+            logger.exception(str(exc), exc_info=exc)
+            await self.set_job_state(job_id, 'failed', error=InternalError().get_resp()['error'])
+        finally:
+            self.entrypoint.running_jobs.pop(job_id, None)
+
+    async def get_job_state(self, job_id: str) -> dict:
+        state = await self.entrypoint.job_store.get(job_id)
+        if state is None or state.get('method') != self.name:
+            raise JobNotFound()
+        return state
+
+    def make_companion_methods(self) -> Dict[str, Callable]:
+        """Functions of '<name>.status', '<name>.result' and '<name>.cancel' methods"""
+        route = self
+
+        async def status(
+            job_id: str = Body(..., example='0123456789abcdef0123456789abcdef'),
+        ) -> JobStatus:
+            """Status of background job"""
+            return JobStatus.parse_obj(await route.get_job_state(job_id))
+
+        async def result(
+            job_id: str = Body(..., example='0123456789abcdef0123456789abcdef'),
+        ):
+            """Result of finished background job, error of failed job is raised"""
+            state = await route.get_job_state(job_id)
+            if state['status'] == 'done':
+                return state['result']
+            if state['status'] == 'failed':
+                error = state['error']
+                raise RemoteError(error['code'], error['message'], error.get('data'))
+            if state['status'] == 'cancelled':
+                raise JobCancelled()
+            raise JobNotFinished(data={'status': state['status']})
+
+        async def cancel(
+            job_id: str = Body(..., example='0123456789abcdef0123456789abcdef'),
+        ) -> bool:
+            """Cancel background job, false if it is already finished or runs in other process"""
+            await route.get_job_state(job_id)
+            return await route.entrypoint.cancel_job(job_id)
+
+        return {
+            'status': status,
+            'result': result,
+            'cancel': cancel,
+        }
+
+
+class RequestShadow(Request):
+    def __init__(self, request: Request):
+        super().__init__(scope=ChainMap({}, request.scope))
+        self.request = request
+
+    async def stream(self):
+        async for body in self.request.stream():
+            yield body
+
+    async def body(self):
+        return await self.request.body()
+
+    async def json(self):
+        return await self.request.json()
+
+    async def form(self):
+        return await self.request.form()
+
+    async def close(self):
+        raise NotImplementedError
+
+    async def is_disconnected(self):
+        return await self.request.is_disconnected()
+
+
+class DecodedBodyRequest(Request):
+    """Request with body already read from client, as if it was sent uncompressed"""
+
+    def __init__(self, request: Request, body: bytes):
+        headers = [
+            (name, value)
+            for name, value in request.scope['headers']
+            if name not in (b'content-encoding', b'content-length')
+        ]
+        headers.append((b'content-length', str(len(body)).encode('latin-1')))
+        # Disconnect is still received from client
+        super().__init__(scope=ChainMap({'headers': headers}, request.scope), receive=request.receive)
+        self.decoded_body = body
+
+    async def stream(self):
+        yield self.decoded_body
+        yield b''
+
+    async def body(self):
+        return self.decoded_body
+
+
+class EntrypointRoute(APIRoute):
+    def __init__(
+        self,
+        entrypoint: 'Entrypoint',
+        path: str,
+        *,
+        name: str = None,
+        errors: List[Type[BaseError]] = None,
+        common_dependencies: Sequence[Depends] = None,
+        response_class: Type[Response] = JSONResponse,
+        request_class: Type[JsonRpcRequest] = JsonRpcRequest,
+        **kwargs,
+    ):
+        name = name or 'entrypoint'
+
+        _, path_format, _ = compile_path(path)
+
+        _Request = request_class
+
+        common_dependant = Dependant(path=path_format)
+        if common_dependencies:
+            insert_dependencies(common_dependant, common_dependencies)
+            fix_query_dependencies(common_dependant)
+            common_dependant = get_flat_dependant(common_dependant, skip_repeats=True)
+
+            if common_dependant.body_params:
+                _Request = make_request_model(
+                    name, entrypoint.callee_module, common_dependant.body_params, entrypoint.components,
+                )
+
+        # This is only necessary for generating OpenAPI
+        def endpoint(__request__: _Request):
+            del __request__
+
+        responses = errors_responses(errors)
+
+        super().__init__(
+            path,
+            endpoint,
+            methods=['POST'],
+            name=name,
+            response_class=response_class,
+            response_model=JsonRpcResponse,
+            responses=responses,
+            **kwargs,
+        )
+
+        flat_dependant = get_flat_dependant(self.dependant, skip_repeats=True)
+
+        if len(flat_dependant.body_params) > 1:
+            body_params = [p for p in flat_dependant.body_params if p.type_ is not _Request]
+            raise RuntimeError(
+                f"Entrypoint shared dependencies can't use 'Body' parameters: "
+                f"params={body_params}"
+            )
+
+        if flat_dependant.query_params:
+            raise RuntimeError(
+                f"Entrypoint shared dependencies can't use 'Query' parameters: "
+                f"params={flat_dependant.query_params}"
+            )
+
+        self.shared_dependant = clone_dependant(self.dependant)
+
+        # No shared 'Body' params, because each JSON-RPC request in batch has own body
+        self.shared_dependant.body_params = []
+
+        # Add dependencies and other parameters from common_dependant for correct OpenAPI generation
+        self.dependant.path_params.extend(common_dependant.path_params)
+        self.dependant.header_params.extend(common_dependant.header_params)
+        self.dependant.cookie_params.extend(common_dependant.cookie_params)
+        self.dependant.dependencies.extend(common_dependant.dependencies)
+        self.dependant.security_requirements.extend(common_dependant.security_requirements)
+
+        self.entrypoint = entrypoint
+        self.common_dependencies = common_dependencies
+        self.request_class = request_class
+        self.errors = errors or []
+        if entrypoint.concurrent_dependencies:
+            self.dependencies_solver = ConcurrentDependencySolver(self.shared_dependant)
+        else:
+            self.dependencies_solver = solve_dependencies
+        # Prototype response only for rendering content without response objects
+        self.response_renderer = self.response_class(content=None)
+        self.bind_app()
+
+    def bind_app(self):
+        """Choose ASGI app for route"""
+        if self.entrypoint.asgi_fast_path:
+            self.app = self.handle_asgi
+        else:
+            self.app = request_response(self.handle_http_request)
+
+    def __hash__(self):
+        return hash(self.path)
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, EntrypointRoute)
+            and self.path == other.path
+        )
 
     async def solve_shared_dependencies(
         self,
@@ -1001,8 +2947,11 @@ class EntrypointRoute(APIRoute):
     ) -> dict:
         # Must not be empty, otherwise FastAPI re-creates it
         dependency_cache = {(lambda: None, ('', )): 1}
+        app_dependency_cache = await self.entrypoint.get_app_dependency_cache()
+        if app_dependency_cache:
+            dependency_cache = LayeredDependencyCache(dependency_cache, app_dependency_cache)
         if self.dependencies:
-            _, errors, _, _, _ = await solve_dependencies(
+            _, errors, _, _, _ = await self.dependencies_solver(
                 request=http_request,
                 dependant=self.shared_dependant,
                 body=None,
@@ -1016,10 +2965,13 @@ class EntrypointRoute(APIRoute):
         return dependency_cache
 
     async def parse_body(self, http_request) -> Any:
-        try:
-            body = await http_request.json()
-        except JSONDecodeError:
-            raise ParseError()
+        return await self.parse_raw_body(
+            await self.entrypoint.read_body(http_request),
+            self.entrypoint.get_request_codec(http_request),
+        )
+
+    async def parse_raw_body(self, raw_body: bytes, codec: BodyCodec = None) -> Any:
+        body = await self.entrypoint.decode_body(raw_body, codec)
 
         if isinstance(body, list) and not body:
             raise InvalidRequest(data={'errors': [
@@ -1035,32 +2987,127 @@ class EntrypointRoute(APIRoute):
         del sub_response.headers["content-length"]
         sub_response.status_code = None  # type: ignore
 
+        response_codec = self.entrypoint.get_response_codec(http_request)
+
         try:
+            http_request = await self.entrypoint.read_request(http_request)
             body = await self.parse_body(http_request)
         except Exception as exc:
             resp = await self.entrypoint.handle_exception_to_resp(exc)
-            response = self.response_class(content=resp, background=background_tasks)
+            response = await self.entrypoint.make_response(
+                self.response_class, resp, background_tasks, codec=response_codec,
+            )
         else:
             try:
-                resp = await self.handle_body(http_request, background_tasks, sub_response, body)
+                resp = await self.handle_body(
+                    http_request, background_tasks, sub_response, body,
+                    stream_results=response_codec is None,
+                )
             except NoContent:
                 # no content for successful notifications
                 response = Response(media_type='application/json', background=background_tasks)
             else:
-                response = self.response_class(content=resp, background=background_tasks)
+                if is_streaming_resp(resp):
+                    response = self.entrypoint.make_streaming_response(http_request, resp, background_tasks)
+                else:
+                    # Response size is unknown before rendering, large requests usually have large responses
+                    response = await self.entrypoint.make_response(
+                        self.response_class, resp, background_tasks,
+                        offload=self.entrypoint.should_offload(len(await http_request.body())),
+                        codec=response_codec,
+                    )
 
         response.headers.raw.extend(sub_response.headers.raw)
         if sub_response.status_code:
             response.status_code = sub_response.status_code
 
+        await self.entrypoint.compress_response(http_request, response)
+
         return response
 
+    async def handle_asgi(self, scope: Scope, receive: Receive, send: Send) -> None:
+        """Same as handle_http_request, but without request_response and response objects"""
+        http_request = Request(scope, receive)
+        background_tasks = BackgroundTasks()
+
+        sub_response = Response()
+        del sub_response.headers["content-length"]
+        sub_response.status_code = None  # type: ignore
+
+        response_codec = self.entrypoint.get_response_codec(http_request)
+
+        offload = False
+        try:
+            http_request = await self.entrypoint.read_request(http_request)
+            body = await self.parse_body(http_request)
+        except Exception as exc:
+            resp = await self.entrypoint.handle_exception_to_resp(exc)
+        else:
+            try:
+                resp = await self.handle_body(
+                    http_request, background_tasks, sub_response, body,
+                    stream_results=response_codec is None,
+                )
+            except NoContent:
+                # no content for successful notifications
+                resp = None
+            else:
+                offload = self.entrypoint.should_offload(len(await http_request.body()))
+
+        if is_streaming_resp(resp):
+            response = self.entrypoint.make_streaming_response(http_request, resp, background_tasks)
+            response.raw_headers.extend(sub_response.headers.raw)
+            if sub_response.status_code:
+                response.status_code = sub_response.status_code
+            await response(scope, receive, send)
+            return
+
+        if resp is None:
+            content = b''
+            media_type = 'application/json'
+        else:
+            if response_codec is not None:
+                render = response_codec.dumps
+                media_type = response_codec.media_type
+            else:
+                render = self.response_renderer.render
+                media_type = self.response_class.media_type
+            if offload:
+                content = await self.entrypoint.run_offloaded(render, resp)
+            else:
+                content = render(resp)
+
+        coding = None
+        if 'content-encoding' not in sub_response.headers:
+            coding = self.entrypoint.get_response_coding(http_request, len(content))
+        if coding is not None:
+            content = await self.entrypoint.compress_body(coding, content)
+
+        headers = [
+            (b'content-length', str(len(content)).encode('latin-1')),
+            (b'content-type', media_type.encode('latin-1')),
+        ]
+        if coding is not None:
+            headers.append((b'content-encoding', coding.name.encode('latin-1')))
+        if self.entrypoint.compression_threshold is not None:
+            headers.append((b'vary', b'Accept-Encoding'))
+        headers.extend(sub_response.headers.raw)
+
+        await send({
+            'type': 'http.response.start',
+            'status': sub_response.status_code or 200,
+            'headers': headers,
+        })
+        await send({'type': 'http.response.body', 'body': content})
+        await background_tasks()
+
     async def handle_body(
         self,
         http_request: Request,
         background_tasks: BackgroundTasks,
         sub_response: Response,
         body: Any,
+        stream_results: bool = False,
     ) -> dict:
         # Shared dependencies for all requests in one json-rpc batch request
         shared_dependencies_error = None
@@ -1074,6 +3121,46 @@ class EntrypointRoute(APIRoute):
             shared_dependencies_error = error
             dependency_cache = None
 
+        return await self.handle_calls(
+            http_request, background_tasks, sub_response, body,
+            dependency_cache=dependency_cache,
+            shared_dependencies_error=shared_dependencies_error,
+            stream_results=stream_results,
+        )
+
+    async def handle_calls(
+        self,
+        http_request: Request,
+        background_tasks: BackgroundTasks,
+        sub_response: Response,
+        body: Any,
+        dependency_cache: dict = None,
+        shared_dependencies_error: BaseError = None,
+        stream_results: bool = False,
+    ) -> dict:
+        """Handle single call or batch with already solved shared dependencies.
+
+        Result of single call may be ResultStream if stream_results is set, batch results are always collected.
+        While entrypoint is draining calls are refused with its busy_error, see Entrypoint.admit_calls.
+        """
+        return await self.entrypoint.admit_calls(body, functools.partial(
+            self.run_calls,
+            http_request, background_tasks, sub_response, body,
+            dependency_cache=dependency_cache,
+            shared_dependencies_error=shared_dependencies_error,
+            stream_results=stream_results,
+        ))
+
+    async def run_calls(
+        self,
+        http_request: Request,
+        background_tasks: BackgroundTasks,
+        sub_response: Response,
+        body: Any,
+        dependency_cache: dict = None,
+        shared_dependencies_error: BaseError = None,
+        stream_results: bool = False,
+    ) -> dict:
         scheduler = await self.entrypoint.get_scheduler()
 
         if isinstance(body, list):
@@ -1081,30 +3168,74 @@ class EntrypointRoute(APIRoute):
         else:
             req_list = [body]
 
+        # Calls of proxied methods are forwarded to upstreams, one batch per upstream
+        proxy_groups = self.group_proxy_reqs(req_list)
+        proxied_indexes = {index for indexes in proxy_groups.values() for index in indexes}
+        local_indexes = [index for index in range(len(req_list)) if index not in proxied_indexes]
+
+        # Notifications are acknowledged before execution, see Entrypoint.spawn_notification
+        detached_indexes = []
+        if self.entrypoint.detach_notifications and shared_dependencies_error is None:
+            detached_indexes = [index for index in local_indexes if self.is_detachable(req_list[index])]
+            if detached_indexes:
+                for index in detached_indexes:
+                    await self.entrypoint.spawn_notification(http_request, req_list[index])
+                local_indexes = [index for index in local_indexes if index not in detached_indexes]
+
+        proxy_job_list = [
+            self.handle_proxy_reqs(
+                client, [req_list[index] for index in indexes],
+                shared_dependencies_error=shared_dependencies_error,
+            )
+            for client, indexes in proxy_groups.items()
+        ]
+
         job_list = []
         if len(req_list) > 1:
+            if shared_dependencies_error is None:
+                validated_params_list = self.validate_batch_params(req_list)
+            else:
+                validated_params_list = [None] * len(req_list)
+
             # Run concurrently through scheduler
-            for req in req_list:
+            for index in local_indexes:
+                req, validated_params = req_list[index], validated_params_list[index]
                 job = await scheduler.spawn(
                     self.handle_req_to_resp(
                         http_request, background_tasks, sub_response, req,
                         dependency_cache=dependency_cache,
                         shared_dependencies_error=shared_dependencies_error,
+                        validated_params=validated_params,
                     )
                 )
                 job_list.append(job.wait())
-        else:
+        elif local_indexes:
             req = req_list[0]
-            coro = self.handle_req_to_resp(
+            call = functools.partial(
+                self.handle_req_to_resp,
                 http_request, background_tasks, sub_response, req,
                 dependency_cache=dependency_cache,
                 shared_dependencies_error=shared_dependencies_error,
             )
-            job_list.append(coro)
+            if stream_results and not isinstance(body, list) and self.is_streamed(req):
+                job_list.append(self.entrypoint.run_result_stream(call))
+            else:
+                job_list.append(call())
+
+        local_resps, proxy_resps = await asyncio.gather(
+            asyncio.gather(*job_list),
+            asyncio.gather(*proxy_job_list),
+        )
+
+        resp_by_index = dict.fromkeys(detached_indexes, {})
+        resp_by_index.update(zip(local_indexes, local_resps))
+        for indexes, resps in zip(proxy_groups.values(), proxy_resps):
+            resp_by_index.update(zip(indexes, resps))
 
         resp_list = []
 
-        for resp in await asyncio.gather(*job_list):
+        for index in range(len(req_list)):
+            resp = resp_by_index[index]
             # No response for successful notifications
             has_content = 'error' in resp or 'id' in resp
             if not has_content:
@@ -1122,6 +3253,101 @@ class EntrypointRoute(APIRoute):
 
         return content
 
+    def is_streamed(self, req: Any) -> bool:
+        route = self.entrypoint.method_routes.get(req.get('method')) if isinstance(req, dict) else None
+        return route is not None and route.is_streamed(req)
+
+    def is_detachable(self, req: Any) -> bool:
+        """Notification of existing method, errors of other requests are still responded"""
+        return isinstance(req, dict) and 'id' not in req and req.get('method') in self.entrypoint.method_routes
+
+    def group_proxy_reqs(self, req_list: List[Any]) -> Dict['JsonRpcClient', List[int]]:
+        """Indexes of requests to proxied methods grouped by upstream client, see Entrypoint.add_proxy_route"""
+        groups: Dict['JsonRpcClient', List[int]] = {}
+        if not self.entrypoint.proxy_routes:
+            return groups
+        for index, req in enumerate(req_list):
+            if not isinstance(req, dict):
+                continue
+            method = req.get('method')
+            if not isinstance(method, str) or method in self.entrypoint.method_routes:
+                continue
+            proxy_route = self.entrypoint.get_proxy_route(method)
+            if proxy_route is None:
+                continue
+            groups.setdefault(proxy_route.client, []).append(index)
+        return groups
+
+    async def handle_proxy_reqs(
+        self,
+        client: 'JsonRpcClient',
+        req_list: List[dict],
+        shared_dependencies_error: BaseError = None,
+    ) -> List[dict]:
+        """Forward requests to upstream in one batch, responses are in order of requests.
+
+        Upstream responses are passed through without validation, middlewares are not applied.
+        Successful notifications have empty responses.
+        """
+        if shared_dependencies_error is not None:
+            error_resp = shared_dependencies_error.get_resp()
+            return [dict(error_resp, id=req.get('id')) for req in req_list]
+
+        try:
+            upstream_resp = await client.send(req_list)
+        except Exception as exc:
+            logger.exception(str(exc), exc_info=exc)
+            upstream_resp = InternalError().get_resp()
+
+        if isinstance(upstream_resp, dict):
+            # Whole batch is rejected by upstream
+            return [dict(upstream_resp, id=req.get('id')) for req in req_list]
+
+        upstream_resp_by_id = {
+            item.get('id'): item
+            for item in upstream_resp or ()
+            if isinstance(item, dict)
+        }
+
+        resp_list = []
+        for req in req_list:
+            if 'id' not in req:
+                resp_list.append({})
+                continue
+            resp = upstream_resp_by_id.get(req['id'])
+            if resp is None:
+                resp = dict(InternalError().get_resp(), id=req['id'])
+            resp_list.append(resp)
+        return resp_list
+
+    def validate_batch_params(self, req_list: List[Any]) -> List[Optional[typing.Tuple[dict, list]]]:
+        """Validate params of batch requests grouped by method, see MethodRoute.validate_batch_params"""
+        result: List[Optional[typing.Tuple[dict, list]]] = [None] * len(req_list)
+
+        groups: Dict[str, List[int]] = {}
+        for index, req in enumerate(req_list):
+            if not isinstance(req, dict):
+                continue
+            method = req.get('method')
+            if not isinstance(method, str):
+                continue
+            if not isinstance(req.get('params', {}), dict):
+                continue
+            route = self.entrypoint.method_routes.get(method)
+            if route is None or route.batch_params_field is None:
+                continue
+            groups.setdefault(method, []).append(index)
+
+        for method, indexes in groups.items():
+            if len(indexes) < 2:
+                continue
+            route = self.entrypoint.method_routes[method]
+            params_list = [req_list[index].get('params', {}) for index in indexes]
+            for index, validated_params in zip(indexes, route.validate_batch_params(params_list)):
+                result[index] = validated_params
+
+        return result
+
     async def handle_req_to_resp(
         self,
         http_request: Request,
@@ -1129,7 +3355,9 @@ class EntrypointRoute(APIRoute):
         sub_response: Response,
         req: Any,
         dependency_cache: dict = None,
-        shared_dependencies_error: BaseError = None
+        shared_dependencies_error: BaseError = None,
+        validated_params: typing.Tuple[dict, list] = None,
+        result_stream: ResultStream = None,
     ) -> dict:
         async with JsonRpcContext(
             entrypoint=self.entrypoint,
@@ -1145,6 +3373,8 @@ class EntrypointRoute(APIRoute):
                 http_request, background_tasks, sub_response, ctx,
                 dependency_cache=dependency_cache,
                 shared_dependencies_error=shared_dependencies_error,
+                validated_params=validated_params,
+                result_stream=result_stream,
             )
             ctx.on_raw_response(resp)
 
@@ -1157,33 +3387,418 @@ class EntrypointRoute(APIRoute):
         sub_response: Response,
         ctx: JsonRpcContext,
         dependency_cache: dict = None,
-        shared_dependencies_error: BaseError = None
+        shared_dependencies_error: BaseError = None,
+        validated_params: typing.Tuple[dict, list] = None,
+        result_stream: ResultStream = None,
     ):
         http_request_shadow = RequestShadow(http_request)
         http_request_shadow.scope['path'] = self.path + '/' + ctx.request.method
 
-        for route in self.entrypoint.routes:  # type: MethodRoute
-            match, child_scope = route.matches(http_request_shadow.scope)
-            if match == Match.FULL:
-                # http_request is a transport layer and it is common for all JSON-RPC requests in a batch
-                ctx.method_route = route
-                return await route.handle_req(
-                    http_request_shadow, background_tasks, sub_response, ctx,
+        route = self.entrypoint.method_routes.get(ctx.request.method)
+        if route is None:
+            raise MethodNotFound()
+
+        # http_request is a transport layer and it is common for all JSON-RPC requests in a batch
+        ctx.method_route = route
+        return await route.handle_req(
+            http_request_shadow, background_tasks, sub_response, ctx,
+            dependency_cache=dependency_cache,
+            shared_dependencies_error=shared_dependencies_error,
+            validated_params=validated_params,
+            result_stream=result_stream,
+        )
+
+
+class Subscription:
+    """Server-push subscription, items of iterator are sent as notifications until it ends or client unsubscribes.
+
+    It runs as a job of entrypoint scheduler, so it counts towards scheduler limit and is closed on shutdown.
+    """
+
+    def __init__(
+        self,
+        connection: 'WebSocketConnection',
+        route: 'SubscriptionRoute',
+        iterator: typing.AsyncIterator,
+        exit_stack: AsyncExitStack,
+    ):
+        self.id = secrets.token_hex(8)
+        self.connection = connection
+        self.route = route
+        self.iterator = iterator
+        self.exit_stack = exit_stack
+        self.job: Optional[aiojobs.Job] = None
+        self.running = False
+
+    async def start(self):
+        scheduler = await self.route.entrypoint.get_scheduler()
+        self.job = await scheduler.spawn(self.run())
+
+    async def run(self):
+        self.running = True
+        try:
+            # Dependencies with yield of subscription method are closed when subscription ends
+            async with self.exit_stack:
+                try:
+                    async for item in self.iterator:
+                        result = await self.route.serialize_item(item)
+                        self.connection.push(self, {'subscription': self.id, 'result': result})
+                finally:
+                    aclose = getattr(self.iterator, 'aclose', None)
+                    if aclose is not None:
+                        await aclose()
+        except asyncio.CancelledError:
+            raise
+        except BaseError as error:
+            self.connection.push(self, {'subscription': self.id, 'error': error.get_resp()['error']})
+        except Exception as exc:
+            logger.exception(str(exc), exc_info=exc)
+            self.connection.push(self, {'subscription': self.id, 'error': InternalError().get_resp()['error']})
+        finally:
+            self.connection.subscriptions.pop(self.id, None)
+
+    async def cancel(self):
+        if self.job is not None:
+            try:
+                await self.job.close()
+            except asyncio.TimeoutError:
+                logger.warning("Subscription %s of %s is closing longer than scheduler close_timeout",
+                               self.id, self.route.name)
+        if not self.running:
+            # Not started yet, or its job was closed while pending
+            async with self.exit_stack:
+                aclose = getattr(self.iterator, 'aclose', None)
+                if aclose is not None:
+                    await aclose()
+
+
+class WebSocketConnection:
+    """State of WebSocket connection: serialized sending and buffered notifications of subscriptions.
+
+    No more than max_buffer notifications wait for sending, slow_consumer_policy decides what to do with next one:
+        'drop' - discard it,
+        'coalesce' - replace waiting notification of the same subscription, discard if there is no such,
+        'disconnect' - close connection.
+
+    No more than max_subscriptions are active at once, next subscription calls fail with InvalidRequest.
+    """
+
+    slow_consumer_policies = ('drop', 'coalesce', 'disconnect')
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        response_renderer: Response,
+        *,
+        max_buffer: int = 100,
+        slow_consumer_policy: str = 'disconnect',
+        max_subscriptions: int = 100,
+    ):
+        if slow_consumer_policy not in self.slow_consumer_policies:
+            raise ValueError(f"slow_consumer_policy must be one of {self.slow_consumer_policies}")
+        self.websocket = websocket
+        self.response_renderer = response_renderer
+        self.max_buffer = max_buffer
+        self.max_subscriptions = max_subscriptions
+        self.slow_consumer_policy = slow_consumer_policy
+        self.connected = True
+        self.send_lock = asyncio.Lock()
+        self.subscriptions: Dict[str, Subscription] = {}
+        self.buffer: typing.Deque[typing.Tuple[Subscription, dict]] = deque()
+        self.buffer_ready = asyncio.Event()
+        self.dropped_count = 0
+        self.sender_task: Optional[asyncio.Task] = None
+        self.close_task: Optional[asyncio.Task] = None
+
+    async def send(self, content: bytes, text: bool = True):
+        async with self.send_lock:
+            if not self.connected:
+                return
+            if text:
+                await self.websocket.send_text(content.decode())
+            else:
+                await self.websocket.send_bytes(content)
+
+    def subscribe(self, route: 'SubscriptionRoute', iterator: typing.AsyncIterator, exit_stack: AsyncExitStack):
+        """Subscription is started after the response with its id is sent"""
+        if len(self.subscriptions) >= self.max_subscriptions:
+            raise subscriptions_limit_error(self.max_subscriptions)
+        subscription = Subscription(self, route, iterator, exit_stack)
+        self.subscriptions[subscription.id] = subscription
+        return subscription
+
+    async def unsubscribe(self, subscription_id: str) -> bool:
+        subscription = self.subscriptions.pop(subscription_id, None)
+        if subscription is None:
+            return False
+        await subscription.cancel()
+        return True
+
+    async def unsubscribe_all(self):
+        for subscription in list(self.subscriptions.values()):
+            await self.unsubscribe(subscription.id)
+
+    def push(self, subscription: Subscription, params: dict):
+        if not self.connected or self.close_task is not None:
+            return
+
+        notification = {'jsonrpc': '2.0', 'method': subscription.route.name, 'params': params}
+        if len(self.buffer) >= self.max_buffer:
+            if self.slow_consumer_policy == 'disconnect':
+                # Waiting notifications are not sent to slow consumer
+                self.buffer.clear()
+                self.close_task = asyncio.ensure_future(self.close(code=1008))
+                return
+            if self.slow_consumer_policy == 'coalesce':
+                for index in range(len(self.buffer) - 1, -1, -1):
+                    if self.buffer[index][0] is subscription:
+                        self.buffer[index] = (subscription, notification)
+                        return
+            self.dropped_count += 1
+            return
+
+        self.buffer.append((subscription, notification))
+        self.buffer_ready.set()
+        if self.sender_task is None:
+            self.sender_task = asyncio.ensure_future(self.send_buffer())
+
+    async def send_buffer(self):
+        while True:
+            await self.buffer_ready.wait()
+            self.buffer_ready.clear()
+            while self.buffer:
+                _, notification = self.buffer.popleft()
+                await self.send(self.response_renderer.render(notification))
+
+    async def close(self, code: int = None):
+        """Stop subscriptions, close connection if code is passed"""
+        if code is not None and self.connected:
+            async with self.send_lock:
+                self.connected = False
+                await self.websocket.close(code=code)
+        self.connected = False
+        await self.unsubscribe_all()
+        if self.sender_task is not None:
+            self.sender_task.cancel()
+        self.buffer.clear()
+
+
+class WebSocketEntrypointRoute(WebSocketRoute):
+    """JSON-RPC over WebSocket, every message is a single call or a batch, same as HTTP body.
+
+    Shared dependencies are solved once per connection. Messages are handled concurrently on entrypoint
+    scheduler and responses are sent as soon as they are ready. While max_in_flight messages are being
+    handled, next messages are not received. Subscriptions are limited by WebSocketConnection buffer
+    and max_subscriptions, drain of entrypoint ends them.
+    """
+
+    connection_class = WebSocketConnection
+
+    def __init__(
+        self,
+        entrypoint: 'Entrypoint',
+        path: str,
+        *,
+        name: str = None,
+        max_in_flight: int = 100,
+        max_buffer: int = 100,
+        slow_consumer_policy: str = 'disconnect',
+        max_subscriptions: int = 100,
+    ):
+        if slow_consumer_policy not in self.connection_class.slow_consumer_policies:
+            raise ValueError(f"slow_consumer_policy must be one of {self.connection_class.slow_consumer_policies}")
+        super().__init__(path, self.handle_websocket, name=name or 'websocket_entrypoint')
+        self.entrypoint = entrypoint
+        self.max_in_flight = max_in_flight
+        self.max_buffer = max_buffer
+        self.slow_consumer_policy = slow_consumer_policy
+        self.max_subscriptions = max_subscriptions
+        self.connections: typing.MutableSet[WebSocketConnection] = weakref.WeakSet()
+
+    def make_http_request(self, websocket: WebSocket, **scope) -> Request:
+        """Dependencies see connection (and each message) as POST request with headers of WebSocket handshake"""
+        return Request(ChainMap({'type': 'http', 'method': 'POST', **scope}, websocket.scope))
+
+    async def handle_websocket(self, websocket: WebSocket):
+        await websocket.accept()
+
+        connection = self.connection_class(
+            websocket,
+            self.entrypoint.entrypoint_route.response_renderer,
+            max_buffer=self.max_buffer,
+            slow_consumer_policy=self.slow_consumer_policy,
+            max_subscriptions=self.max_subscriptions,
+        )
+        self.connections.add(connection)
+
+        shared_dependencies_error = None
+        try:
+            dependency_cache = await self.entrypoint.solve_shared_dependencies(
+                self.make_http_request(websocket), None, Response(),
+            )
+        except BaseError as error:
+            shared_dependencies_error = error
+            dependency_cache = None
+
+        scheduler = await self.entrypoint.get_scheduler()
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        jobs: List[aiojobs.Job] = []
+
+        async def handle_message(raw_body: bytes, text: bool):
+            try:
+                await self.handle_message(
+                    connection, raw_body, functools.partial(connection.send, text=text),
                     dependency_cache=dependency_cache,
                     shared_dependencies_error=shared_dependencies_error,
                 )
-        else:
-            raise MethodNotFound()
+            finally:
+                in_flight.release()
+
+        try:
+            while True:
+                message = await websocket.receive()
+                if message['type'] == 'websocket.disconnect':
+                    break
+                if message.get('text') is not None:
+                    raw_body, text = message['text'].encode(), True
+                else:
+                    raw_body, text = message.get('bytes') or b'', False
+                await in_flight.acquire()
+                try:
+                    job = await scheduler.spawn(handle_message(raw_body, text))
+                except BaseException:
+                    in_flight.release()
+                    raise
+                jobs[:] = [running for running in jobs if not running.closed]
+                jobs.append(job)
+        finally:
+            self.connections.discard(connection)
+            await connection.close()
+            # Messages received before disconnect are finished (or closed with scheduler),
+            # then shared dependencies are closed
+            for job in jobs:
+                try:
+                    await job.wait()
+                except Exception as exc:
+                    logger.exception(str(exc), exc_info=exc)
+
+    async def handle_message(
+        self,
+        connection: WebSocketConnection,
+        raw_body: bytes,
+        send: Callable[[bytes], Awaitable[None]],
+        dependency_cache: dict = None,
+        shared_dependencies_error: BaseError = None,
+    ) -> None:
+        route = self.entrypoint.entrypoint_route
+
+        background_tasks = BackgroundTasks()
+        sub_response = Response()
+        subscriptions: List[Subscription] = []
+
+        # Each message has own exit stack for dependencies with yield, same as HTTP request
+        async with AsyncExitStack() as stack:
+            http_request = self.make_http_request(
+                connection.websocket,
+                fastapi_astack=stack,
+                jsonrpc_connection=connection,
+                jsonrpc_subscriptions=subscriptions,
+            )
+
+            try:
+                if self.entrypoint.max_body_bytes is not None and len(raw_body) > self.entrypoint.max_body_bytes:
+                    raise body_too_large_error(self.entrypoint.max_body_bytes)
+                body = await route.parse_raw_body(raw_body)
+            except Exception as exc:
+                resp = await self.entrypoint.handle_exception_to_resp(exc)
+            else:
+                try:
+                    resp = await route.handle_calls(
+                        http_request, background_tasks, sub_response, body,
+                        dependency_cache=dependency_cache,
+                        shared_dependencies_error=shared_dependencies_error,
+                    )
+                except NoContent:
+                    # no content for successful notifications
+                    resp = None
+
+            if resp is not None:
+                await send(route.response_renderer.render(resp))
+
+            # Client knows subscriptions ids before their first notifications
+            for subscription in subscriptions:
+                if connection.connected and not self.entrypoint.draining:
+                    await subscription.start()
+                else:
+                    await connection.unsubscribe(subscription.id)
+
+            await background_tasks()
+
+    async def close_subscriptions(self):
+        for connection in list(self.connections):
+            await connection.unsubscribe_all()
+
+
+class MethodRoutesDispatcher(BaseRoute):
+    """Single route for all '{entrypoint_path}/{method}' paths
+
+    Starlette matches routes one by one, so instead of adding every MethodRoute to application routes
+    we find method route by name in dict
+    """
+    def __init__(self, entrypoint: 'Entrypoint'):
+        self.entrypoint = entrypoint
+        self.path_prefix = entrypoint.entrypoint_route.path + '/'
+
+    @property
+    def routes(self) -> List['MethodRoute']:
+        return list(self.entrypoint.method_routes.values())
+
+    def get_method_route(self, scope: Scope) -> Optional['MethodRoute']:
+        if scope['type'] != 'http':
+            return None
+        path = scope['path']
+        if not path.startswith(self.path_prefix):
+            return None
+        return self.entrypoint.method_routes.get(path[len(self.path_prefix):])
+
+    def matches(self, scope: Scope) -> typing.Tuple[Match, Scope]:
+        route = self.get_method_route(scope)
+        if route is None:
+            return Match.NONE, {}
+        return route.matches(scope)
+
+    def url_path_for(self, name: str, **path_params: Any):
+        for route in self.routes:
+            try:
+                return route.url_path_for(name, **path_params)
+            except NoMatchFound:
+                pass
+        raise NoMatchFound()
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send) -> None:
+        route = self.get_method_route(scope)
+        await route.handle(scope, receive, send)
 
 
 class Entrypoint(APIRouter):
     method_route_class = MethodRoute
     entrypoint_route_class = EntrypointRoute
+    method_routes_dispatcher_class = MethodRoutesDispatcher
+    websocket_entrypoint_route_class = WebSocketEntrypointRoute
+    subscription_route_class = SubscriptionRoute
+    background_route_class = BackgroundMethodRoute
+    unsubscribe_method_name = 'rpc.unsubscribe'
 
     default_errors: List[Type[BaseError]] = [
         InvalidParams, MethodNotFound, ParseError, InvalidRequest, InternalError,
     ]
 
+    default_content_encodings: Sequence[str] = ('zstd', 'br', 'gzip', 'deflate')
+
+    # Seconds between checks and progress logs of drain
+    drain_poll_interval: float = 0.05
+    drain_log_interval: float = 1.0
+
     def __init__(
         self,
         path: str,
@@ -1196,6 +3811,32 @@ class Entrypoint(APIRouter):
         scheduler_factory: Callable[..., Awaitable[aiojobs.Scheduler]] = aiojobs.create_scheduler,
         scheduler_kwargs: dict = None,
         request_class: Type[JsonRpcRequest] = JsonRpcRequest,
+        components: typing.MutableMapping = None,
+        collapse_method_routes: bool = False,
+        asgi_fast_path: bool = False,
+        concurrent_dependencies: bool = False,
+        offload_threshold: int = None,
+        offload_executor: ThreadPoolExecutor = None,
+        max_body_bytes: int = None,
+        max_batch_size: int = None,
+        compression_threshold: int = None,
+        content_encodings: Sequence[str] = None,
+        media_types: Sequence[str] = None,
+        stream_chunk_size: int = 65536,
+        stream_send_timeout: float = 60,
+        job_store: JobStore = None,
+        job_ttl: float = 3600,
+        jobs_scheduler_kwargs: dict = None,
+        idempotency_store: IdempotencyStore = None,
+        idempotency_header: str = 'Idempotency-Key',
+        idempotency_scope: Callable[..., Any] = None,
+        shared_idempotency_keys: bool = False,
+        detach_notifications: bool = False,
+        notifications_scheduler_kwargs: dict = None,
+        notifications_drain_timeout: float = 30,
+        drain_timeout: float = None,
+        busy_error: Type[BaseError] = ServerBusy,
+        rate_limit: RateLimit = None,
         **kwargs,
     ) -> None:
         super().__init__(redirect_slashes=False)
@@ -1206,7 +3847,89 @@ class Entrypoint(APIRouter):
         self.scheduler_kwargs = scheduler_kwargs
         self.request_class = request_class
         self.scheduler = None
-        self.callee_module = inspect.getmodule(inspect.stack()[1][0]).__name__
+        self.collapse_method_routes = collapse_method_routes
+        # Serve entrypoint with raw ASGI handler, responses are sent without starlette request/response wrappers
+        self.asgi_fast_path = asgi_fast_path
+        # Solve independent async dependencies concurrently, default for methods (see ConcurrentDependencySolver)
+        self.concurrent_dependencies = concurrent_dependencies
+        # Bodies larger than offload_threshold bytes (and responses to them) are decoded/encoded
+        # in offload_executor (default threadpool) instead of event loop.
+        # Offloaded functions are bound methods of renderers and codecs, so executor must be a thread pool
+        if isinstance(offload_executor, ProcessPoolExecutor):
+            raise ValueError("offload_executor must be a thread pool, offloaded functions are not picklable")
+        self.offload_threshold = offload_threshold
+        self.offload_executor = offload_executor
+        # Limits are checked while reading and decoding body, violations are InvalidRequest
+        self.max_body_bytes = max_body_bytes
+        self.max_batch_size = max_batch_size
+        # Responses of at least compression_threshold bytes are compressed with coding accepted by client,
+        # request bodies are decompressed according to Content-Encoding.
+        # content_encodings are names from content_codings in order of preference
+        self.compression_threshold = compression_threshold
+        if content_encodings is None:
+            content_encodings = [name for name in self.default_content_encodings if name in content_codings]
+        self.content_encodings = list(content_encodings)
+        # Media types from body_codecs accepted in Content-Type and negotiated with Accept instead of JSON
+        if media_types is None:
+            media_types = list(body_codecs)
+        self.media_types = list(media_types)
+        # Streaming results are sent by chunks of at least stream_chunk_size bytes, see make_streaming_response
+        self.stream_chunk_size = stream_chunk_size
+        # Streamed call is cancelled if its response doesn't take an item for stream_send_timeout seconds
+        self.stream_send_timeout = stream_send_timeout
+        # States of background jobs are kept for job_ttl seconds after last change, see BackgroundMethodRoute.
+        # Jobs run in entrypoint scheduler, or in dedicated one if jobs_scheduler_kwargs are given (e.g. limit)
+        self.job_store = job_store if job_store is not None else MemoryJobStore()
+        self.job_ttl = job_ttl
+        self.jobs_scheduler_kwargs = jobs_scheduler_kwargs
+        self.jobs_scheduler = None
+        # Jobs running in this process with their exit stacks by job id
+        self.running_jobs: Dict[str, typing.Tuple[aiojobs.Job, AsyncExitStack]] = {}
+        # Outcomes of idempotent methods by key from idempotency_header or request meta
+        self.idempotency_store = idempotency_store if idempotency_store is not None else IdempotencyStore()
+        self.idempotency_header = idempotency_header
+        # Defaults of methods, see MethodRoute idempotency_scope
+        self.idempotency_scope = idempotency_scope
+        self.shared_idempotency_keys = shared_idempotency_keys
+        # Notifications are responded immediately and executed in dedicated bounded scheduler,
+        # spawning waits while its pending queue is full. Shutdown waits for them notifications_drain_timeout seconds,
+        # after that notifications are executed before response
+        self.detach_notifications = detach_notifications
+        if notifications_scheduler_kwargs is None:
+            notifications_scheduler_kwargs = {'limit': 100, 'pending_limit': 1000}
+        self.notifications_scheduler_kwargs = notifications_scheduler_kwargs
+        self.notifications_drain_timeout = notifications_drain_timeout
+        self.notifications_scheduler = None
+        self.notifications_closed = False
+        self.notifications_completed = 0
+        self.notifications_failed = 0
+        # With drain_timeout shutdown refuses new calls with busy_error and waits for in-flight calls,
+        # scheduler jobs, detached notifications and background jobs up to drain_timeout seconds, see drain
+        self.drain_timeout = drain_timeout
+        self.busy_error = busy_error
+        self.draining = False
+        self.in_flight_calls = 0
+        self.refused_calls = 0
+        # Limit of calls of all methods, methods may have own rate_limit too
+        self.rate_limit = rate_limit
+        # Circuit breakers of methods by name
+        self.circuit_breakers: Dict[str, CircuitBreaker] = {}
+        self.method_routes: Dict[str, MethodRoute] = {}
+        self.websocket_routes: List[WebSocketEntrypointRoute] = []
+        self.proxy_routes: List[ProxyRoute] = []
+        # Upstream clients by URL, shared by proxy routes with the same upstream
+        self.upstream_clients: Dict[str, 'JsonRpcClient'] = {}
+        # App dependencies by their cache keys, see AppDepends
+        self.app_dependencies: Dict[Any, AppDependency] = {}
+        self.app_dependency_values: Dict[AppDependency, Any] = {}
+        self.app_dependency_cache: Dict[Any, Any] = {}
+        # dependency_overrides app dependencies are resolved with, see get_app_dependency_cache
+        self.app_dependency_overrides: Dict[Any, Any] = {}
+        self.app_dependencies_lock: Optional[asyncio.Lock] = None
+        self.app_exit_stack: Optional[AsyncExitStack] = None
+        self.callee_module = get_caller_module_name()
+        # Registry of methods models, pass own dict to isolate this entrypoint models from other entrypoints
+        self.components = components if components is not None else _global_components
         self.entrypoint_route = self.entrypoint_route_class(
             self,
             path,
@@ -1218,6 +3941,7 @@ class Entrypoint(APIRouter):
             **kwargs,
         )
         self.routes.append(self.entrypoint_route)
+        self.add_app_dependencies(self.entrypoint_route.shared_dependant)
 
     def __hash__(self):
         return hash(self.entrypoint_route.path)
@@ -1232,9 +3956,347 @@ class Entrypoint(APIRouter):
     def common_dependencies(self):
         return self.entrypoint_route.common_dependencies
 
+    def get_app_routes(self) -> List[BaseRoute]:
+        """Routes to add to application"""
+        if self.collapse_method_routes:
+            return [self.entrypoint_route, *self.websocket_routes, self.method_routes_dispatcher_class(self)]
+        return list(self.routes)
+
+    async def startup(self):
+        self.draining = False
+        self.notifications_closed = False
+        await self.get_app_dependency_cache()
+
+    def should_offload(self, size: int) -> bool:
+        return self.offload_threshold is not None and size > self.offload_threshold
+
+    async def run_offloaded(self, func: Callable, *args) -> Any:
+        if self.offload_executor is None:
+            return await run_in_threadpool(func, *args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.offload_executor, func, *args)
+
+    async def read_body(self, http_request: Request) -> bytes:
+        decompressor = self.get_request_decompressor(http_request)
+        if self.max_body_bytes is None and decompressor is None:
+            return await http_request.body()
+
+        # Limit applies to decompressed body
+        if self.max_body_bytes is not None and decompressor is None:
+            content_length = http_request.headers.get('content-length')
+            if content_length is not None and content_length.isdigit() and int(content_length) > self.max_body_bytes:
+                raise body_too_large_error(self.max_body_bytes)
+
+        chunks = []
+        size = 0
+        async for chunk in http_request.stream():
+            if decompressor is not None:
+                # Decoding stops right after limit is crossed, so compression bomb is never inflated entirely
+                max_length = 0 if self.max_body_bytes is None else self.max_body_bytes - size + 1
+                try:
+                    chunk = decompressor.decompress(chunk, max_length)
+                except Exception:
+                    raise ParseError()
+            size += len(chunk)
+            if self.max_body_bytes is not None and size > self.max_body_bytes:
+                raise body_too_large_error(self.max_body_bytes)
+            chunks.append(chunk)
+
+        if decompressor is not None and not decompressor.eof:
+            # Truncated compressed stream
+            raise ParseError()
+
+        return b''.join(chunks)
+
+    async def read_request(self, http_request: Request) -> Request:
+        """Request with body read by read_body, which is replayed to its consumers as uncompressed body"""
+        if self.max_body_bytes is None and self.get_request_decompressor(http_request) is None:
+            # Request.body() caches body itself
+            return http_request
+
+        return DecodedBodyRequest(http_request, await self.read_body(http_request))
+
+    def get_request_decompressor(self, http_request: Request) -> Optional[StreamDecompressor]:
+        content_encoding = http_request.headers.get('content-encoding', 'identity').strip().lower()
+        if content_encoding == 'identity':
+            return None
+        if content_encoding not in self.content_encodings:
+            raise unsupported_content_encoding_error(content_encoding)
+        return content_codings[content_encoding].decompressor()
+
+    def get_response_coding(self, http_request: Request, size: int = None) -> Optional[ContentCoding]:
+        """Best coding accepted by client, None if response must not be compressed.
+
+        Size is None for streaming responses.
+        """
+        if self.compression_threshold is None:
+            return None
+        if size is not None and (not size or size < self.compression_threshold):
+            return None
+        accept_encoding = http_request.headers.get('accept-encoding')
+        if not accept_encoding:
+            return None
+        accepted = parse_accept_header(accept_encoding)
+        default_qvalue = accepted.get('*', 0.0)
+        best_name, best_qvalue = None, 0.0
+        for name in self.content_encodings:
+            qvalue = accepted.get(name, default_qvalue)
+            if qvalue > best_qvalue:
+                best_name, best_qvalue = name, qvalue
+        if best_name is None:
+            return None
+        return content_codings[best_name]
+
+    async def compress_body(self, coding: ContentCoding, body: bytes) -> bytes:
+        if self.should_offload(len(body)):
+            return await self.run_offloaded(coding.compress, body)
+        return coding.compress(body)
+
+    async def compress_stream(
+        self,
+        coding: ContentCoding,
+        chunks: typing.AsyncIterable[bytes],
+    ) -> typing.AsyncIterator[bytes]:
+        """Compress streaming response, every chunk (e.g. item of streaming batch) is flushed to client"""
+        compressor = coding.compressor()
+        async for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+
+    async def compress_response(self, http_request: Request, response: Response) -> None:
+        if self.compression_threshold is None or isinstance(response, StreamingResponse):
+            return
+        # Caches must not serve response to client with other Accept-Encoding, even if it is not compressed
+        response.headers.append('vary', 'Accept-Encoding')
+        if 'content-encoding' in response.headers:
+            return
+        coding = self.get_response_coding(http_request, len(response.body))
+        if coding is None:
+            return
+        response.body = await self.compress_body(coding, response.body)
+        response.headers['content-length'] = str(len(response.body))
+        response.headers['content-encoding'] = coding.name
+
+    def get_request_codec(self, http_request: Request) -> Optional[BodyCodec]:
+        """Codec of request body, None for JSON"""
+        content_type = http_request.headers.get('content-type', '').partition(';')[0].strip().lower()
+        if content_type in self.media_types:
+            return body_codecs[content_type]
+        return None
+
+    def get_response_codec(self, http_request: Request) -> Optional[BodyCodec]:
+        """Codec explicitly requested in Accept header, None for JSON"""
+        accept = http_request.headers.get('accept')
+        if not accept or not self.media_types:
+            return None
+        accepted = parse_accept_header(accept)
+        best_media_type, best_qvalue = None, accepted.get('application/json', 0.0)
+        for media_type in self.media_types:
+            qvalue = accepted.get(media_type, 0.0)
+            if qvalue > best_qvalue:
+                best_media_type, best_qvalue = media_type, qvalue
+        if best_media_type is None:
+            return None
+        return body_codecs[best_media_type]
+
+    async def decode_body(self, body: bytes, codec: BodyCodec = None) -> Any:
+        if codec is not None:
+            loads = codec.loads
+        elif self.max_batch_size is not None:
+            loads = functools.partial(loads_limited_batch, max_batch_size=self.max_batch_size)
+        else:
+            loads = json.loads
+
+        decode_errors = codec.decode_errors if codec is not None else (JSONDecodeError, UnicodeDecodeError)
+        try:
+            if self.should_offload(len(body)):
+                data = await self.run_offloaded(loads, body)
+            else:
+                data = loads(body)
+        except decode_errors:
+            raise ParseError()
+
+        # Binary codecs decode whole batch at once
+        if codec is not None and self.max_batch_size is not None:
+            if isinstance(data, list) and len(data) > self.max_batch_size:
+                raise batch_too_large_error(self.max_batch_size)
+        return data
+
+    async def make_response(
+        self,
+        response_class: Type[Response],
+        content: Any,
+        background: BackgroundTasks = None,
+        offload: bool = False,
+        codec: BodyCodec = None,
+    ) -> Response:
+        if codec is not None:
+            render = codec.dumps
+            media_type = codec.media_type
+        elif not offload:
+            return response_class(content=content, background=background)
+        else:
+            render = response_class(content=None).render
+            media_type = response_class.media_type
+        if offload:
+            body = await self.run_offloaded(render, content)
+        else:
+            body = render(content)
+        return Response(content=body, media_type=media_type, background=background)
+
+    async def run_result_stream(self, call: Callable[..., Awaitable[dict]]) -> dict:
+        """Response of call with ResultStream run in entrypoint scheduler"""
+        scheduler = await self.get_scheduler()
+        return await ResultStream(send_timeout=self.stream_send_timeout).run(scheduler, call)
+
+    def make_streaming_response(
+        self,
+        http_request: Request,
+        resp: dict,
+        background: BackgroundTasks = None,
+    ) -> ResultStreamResponse:
+        """Response with ResultStream, NDJSON if client accepts it"""
+        accepted = parse_accept_header(http_request.headers.get('accept', ''))
+        ndjson = accepted.get('application/x-ndjson', 0.0) > 0
+        if ndjson:
+            media_type = 'application/x-ndjson'
+        else:
+            media_type = self.entrypoint_route.response_class.media_type
+
+        content = self.iter_streaming_resp(resp, ndjson=ndjson)
+        headers = {}
+        if self.compression_threshold is not None:
+            headers['vary'] = 'Accept-Encoding'
+        coding = self.get_response_coding(http_request)
+        if coding is not None:
+            content = self.compress_stream(coding, content)
+            headers['content-encoding'] = coding.name
+
+        return ResultStreamResponse(
+            resp['result'], content, media_type=media_type, headers=headers, background=background,
+        )
+
+    async def iter_streaming_resp(self, resp: dict, ndjson: bool = False) -> typing.AsyncIterator[bytes]:
+        """Render response with ResultStream item by item.
+
+        JSON: single response object, result array is written as items are produced.
+        If call fails, response is truncated, so that client can't take partial result as complete.
+        NDJSON: response object with one item in result per line, failure is reported by the last line with error.
+        Errors of call are handled within its context, see ResultStream.
+        """
+        render = self.entrypoint_route.response_renderer.render
+        envelope = {key: value for key, value in resp.items() if key != 'result'}
+        result_stream: ResultStream = resp['result']
+
+        chunk = bytearray()
+        if not ndjson:
+            chunk += render(envelope).rstrip()[:-1]
+            if envelope:
+                chunk += b','
+            chunk += b'"result":['
+
+        first = True
+        async for item in result_stream:
+            if ndjson:
+                chunk += render({**envelope, 'result': item}) + b'\n'
+            else:
+                if not first:
+                    chunk += b','
+                chunk += render(item)
+            first = False
+            if len(chunk) >= self.stream_chunk_size:
+                yield bytes(chunk)
+                chunk.clear()
+
+        if result_stream.error is not None:
+            if ndjson:
+                chunk += render({**envelope, 'error': result_stream.error}) + b'\n'
+        elif not ndjson:
+            chunk += b']}'
+        if chunk:
+            yield bytes(chunk)
+
     async def shutdown(self):
+        notifications_drain_timeout = self.notifications_drain_timeout
+        if self.drain_timeout is not None:
+            await self.drain()
+            # Notifications had their grace time while draining
+            notifications_drain_timeout = 0
+        await self.drain_notifications(notifications_drain_timeout)
+        for job_id in list(self.running_jobs):
+            await self.cancel_job(job_id)
+        if self.jobs_scheduler is not None:
+            await self.jobs_scheduler.close()
         if self.scheduler is not None:
             await self.scheduler.close()
+        for client in self.upstream_clients.values():
+            await client.aclose()
+        if self.app_exit_stack is not None:
+            app_exit_stack = self.app_exit_stack
+            self.app_exit_stack = None
+            self.app_dependency_values.clear()
+            self.app_dependency_cache.clear()
+            await app_exit_stack.aclose()
+
+    def add_app_dependencies(self, dependant: Dependant):
+        for sub_dependant in iter_dependants(dependant):
+            if isinstance(sub_dependant.call, AppDependency):
+                self.app_dependencies[sub_dependant.cache_key] = sub_dependant.call
+
+    async def get_app_dependency_cache(self) -> dict:
+        overrides = dict(getattr(self.dependency_overrides_provider, 'dependency_overrides', None) or {})
+        if overrides != self.app_dependency_overrides:
+            # Overrides are changed after resolving (usual in tests), values are resolved again.
+            # Values resolved before are torn down on shutdown
+            self.app_dependency_overrides = overrides
+            self.app_dependency_values.clear()
+            self.app_dependency_cache.clear()
+        if len(self.app_dependency_cache) < len(self.app_dependencies):
+            await self.resolve_app_dependencies()
+        return self.app_dependency_cache
+
+    async def resolve_app_dependencies(self):
+        if self.app_dependencies_lock is None:
+            self.app_dependencies_lock = asyncio.Lock()
+        async with self.app_dependencies_lock:
+            for cache_key, app_dependency in list(self.app_dependencies.items()):
+                if cache_key in self.app_dependency_cache:
+                    continue
+                if app_dependency not in self.app_dependency_values:
+                    value = await self.solve_app_dependency(app_dependency)
+                    self.app_dependency_values[app_dependency] = value
+                self.app_dependency_cache[cache_key] = self.app_dependency_values[app_dependency]
+
+    async def solve_app_dependency(self, app_dependency: AppDependency) -> Any:
+        if self.app_exit_stack is None:
+            self.app_exit_stack = AsyncExitStack()
+
+        path = self.entrypoint_route.path
+        sub_dependant = get_parameterless_sub_dependant(depends=Depends(app_dependency.dependency), path=path)
+        sub_dependant.name = 'value'
+        dependant = Dependant(path=path, dependencies=[sub_dependant])
+
+        # There is no HTTP request on startup, app dependencies can't use request parameters
+        http_request = Request({
+            'type': 'http',
+            'headers': [],
+            'query_string': b'',
+            'path_params': {},
+            'fastapi_astack': self.app_exit_stack,
+        })
+        values, errors, _, _, _ = await solve_dependencies(
+            request=http_request,
+            dependant=dependant,
+            dependency_overrides_provider=self.dependency_overrides_provider,
+        )
+        if errors:
+            raise RuntimeError(
+                f"App dependency {app_dependency.dependency!r} can't be resolved: "
+                f"{RequestValidationError(errors).errors()}"
+            )
+        return values['value']
 
     async def get_scheduler(self):
         if self.scheduler is not None:
@@ -1242,6 +4304,183 @@ class Entrypoint(APIRouter):
         self.scheduler = await self.scheduler_factory(**(self.scheduler_kwargs or {}))
         return self.scheduler
 
+    async def get_jobs_scheduler(self):
+        if self.jobs_scheduler_kwargs is None:
+            return await self.get_scheduler()
+        if self.jobs_scheduler is None:
+            self.jobs_scheduler = await self.scheduler_factory(**self.jobs_scheduler_kwargs)
+        return self.jobs_scheduler
+
+    def circuit_breakers_metrics(self) -> Dict[str, dict]:
+        return {name: breaker.metrics() for name, breaker in self.circuit_breakers.items()}
+
+    def drain_metrics(self) -> Dict[str, int]:
+        """Work that drain waits for, and number of refused calls"""
+        notifications = self.notifications_metrics()
+        return {
+            'draining': int(self.draining),
+            'in_flight_calls': self.in_flight_calls,
+            'scheduler_jobs': len(self.scheduler) if self.scheduler is not None else 0,
+            'notifications': notifications['active'] + notifications['pending'],
+            'background_jobs': len(self.running_jobs),
+            'refused_calls': self.refused_calls,
+        }
+
+    def busy_resp(self, body: Any) -> Union[dict, List[dict]]:
+        """Response with busy_error to each call of body, one per item of batch"""
+        def make_resp(req: Any) -> dict:
+            resp = self.busy_error().get_resp()
+            if isinstance(req, dict):
+                resp['id'] = req.get('id')
+            return resp
+
+        if isinstance(body, list) and body:
+            self.refused_calls += len(body)
+            return [make_resp(req) for req in body]
+        self.refused_calls += 1
+        return make_resp(body)
+
+    async def admit_calls(self, body: Any, handler: Callable[[], Awaitable[Any]]) -> Any:
+        """Response of handler of calls of body counted in in_flight_calls, busy_resp while draining"""
+        if self.draining:
+            return self.busy_resp(body)
+
+        self.in_flight_calls += 1
+        try:
+            resp = await handler()
+        except BaseException:
+            self.in_flight_calls -= 1
+            raise
+
+        if is_streaming_resp(resp):
+            # Streamed call is in flight until its last item is sent
+            resp['result'].finished.add_done_callback(self.on_call_done)
+        else:
+            self.on_call_done()
+        return resp
+
+    def on_call_done(self, *_):
+        self.in_flight_calls -= 1
+
+    def count_drained_work(self) -> int:
+        metrics = self.drain_metrics()
+        return sum(metrics[key] for key in ('in_flight_calls', 'scheduler_jobs', 'notifications', 'background_jobs'))
+
+    async def drain(self, timeout: float = None) -> bool:
+        """Refuse new calls with busy_error and wait for in-flight work up to timeout (drain_timeout by default).
+
+        Returns false if deadline is exceeded, remaining work is cancelled by shutdown.
+        """
+        if timeout is None:
+            timeout = self.drain_timeout or 0
+        self.draining = True
+        # Subscriptions never end by themselves
+        for route in self.websocket_routes:
+            await route.close_subscriptions()
+        loop = asyncio.get_running_loop()
+        started_at = loop.time()
+        deadline = started_at + timeout
+        logged_at = started_at
+        path = self.entrypoint_route.path
+        logger.info("Draining entrypoint %s: %r", path, self.drain_metrics())
+        while self.count_drained_work():
+            now = loop.time()
+            if now >= deadline:
+                logger.warning("Drain deadline of entrypoint %s exceeded: %r", path, self.drain_metrics())
+                return False
+            if now - logged_at >= self.drain_log_interval:
+                logged_at = now
+                logger.info("Draining entrypoint %s: %r", path, self.drain_metrics())
+            await asyncio.sleep(min(self.drain_poll_interval, deadline - now))
+        logger.info("Drained entrypoint %s in %.2fs", path, loop.time() - started_at)
+        return True
+
+    async def get_notifications_scheduler(self):
+        if self.notifications_closed:
+            raise RuntimeError("Notifications scheduler is closed")
+        if self.notifications_scheduler is None:
+            self.notifications_scheduler = await self.scheduler_factory(**self.notifications_scheduler_kwargs)
+        return self.notifications_scheduler
+
+    async def spawn_notification(self, http_request: Request, req: dict):
+        if self.notifications_closed:
+            # Nothing would wait for or cancel notification spawned after drain_notifications
+            await self.run_notification(http_request.scope, req)
+            return
+        scheduler = await self.get_notifications_scheduler()
+        await scheduler.spawn(self.run_notification(http_request.scope, req))
+
+    async def run_notification(self, scope: Scope, req: dict):
+        """Handle notification after response was sent, dependencies (including shared) are solved again"""
+        background_tasks = BackgroundTasks()
+        sub_response = Response()
+        try:
+            async with AsyncExitStack() as stack:
+                http_request = Request(ChainMap({'fastapi_astack': stack}, scope))
+                shared_dependencies_error = None
+                try:
+                    dependency_cache = await self.solve_shared_dependencies(
+                        http_request, background_tasks, sub_response,
+                    )
+                except BaseError as error:
+                    shared_dependencies_error = error
+                    dependency_cache = None
+                resp = await self.entrypoint_route.handle_req_to_resp(
+                    http_request, background_tasks, sub_response, req,
+                    dependency_cache=dependency_cache,
+                    shared_dependencies_error=shared_dependencies_error,
+                )
+            await background_tasks()
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.exception(str(exc), exc_info=exc)
+            resp = None
+        if resp is None or 'error' in resp:
+            self.notifications_failed += 1
+        else:
+            self.notifications_completed += 1
+
+    def notifications_metrics(self) -> Dict[str, int]:
+        """Counters of detached notifications"""
+        scheduler = self.notifications_scheduler
+        return {
+            'active': scheduler.active_count if scheduler is not None else 0,
+            'pending': scheduler.pending_count if scheduler is not None else 0,
+            'completed': self.notifications_completed,
+            'failed': self.notifications_failed,
+        }
+
+    async def drain_notifications(self, timeout: float = None):
+        """Wait for detached notifications up to timeout (notifications_drain_timeout by default), cancel the rest"""
+        if timeout is None:
+            timeout = self.notifications_drain_timeout
+        scheduler = self.notifications_scheduler
+        self.notifications_scheduler = None
+        self.notifications_closed = True
+        if scheduler is None:
+            return
+        waiters = [asyncio.ensure_future(job.wait()) for job in scheduler]
+        if waiters:
+            _, pending = await asyncio.wait(waiters, timeout=timeout)
+            for waiter in pending:
+                waiter.cancel()
+        await scheduler.close()
+
+    async def cancel_job(self, job_id: str) -> bool:
+        """Cancel background job running in this process, false if there is no such job"""
+        running_job = self.running_jobs.pop(job_id, None)
+        if running_job is None:
+            return False
+        job, exit_stack = running_job
+        await job.close()
+        # Pending job is closed before it started
+        await exit_stack.aclose()
+        state = await self.job_store.get(job_id)
+        if state is not None and state['status'] != 'cancelled':
+            await self.job_store.set(job_id, dict(state, status='cancelled'), self.job_ttl)
+        return True
+
     async def handle_exception(self, exc) -> dict:
         raise exc
 
@@ -1257,7 +4496,107 @@ class Entrypoint(APIRouter):
             resp = InternalError().get_resp()
         return resp
 
+    async def call(self, method: str, params: Any = None, *, context: JsonRpcContext = None) -> Any:
+        """Call method in process, see call_batch. Errors are raised as BaseError"""
+        result, = await self.call_batch([(method, params)], context=context)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    async def call_batch(
+        self,
+        calls: Sequence[typing.Tuple[str, Any]],
+        *,
+        context: JsonRpcContext = None,
+    ) -> List[Any]:
+        """Call methods in process concurrently, as [(method, params), ...].
+
+        Calls go through the same validation, dependencies and middlewares as HTTP requests,
+        but results are Python objects returned by methods. Results of failed calls are BaseError instances.
+        Calls inherit HTTP request, background tasks and response of context (current JSON-RPC context by default).
+        """
+        if context is None:
+            context = _jsonrpc_context.get(None)
+
+        if context is not None:
+            scope = context.http_request.scope
+            background_tasks = context.background_tasks
+            sub_response = context.http_response
+        else:
+            scope = {
+                'type': 'http',
+                'method': 'POST',
+                'path': self.entrypoint_route.path,
+                'headers': [],
+                'query_string': b'',
+            }
+            background_tasks = None
+            sub_response = Response()
+
+        async with AsyncExitStack() as stack:
+            http_request = Request(ChainMap({'fastapi_astack': stack}, scope))
+
+            shared_dependencies_error = None
+            try:
+                dependency_cache = await self.solve_shared_dependencies(http_request, background_tasks, sub_response)
+            except BaseError as error:
+                shared_dependencies_error = error
+                dependency_cache = None
+
+            ctx_list = await asyncio.gather(*(
+                self.call_in_process(
+                    http_request, background_tasks, sub_response,
+                    {'jsonrpc': '2.0', 'id': 0, 'method': method, 'params': params if params is not None else {}},
+                    dependency_cache=dependency_cache,
+                    shared_dependencies_error=shared_dependencies_error,
+                )
+                for method, params in calls
+            ))
+
+        results = []
+        for ctx in ctx_list:
+            if ctx.exception is None:
+                results.append(ctx.raw_response['result'])
+            elif ctx.is_unhandled_exception:
+                # Already logged by context
+                results.append(InternalError())
+            else:
+                results.append(ctx.exception)
+        return results
+
+    async def call_in_process(
+        self,
+        http_request: Request,
+        background_tasks: Optional[BackgroundTasks],
+        sub_response: Response,
+        req: dict,
+        dependency_cache: dict = None,
+        shared_dependencies_error: BaseError = None,
+    ) -> JsonRpcContext:
+        async with JsonRpcContext(
+            entrypoint=self,
+            raw_request=req,
+            http_request=http_request,
+            background_tasks=background_tasks,
+            http_response=sub_response,
+            json_rpc_request_class=self.request_class,
+            in_process=True,
+        ) as ctx:
+            await ctx.enter_middlewares(self.middlewares)
+
+            resp = await self.entrypoint_route.handle_req(
+                http_request, background_tasks, sub_response, ctx,
+                dependency_cache=dependency_cache,
+                shared_dependencies_error=shared_dependencies_error,
+            )
+            ctx.on_raw_response(resp)
+
+        return ctx
+
     def bind_dependency_overrides_provider(self, value):
+        if value is not None:
+            value = CachedDependencyOverridesProvider(value)
+        self.dependency_overrides_provider = value
         for route in self.routes:
             route.dependency_overrides_provider = value
 
@@ -1278,10 +4617,16 @@ class Entrypoint(APIRouter):
         func: Union[FunctionType, Coroutine],
         *,
         name: str = None,
+        route_class: Type[MethodRoute] = None,
+        background: bool = False,
         **kwargs,
     ) -> None:
+        if background:
+            self.add_background_route(func, name=name, **kwargs)
+            return
         name = name or func.__name__
-        route = self.method_route_class(
+        route_class = route_class or self.method_route_class
+        route = route_class(
             self,
             self.entrypoint_route.path + '/' + name,
             func,
@@ -1290,6 +4635,107 @@ class Entrypoint(APIRouter):
             **kwargs,
         )
         self.routes.append(route)
+        self.method_routes[name] = route
+        if route.circuit_breaker is not None:
+            self.circuit_breakers[route.circuit_breaker.name] = route.circuit_breaker
+        self.add_app_dependencies(route.func_dependant)
+
+    def add_subscription_route(
+        self,
+        func: Union[FunctionType, Coroutine],
+        **kwargs,
+    ) -> None:
+        self.add_method_route(func, route_class=self.subscription_route_class, **kwargs)
+        if self.unsubscribe_method_name not in self.method_routes:
+            self.add_method_route(unsubscribe, name=self.unsubscribe_method_name)
+
+    def add_background_route(
+        self,
+        func: Union[FunctionType, Coroutine],
+        *,
+        name: str = None,
+        errors: List[Type[BaseError]] = None,
+        **kwargs,
+    ) -> None:
+        name = name or func.__name__
+        self.add_method_route(func, name=name, route_class=self.background_route_class, errors=errors, **kwargs)
+        route: BackgroundMethodRoute = self.method_routes[name]
+        companions = route.make_companion_methods()
+        self.add_method_route(companions['status'], name=f'{name}.status', errors=[JobNotFound])
+        self.add_method_route(
+            companions['result'],
+            name=f'{name}.result',
+            result_model=route.job_result_model or Any,
+            errors=[JobNotFound, JobNotFinished, JobCancelled, *(errors or [])],
+        )
+        self.add_method_route(companions['cancel'], name=f'{name}.cancel', errors=[JobNotFound])
+
+    def subscription(
+        self,
+        **kwargs,
+    ) -> Callable:
+        def decorator(func: Union[FunctionType, Coroutine]) -> Callable:
+            self.add_subscription_route(
+                func,
+                **kwargs,
+            )
+            return func
+
+        return decorator
+
+    def add_proxy_route(
+        self,
+        upstream: str,
+        *,
+        name: str = None,
+        namespace: str = None,
+        **client_kwargs,
+    ) -> 'ProxyRoute':
+        """Forward method (or methods '<namespace>.<method>') to upstream JSON-RPC entrypoint URL.
+
+        Upstream connections are pooled, see JsonRpcClient, client_kwargs are used for new upstream.
+        Shared dependencies are solved before forwarding, local methods take precedence over proxied.
+        """
+        if (name is None) == (namespace is None):
+            raise RuntimeError("Exactly one of 'name' and 'namespace' is required for proxy route")
+        from fastapi_jsonrpc.client import JsonRpcClient
+
+        client = self.upstream_clients.get(upstream)
+        if client is None:
+            client = self.upstream_clients[upstream] = JsonRpcClient(upstream, **client_kwargs)
+        route = ProxyRoute(client, name=name, namespace=namespace)
+        self.proxy_routes.append(route)
+        return route
+
+    def get_proxy_route(self, method: str) -> Optional['ProxyRoute']:
+        for route in self.proxy_routes:
+            if route.matches(method):
+                return route
+        return None
+
+    def add_websocket_entrypoint_route(
+        self,
+        path: str = None,
+        *,
+        name: str = None,
+        max_in_flight: int = 100,
+        max_buffer: int = 100,
+        slow_consumer_policy: str = 'disconnect',
+        max_subscriptions: int = 100,
+    ) -> WebSocketEntrypointRoute:
+        """Serve JSON-RPC over WebSocket, by default on the same path as HTTP entrypoint"""
+        route = self.websocket_entrypoint_route_class(
+            self,
+            path or self.entrypoint_route.path,
+            name=name,
+            max_in_flight=max_in_flight,
+            max_buffer=max_buffer,
+            slow_consumer_policy=slow_consumer_policy,
+            max_subscriptions=max_subscriptions,
+        )
+        self.routes.append(route)
+        self.websocket_routes.append(route)
+        return route
 
     def method(
         self,
@@ -1306,9 +4752,29 @@ class Entrypoint(APIRouter):
 
 
 class API(FastAPI):
-    def openapi(self):
-        result = super().openapi()
+    def get_openapi_routes(self) -> List[BaseRoute]:
+        routes = []
         for route in self.routes:
+            if isinstance(route, MethodRoutesDispatcher):
+                routes.extend(route.routes)
+            else:
+                routes.append(route)
+        return routes
+
+    @contextmanager
+    def _openapi_routes(self):
+        routes = self.router.routes
+        self.router.routes = self.get_openapi_routes()
+        try:
+            yield self.router.routes
+        finally:
+            self.router.routes = routes
+
+    def openapi(self):
+        # Collapsed method routes are not in application routes, but they must be in OpenAPI
+        with self._openapi_routes() as routes:
+            result = super().openapi()
+        for route in routes:
             if isinstance(route, (EntrypointRoute, MethodRoute, )):
                 route: Union[EntrypointRoute, MethodRoute]
                 for media_type in result['paths'][route.path]:
@@ -1317,10 +4783,25 @@ class API(FastAPI):
 
     def bind_entrypoint(self, ep: Entrypoint):
         ep.bind_dependency_overrides_provider(self)
-        self.routes.extend(ep.routes)
+        self.routes.extend(ep.get_app_routes())
+        self.on_event('startup')(ep.startup)
         self.on_event('shutdown')(ep.shutdown)
 
 
+class ProxyRoute:
+    """Calls of method name (or of methods '<namespace>.<method>') are forwarded to upstream by client"""
+
+    def __init__(self, client: 'JsonRpcClient', *, name: str = None, namespace: str = None):
+        self.client = client
+        self.name = name
+        self.namespace = namespace
+
+    def matches(self, method: str) -> bool:
+        if self.name is not None:
+            return method == self.name
+        return method.startswith(self.namespace + '.')
+
+
 if __name__ == '__main__':
     import uvicorn
 
@@ -0,0 +1,300 @@
+import asyncio
+import json
+import typing
+from typing import List, Union, Any, Callable, Type, Optional, Dict, Sequence, Awaitable
+
+from pydantic import BaseModel, ValidationError
+from fastapi.encoders import jsonable_encoder
+
+from fastapi_jsonrpc import BaseError, ParseError, InvalidRequest, MethodNotFound, InvalidParams, InternalError, \
+    RemoteError, invalid_params_from_validation_error
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+if typing.TYPE_CHECKING:
+    from fastapi_jsonrpc import Entrypoint, MethodRoute  # noqa
+
+
+class AutoBatcher:
+    """Merges requests submitted within window (or up to max_batch_size requests) into one batch.
+
+    Responses are demultiplexed to submitters by request id.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[list], Awaitable[Any]],
+        *,
+        window: float,
+        max_batch_size: int = 100,
+    ):
+        self.send = send
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.pending: List[typing.Tuple[dict, Optional[asyncio.Future]]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.tasks = set()
+
+    def submit(self, req: dict) -> Optional[asyncio.Future]:
+        """Returns future of response, None for notification"""
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future() if 'id' in req else None
+        self.pending.append((req, fut))
+        if len(self.pending) >= self.max_batch_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.window, self.flush)
+        return fut
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        task = asyncio.ensure_future(self.send_pending(pending))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def send_pending(self, pending: List[typing.Tuple[dict, Optional[asyncio.Future]]]):
+        try:
+            resp = await self.send([req for req, _ in pending])
+        except BaseException as exc:
+            # Submitters must not wait forever, whatever happened to the batch
+            cancelled = isinstance(exc, asyncio.CancelledError)
+            for _, fut in pending:
+                if fut is not None and not fut.done():
+                    if cancelled:
+                        fut.cancel()
+                    else:
+                        fut.set_exception(exc)
+            if cancelled or not isinstance(exc, Exception):
+                raise
+            # Error is delivered to submitters
+            return
+
+        if isinstance(resp, list):
+            resp_by_id = {item.get('id'): item for item in resp if isinstance(item, dict)}
+        else:
+            # Whole batch is rejected, e.g. batch too large
+            resp_by_id = None
+
+        for req, fut in pending:
+            if fut is None or fut.done():
+                continue
+            if resp_by_id is None:
+                item = resp
+            else:
+                item = resp_by_id.get(req['id'])
+            if isinstance(item, dict):
+                fut.set_result(item)
+            else:
+                fut.set_exception(InternalError(data={'details': f"no response for request id {req['id']!r}"}))
+
+    async def aclose(self):
+        self.flush()
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+
+class MethodStub:
+    """Client callable of MethodRoute: params and result are validated by _Request[...] and _Response[...] models"""
+
+    def __init__(self, client: 'JsonRpcClient', route: 'MethodRoute'):
+        self.client = client
+        self.route = route
+        self.name = route.name
+        self.request_model: Type[BaseModel] = route.body_field.type_
+        self.response_model: Type[BaseModel] = route.response_field.type_
+        self.__doc__ = route.func.__doc__
+
+    def encode_params(self, params: dict) -> Any:
+        try:
+            req = self.request_model.parse_obj({'jsonrpc': '2.0', 'id': 0, 'method': self.name, 'params': params})
+        except ValidationError as exc:
+            raise invalid_params_from_validation_error(exc)
+        # Server fills defaults itself
+        return jsonable_encoder(req.params, exclude_unset=True)
+
+    def decode_result(self, result: Any) -> Any:
+        return self.response_model.parse_obj({'jsonrpc': '2.0', 'id': 0, 'result': result}).result
+
+    async def __call__(self, **params) -> Any:
+        return self.decode_result(await self.client.call(self.name, self.encode_params(params)))
+
+    async def notify(self, **params) -> None:
+        await self.client.notify(self.name, self.encode_params(params))
+
+
+class MethodStubs:
+    def __init__(self, stubs: Dict[str, MethodStub]):
+        self._stubs = stubs
+
+    def __getattr__(self, name: str) -> MethodStub:
+        try:
+            return self._stubs[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __getitem__(self, name: str) -> MethodStub:
+        return self._stubs[name]
+
+    def __iter__(self):
+        return iter(self._stubs)
+
+    def __dir__(self):
+        return list(self._stubs)
+
+
+class JsonRpcClient:
+    """Async JSON-RPC client over pooled keep-alive HTTP connections, requires httpx.
+
+    With batch_window (seconds) concurrent calls are merged into batch requests, see AutoBatcher.
+    With entrypoint, client.methods has typed stubs of its methods, see MethodStub.
+    """
+
+    method_stub_class = MethodStub
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        entrypoint: 'Entrypoint' = None,
+        http_client: 'httpx.AsyncClient' = None,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        timeout: float = 5.0,
+        headers: Dict[str, str] = None,
+        batch_window: float = None,
+        max_batch_size: int = 100,
+        errors: Sequence[Type[BaseError]] = None,
+    ):
+        self.url = url
+        self.own_http_client = http_client is None
+        if http_client is None:
+            if httpx is None:
+                raise RuntimeError("httpx is required for JsonRpcClient")
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=max_connections,
+                    max_keepalive_connections=max_keepalive_connections,
+                ),
+                timeout=timeout,
+                headers=headers,
+            )
+        self.http_client = http_client
+
+        self.batcher = None
+        if batch_window is not None:
+            self.batcher = AutoBatcher(self.send, window=batch_window, max_batch_size=max_batch_size)
+
+        self.last_id = 0
+
+        error_classes = [ParseError, InvalidRequest, MethodNotFound, InvalidParams, InternalError]
+        stubs = {}
+        if entrypoint is not None:
+            error_classes.extend(entrypoint.entrypoint_route.errors)
+            for name, route in entrypoint.method_routes.items():
+                error_classes.extend(route.errors)
+                stubs[name] = self.method_stub_class(self, route)
+        error_classes.extend(errors or [])
+        self.error_classes: Dict[int, Type[BaseError]] = {cls.CODE: cls for cls in error_classes}
+        self.methods = MethodStubs(stubs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        if self.batcher is not None:
+            await self.batcher.aclose()
+        if self.own_http_client:
+            await self.http_client.aclose()
+
+    def next_id(self) -> int:
+        self.last_id += 1
+        return self.last_id
+
+    def make_error(self, error: dict) -> BaseError:
+        code = error.get('code')
+        data = error.get('data')
+        error_cls = self.error_classes.get(code)
+        if error_cls is not None:
+            try:
+                return error_cls(data=data)
+            except (TypeError, ValidationError):
+                pass
+        return RemoteError(code, error.get('message'), data)
+
+    def get_result(self, resp: dict) -> Any:
+        if 'error' in resp:
+            raise self.make_error(resp['error'])
+        return resp.get('result')
+
+    async def send(self, body: Union[dict, list]) -> Any:
+        """POST request or batch, returns decoded response body, None for notifications"""
+        http_resp = await self.http_client.post(
+            self.url,
+            content=json.dumps(body, separators=(',', ':')),
+            headers={'content-type': 'application/json'},
+        )
+        http_resp.raise_for_status()
+        if not http_resp.content:
+            return None
+        return json.loads(http_resp.content)
+
+    async def send_req(self, req: dict) -> Optional[dict]:
+        if self.batcher is not None:
+            fut = self.batcher.submit(req)
+            return await fut if fut is not None else None
+        resp = await self.send(req)
+        if isinstance(resp, list):
+            # Unexpected, but server may answer with batch
+            resp, = resp
+        return resp
+
+    def make_req(self, method: str, params: Any = None, notification: bool = False) -> dict:
+        req = {'jsonrpc': '2.0', 'method': method}
+        if params is not None:
+            req['params'] = params
+        if not notification:
+            req['id'] = self.next_id()
+        return req
+
+    async def call(self, method: str, params: Any = None) -> Any:
+        """Call method, errors are raised as BaseError"""
+        return self.get_result(await self.send_req(self.make_req(method, params)))
+
+    async def notify(self, method: str, params: Any = None) -> None:
+        await self.send_req(self.make_req(method, params, notification=True))
+
+    async def call_batch(self, calls: Sequence[typing.Tuple[str, Any]]) -> List[Any]:
+        """Call methods in one batch request, as [(method, params), ...].
+
+        Results of failed calls are BaseError instances.
+        """
+        reqs = [self.make_req(method, params) for method, params in calls]
+        if not reqs:
+            return []
+        resp = await self.send(reqs)
+        if isinstance(resp, dict):
+            # Whole batch is rejected
+            error = self.make_error(resp.get('error', {}))
+            return [error for _ in reqs]
+        resp_by_id = {item.get('id'): item for item in resp}
+        results = []
+        for req in reqs:
+            item = resp_by_id.get(req['id'])
+            if item is None:
+                results.append(InternalError(data={'details': f"no response for request id {req['id']!r}"}))
+            elif 'error' in item:
+                results.append(self.make_error(item['error']))
+            else:
+                results.append(item.get('result'))
+        return results
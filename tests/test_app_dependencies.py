@@ -0,0 +1,124 @@
+import gc
+
+import pytest
+from fastapi import Depends, Header
+from starlette.testclient import TestClient
+
+import fastapi_jsonrpc as jsonrpc
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def get_settings(calls):
+    def get_settings():
+        calls.append('settings')
+        return {'dsn': 'db://test'}
+
+    return get_settings
+
+
+@pytest.fixture
+def get_pool(calls, get_settings):
+    async def get_pool(settings: dict = Depends(get_settings)):
+        calls.append('pool enter')
+        yield f"pool({settings['dsn']})"
+        calls.append('pool exit')
+
+    return get_pool
+
+
+@pytest.fixture
+def ep(ep_path, get_pool):
+    ep = jsonrpc.Entrypoint(ep_path, dependencies=[jsonrpc.AppDepends(get_pool)])
+
+    @ep.method()
+    def probe(
+        pool: str = jsonrpc.AppDepends(get_pool),
+    ) -> str:
+        return pool
+
+    return ep
+
+
+def test_resolved_once(ep, json_request, calls):
+    assert json_request({'id': 1, 'jsonrpc': '2.0', 'method': 'probe'}) == {
+        'id': 1, 'jsonrpc': '2.0', 'result': 'pool(db://test)',
+    }
+    assert json_request([
+        {'id': 2, 'jsonrpc': '2.0', 'method': 'probe'},
+        {'id': 3, 'jsonrpc': '2.0', 'method': 'probe'},
+    ]) == [
+        {'id': 2, 'jsonrpc': '2.0', 'result': 'pool(db://test)'},
+        {'id': 3, 'jsonrpc': '2.0', 'result': 'pool(db://test)'},
+    ]
+    assert calls == ['settings', 'pool enter']
+    assert list(ep.app_dependency_values.values()) == ['pool(db://test)']
+
+
+def test_startup_shutdown(app, ep_path, calls):
+    with TestClient(app) as client:
+        assert calls == ['settings', 'pool enter']
+        resp = client.post(ep_path, json={'id': 1, 'jsonrpc': '2.0', 'method': 'probe'}).json()
+        assert resp == {'id': 1, 'jsonrpc': '2.0', 'result': 'pool(db://test)'}
+        assert calls == ['settings', 'pool enter']
+    assert calls == ['settings', 'pool enter', 'pool exit']
+
+
+def test_overrides(app, get_settings, json_request):
+    app.dependency_overrides[get_settings] = lambda: {'dsn': 'db://override'}
+    assert json_request({'id': 1, 'jsonrpc': '2.0', 'method': 'probe'}) == {
+        'id': 1, 'jsonrpc': '2.0', 'result': 'pool(db://override)',
+    }
+
+
+def test_same_app_dependency(get_pool):
+    assert jsonrpc.AppDepends(get_pool).dependency is jsonrpc.AppDepends(get_pool).dependency
+
+
+def test_request_params_not_allowed(ep_path):
+    def get_client(x_token: str = Header(...)):
+        return x_token
+
+    ep = jsonrpc.Entrypoint(ep_path)
+
+    @ep.method()
+    def probe_client(client: str = jsonrpc.AppDepends(get_client)) -> str:
+        return client
+
+    app = jsonrpc.API()
+    app.bind_entrypoint(ep)
+
+    with pytest.raises(RuntimeError, match="can't be resolved"):
+        with TestClient(app):
+            pass
+
+
+def test_overrides_after_resolve(app, ep, get_settings, ep_path, calls):
+    with TestClient(app) as client:
+        req = {'id': 1, 'jsonrpc': '2.0', 'method': 'probe'}
+        assert client.post(ep_path, json=req).json()['result'] == 'pool(db://test)'
+        app.dependency_overrides[get_settings] = lambda: {'dsn': 'db://override'}
+        assert client.post(ep_path, json=req).json()['result'] == 'pool(db://override)'
+        assert client.post(ep_path, json=req).json()['result'] == 'pool(db://override)'
+        app.dependency_overrides.clear()
+        assert client.post(ep_path, json=req).json()['result'] == 'pool(db://test)'
+    # Values resolved before overrides are torn down on shutdown
+    assert calls == [
+        'settings', 'pool enter',
+        'pool enter',
+        'settings', 'pool enter',
+        'pool exit', 'pool exit', 'pool exit',
+    ]
+
+
+def test_app_dependencies_held_weakly():
+    def get_resource():
+        return 'resource'
+
+    jsonrpc.AppDepends(get_resource)
+    gc.collect()
+    assert get_resource not in jsonrpc._app_dependencies
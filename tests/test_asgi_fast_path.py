@@ -0,0 +1,100 @@
+from json import dumps as json_dumps
+
+import pytest
+from fastapi import Body, Depends, Header, Response, BackgroundTasks
+
+import fastapi_jsonrpc as jsonrpc
+
+
+def get_auth(x_auth: str = Header('guest')) -> str:
+    return x_auth
+
+
+@pytest.fixture
+def ep(ep_path):
+    ep = jsonrpc.Entrypoint(ep_path, asgi_fast_path=True, dependencies=[Depends(get_auth)])
+
+    @ep.method()
+    def probe(
+        data: str = Body(..., example='123'),
+        auth: str = Depends(get_auth),
+    ) -> str:
+        return f'{auth}:{data}'
+
+    @ep.method()
+    def probe_response(
+        http_response: Response,
+        data: str = Body(..., example='123'),
+    ) -> str:
+        http_response.set_cookie(key='probe-cookie', value=data)
+        http_response.status_code = 404
+        return data
+
+    return ep
+
+
+def test_fast_path_bound(ep):
+    assert ep.entrypoint_route.app == ep.entrypoint_route.handle_asgi
+
+
+def test_basic(raw_request):
+    body = json_dumps({'id': 1, 'jsonrpc': '2.0', 'method': 'probe', 'params': {'data': 'one'}})
+    response = raw_request(body)
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/json'
+    assert response.json() == {'id': 1, 'jsonrpc': '2.0', 'result': 'guest:one'}
+
+
+def test_batch(json_request):
+    resp = json_request([
+        {'id': 1, 'jsonrpc': '2.0', 'method': 'probe', 'params': {'data': 'one'}},
+        {'id': 2, 'jsonrpc': '2.0', 'method': 'unknown'},
+    ])
+    assert resp == [
+        {'id': 1, 'jsonrpc': '2.0', 'result': 'guest:one'},
+        {'id': 2, 'jsonrpc': '2.0', 'error': {'code': -32601, 'message': 'Method not found'}},
+    ]
+
+
+def test_notification(raw_request):
+    response = raw_request(json_dumps({'jsonrpc': '2.0', 'method': 'probe', 'params': {'data': 'one'}}))
+    assert response.status_code == 200
+    assert response.content == b''
+
+
+def test_parse_error(raw_request):
+    response = raw_request('{')
+    assert response.json() == {'id': None, 'jsonrpc': '2.0', 'error': {'code': -32700, 'message': 'Parse error'}}
+
+
+def test_sub_response(raw_request):
+    body = json_dumps({'id': 1, 'jsonrpc': '2.0', 'method': 'probe_response', 'params': {'data': 'one'}})
+    response = raw_request(body)
+    assert response.status_code == 404
+    assert response.cookies['probe-cookie'] == 'one'
+    assert response.json() == {'id': 1, 'jsonrpc': '2.0', 'result': 'one'}
+
+
+def test_background_tasks(ep, raw_request):
+    calls = []
+
+    @ep.method()
+    def probe_background(background_tasks: BackgroundTasks) -> str:
+        background_tasks.add_task(calls.append, 'called')
+        return 'ok'
+
+    assert ep.entrypoint_route.app == ep.entrypoint_route.handle_asgi
+
+    response = raw_request(json_dumps({'id': 1, 'jsonrpc': '2.0', 'method': 'probe_background'}))
+    assert response.json() == {'id': 1, 'jsonrpc': '2.0', 'result': 'ok'}
+    assert calls == ['called']
+
+    # Notifications too
+    response = raw_request(json_dumps({'jsonrpc': '2.0', 'method': 'probe_background'}))
+    assert response.content == b''
+    assert calls == ['called', 'called']
+
+
+def test_disabled_by_default(ep_path):
+    ep = jsonrpc.Entrypoint(ep_path)
+    assert ep.entrypoint_route.app != ep.entrypoint_route.handle_asgi
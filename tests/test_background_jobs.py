@@ -0,0 +1,197 @@
+import asyncio
+
+import pytest
+from fastapi import Body, Depends
+from pydantic import BaseModel
+from starlette.testclient import TestClient
+
+import fastapi_jsonrpc as jsonrpc
+
+
+class Report(BaseModel):
+    rows: int
+
+
+class ReportError(jsonrpc.BaseError):
+    CODE = 5000
+    MESSAGE = "Report error"
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def gates():
+    return {}
+
+
+@pytest.fixture
+def ep(ep_path, calls, gates):
+    ep = jsonrpc.Entrypoint(ep_path)
+
+    async def get_session():
+        calls.append('session enter')
+        try:
+            yield 'session'
+        finally:
+            calls.append('session exit')
+
+    @ep.method(background=True, errors=[ReportError])
+    async def build_report(
+        rows: int = Body(...),
+        session: str = Depends(get_session),
+    ) -> Report:
+        calls.append(f'build {session}')
+        gate = gates.get(rows)
+        if gate is not None:
+            await gate.wait()
+        if rows < 0:
+            raise ReportError
+        return Report(rows=rows)
+
+    @ep.method(background=True)
+    def sync_job() -> int:
+        return 1
+
+    return ep
+
+
+async def wait_finished(ep, method, job_id):
+    for _ in range(100):
+        status = await ep.call(f'{method}.status', {'job_id': job_id})
+        if status.status not in ('pending', 'running'):
+            return status
+        await asyncio.sleep(0.01)
+    raise AssertionError('job is not finished')
+
+
+def test_done(ep, calls, gates):
+    async def main():
+        gates[10] = asyncio.Event()
+        job_id = await ep.call('build_report', {'rows': 10})
+        assert isinstance(job_id, str)
+        await asyncio.sleep(0)
+        status = await ep.call('build_report.status', {'job_id': job_id})
+        assert status == jsonrpc.JobStatus(id=job_id, status='running')
+        with pytest.raises(jsonrpc.JobNotFinished):
+            await ep.call('build_report.result', {'job_id': job_id})
+
+        gates[10].set()
+        assert (await wait_finished(ep, 'build_report', job_id)).status == 'done'
+        assert await ep.call('build_report.result', {'job_id': job_id}) == Report(rows=10)
+        # Result is kept until ttl expires
+        assert await ep.call('build_report.result', {'job_id': job_id}) == Report(rows=10)
+        assert ep.running_jobs == {}
+
+        job_id = await ep.call('sync_job')
+        await wait_finished(ep, 'sync_job', job_id)
+        assert await ep.call('sync_job.result', {'job_id': job_id}) == 1
+
+    asyncio.run(main())
+    assert calls[:3] == ['session enter', 'build session', 'session exit']
+
+
+def test_failed(ep):
+    async def main():
+        job_id = await ep.call('build_report', {'rows': -1})
+        status = await wait_finished(ep, 'build_report', job_id)
+        assert status.status == 'failed'
+        assert status.error == jsonrpc.JobError(code=5000, message='Report error')
+        with pytest.raises(jsonrpc.BaseError) as exc_info:
+            await ep.call('build_report.result', {'job_id': job_id})
+        assert exc_info.value.get_resp()['error'] == {'code': 5000, 'message': 'Report error'}
+
+    asyncio.run(main())
+
+
+def test_cancel(ep, calls, gates):
+    async def main():
+        gates[10] = asyncio.Event()
+        job_id = await ep.call('build_report', {'rows': 10})
+        await asyncio.sleep(0)
+        assert await ep.call('build_report.cancel', {'job_id': job_id}) is True
+        assert (await ep.call('build_report.status', {'job_id': job_id})).status == 'cancelled'
+        with pytest.raises(jsonrpc.JobCancelled):
+            await ep.call('build_report.result', {'job_id': job_id})
+        assert await ep.call('build_report.cancel', {'job_id': job_id}) is False
+
+    asyncio.run(main())
+    assert calls == ['session enter', 'build session', 'session exit']
+
+
+def test_not_found(ep):
+    async def main():
+        job_id = await ep.call('sync_job')
+        with pytest.raises(jsonrpc.JobNotFound):
+            await ep.call('build_report.status', {'job_id': job_id})
+        with pytest.raises(jsonrpc.JobNotFound):
+            await ep.call('build_report.result', {'job_id': 'unknown'})
+
+    asyncio.run(main())
+
+
+def test_ttl(ep):
+    ep.job_ttl = 0.01
+
+    async def main():
+        job_id = await ep.call('sync_job')
+        await asyncio.sleep(0.05)
+        with pytest.raises(jsonrpc.JobNotFound):
+            await ep.call('sync_job.status', {'job_id': job_id})
+        assert ep.job_store.states == {}
+
+    asyncio.run(main())
+
+
+def test_dedicated_scheduler(ep, gates):
+    ep.jobs_scheduler_kwargs = {'limit': 1}
+
+    async def main():
+        gates[1] = asyncio.Event()
+        first_id = await ep.call('build_report', {'rows': 1})
+        second_id = await ep.call('build_report', {'rows': 2})
+        await asyncio.sleep(0.01)
+        assert (await ep.call('build_report.status', {'job_id': second_id})).status == 'pending'
+        # Cancelled before it started
+        assert await ep.call('build_report.cancel', {'job_id': second_id}) is True
+        gates[1].set()
+        assert (await wait_finished(ep, 'build_report', first_id)).status == 'done'
+        assert (await ep.call('build_report.status', {'job_id': second_id})).status == 'cancelled'
+        assert ep.jobs_scheduler is not None
+        await ep.shutdown()
+
+    asyncio.run(main())
+
+
+def test_http(app, ep_path):
+    with TestClient(app) as client:
+        def call(method, params):
+            return client.post(ep_path, json={'id': 1, 'jsonrpc': '2.0', 'method': method, 'params': params}).json()
+
+        job_id = call('build_report', {'rows': 3})['result']
+        for _ in range(100):
+            resp = call('build_report.result', {'job_id': job_id})
+            if resp.get('error', {}).get('code') != jsonrpc.JobNotFinished.CODE:
+                break
+        assert resp == {'id': 1, 'jsonrpc': '2.0', 'result': {'rows': 3}}
+
+
+def test_shutdown_cancels(ep, gates):
+    async def main():
+        gates[10] = asyncio.Event()
+        job_id = await ep.call('build_report', {'rows': 10})
+        await asyncio.sleep(0)
+        await ep.shutdown()
+        assert ep.running_jobs == {}
+        assert (await ep.job_store.get(job_id))['status'] == 'cancelled'
+
+    asyncio.run(main())
+
+
+def test_openapi(app):
+    paths = TestClient(app).get('/openapi.json').json()['paths']
+    assert {'build_report', 'build_report.status', 'build_report.result', 'build_report.cancel'} <= {
+        path.rsplit('/', 1)[-1] for path in paths
+    }
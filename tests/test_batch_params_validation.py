@@ -0,0 +1,112 @@
+from typing import List, Optional
+
+import pytest
+from fastapi import Body, Depends, Header
+from pydantic import BaseModel
+
+import fastapi_jsonrpc as jsonrpc
+
+
+class WholeParams(BaseModel):
+    data: List[str]
+    amount: int = 1
+
+
+class AuthError(jsonrpc.BaseError):
+    CODE = 7000
+    MESSAGE = "Auth error"
+
+
+def get_auth(x_auth: str = Header('guest')) -> str:
+    if x_auth == 'bad':
+        raise AuthError
+    return x_auth
+
+
+@pytest.fixture
+def ep(ep):
+    @ep.method(errors=[AuthError])
+    def probe(
+        auth: str = Depends(get_auth),
+        data: str = Body(...),
+        amount: int = Body(1),
+        comment: Optional[str] = Body(None),
+    ) -> str:
+        return f'{auth}:{data}:{amount}:{comment}'
+
+    @ep.method()
+    def probe_whole(
+        whole_params: WholeParams = jsonrpc.Params(...),
+    ) -> List[int]:
+        return [int(item) + whole_params.amount for item in whole_params.data]
+
+    return ep
+
+
+PROBE_PARAMS = [
+    {'data': 'one'},
+    {'data': 'two', 'amount': '2', 'comment': 'test'},
+    {'data': 'three', 'amount': None},
+    {'data': None},
+    {'amount': 'many'},
+    {'data': 'four', 'unknown': 1},
+]
+
+PROBE_WHOLE_PARAMS = [
+    {'data': ['1', '2']},
+    {'data': ['1'], 'amount': 10},
+    {'data': 'wrong'},
+    {'data': None},
+    {},
+]
+
+
+def make_batch(method, params_list):
+    return [
+        {'id': idx, 'jsonrpc': '2.0', 'method': method, 'params': params}
+        for idx, params in enumerate(params_list)
+    ]
+
+
+@pytest.mark.parametrize('method, params_list', [
+    ('probe', PROBE_PARAMS),
+    ('probe', PROBE_PARAMS[:3]),
+    ('probe_whole', PROBE_WHOLE_PARAMS),
+    ('probe_whole', PROBE_WHOLE_PARAMS[:2]),
+])
+def test_same_as_single(json_request, method, params_list):
+    batch = make_batch(method, params_list)
+    assert json_request(batch) == [json_request(req) for req in batch]
+
+
+def test_validated_once(ep, json_request, monkeypatch):
+    route = ep.method_routes['probe']
+    batch_calls = []
+    original = route.validate_batch_params
+
+    def validate_batch_params(params_list):
+        batch_calls.append(params_list)
+        return original(params_list)
+
+    monkeypatch.setattr(route, 'validate_batch_params', validate_batch_params)
+
+    resp = json_request(make_batch('probe', PROBE_PARAMS[:3]) + make_batch('probe_whole', PROBE_WHOLE_PARAMS[:1]))
+    assert [r['result'] for r in resp] == ['guest:one:1:None', 'guest:two:2:test', 'guest:three:1:None', [2, 3]]
+    assert batch_calls == [PROBE_PARAMS[:3]]
+
+
+def test_dependency_error_first(app_client, ep_path):
+    resp = app_client.post(ep_path, json=make_batch('probe', [{'data': 'one'}, {'amount': 'many'}]), headers={
+        'X-Auth': 'bad',
+    }).json()
+    assert [r['error']['code'] for r in resp] == [7000, 7000]
+
+
+def test_not_eligible(ep):
+    @ep.method()
+    def probe_common(
+        auth: str = Depends(get_auth),
+    ) -> str:
+        return auth
+
+    assert ep.method_routes['probe_common'].batch_params_field is None
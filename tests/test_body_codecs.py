@@ -0,0 +1,124 @@
+import pytest
+from fastapi import Body
+
+import fastapi_jsonrpc as jsonrpc
+
+msgpack = pytest.importorskip('msgpack')
+
+
+class EchoError(jsonrpc.BaseError):
+    CODE = 5000
+    MESSAGE = "Echo error"
+
+
+@pytest.fixture(params=[False, True])
+def asgi_fast_path(request):
+    return request.param
+
+
+@pytest.fixture
+def ep(ep_path, asgi_fast_path):
+    ep = jsonrpc.Entrypoint(ep_path, max_batch_size=3, asgi_fast_path=asgi_fast_path)
+
+    @ep.method(errors=[EchoError])
+    def echo(
+        data: str = Body(...),
+    ) -> str:
+        if data == 'error':
+            raise EchoError
+        return data
+
+    return ep
+
+
+def make_req(request_id=1):
+    req = {'jsonrpc': '2.0', 'method': 'echo', 'params': {'data': 'x'}}
+    if request_id is not None:
+        req['id'] = request_id
+    return req
+
+
+@pytest.fixture
+def msgpack_request(app_client, ep_path):
+    def requester(data, path_postfix='', accept='application/msgpack', raw=False):
+        resp = app_client.post(ep_path + path_postfix, data=data if raw else msgpack.packb(data), headers={
+            'Content-Type': 'application/msgpack',
+            'Accept': accept,
+        })
+        assert resp.headers['content-type'] == accept
+        return msgpack.unpackb(resp.content)
+    return requester
+
+
+@pytest.mark.parametrize('path_postfix', ['', '/echo'])
+def test_call(msgpack_request, path_postfix):
+    resp = msgpack_request({'id': 1, 'jsonrpc': '2.0', 'method': 'echo', 'params': {'data': 'ping'}}, path_postfix)
+    assert resp == {'id': 1, 'jsonrpc': '2.0', 'result': 'ping'}
+
+
+def test_batch(msgpack_request):
+    resp = msgpack_request([
+        {'id': 1, 'jsonrpc': '2.0', 'method': 'echo', 'params': {'data': 'one'}},
+        {'jsonrpc': '2.0', 'method': 'echo', 'params': {'data': 'notification'}},
+        {'id': 2, 'jsonrpc': '2.0', 'method': 'echo', 'params': {'data': 'error'}},
+    ])
+    assert resp == [
+        {'id': 1, 'jsonrpc': '2.0', 'result': 'one'},
+        {'id': 2, 'jsonrpc': '2.0', 'error': {'code': 5000, 'message': 'Echo error'}},
+    ]
+
+
+def test_batch_too_large(msgpack_request):
+    resp = msgpack_request([make_req(idx) for idx in range(4)])
+    assert resp['error']['data']['errors'][0]['type'] == 'value_error.batch_too_large'
+
+
+def test_parse_error(msgpack_request):
+    resp = msgpack_request(b'\xc1', raw=True)
+    assert resp == {'id': None, 'jsonrpc': '2.0', 'error': {'code': -32700, 'message': 'Parse error'}}
+
+
+def test_notification(app_client, ep_path):
+    resp = app_client.post(ep_path, data=msgpack.packb(make_req(None)), headers={
+        'Content-Type': 'application/msgpack',
+        'Accept': 'application/msgpack',
+    })
+    assert resp.content == b''
+
+
+@pytest.mark.parametrize('accept', [
+    '*/*',
+    'application/json',
+    'application/json, application/msgpack;q=0.5',
+])
+def test_json_response(app_client, ep_path, accept):
+    resp = app_client.post(ep_path, data=msgpack.packb(make_req()), headers={
+        'Content-Type': 'application/msgpack',
+        'Accept': accept,
+    })
+    assert resp.headers['content-type'] == 'application/json'
+    assert resp.json() == {'id': 1, 'jsonrpc': '2.0', 'result': 'x'}
+
+
+def test_json_request(msgpack_request):
+    resp = msgpack_request(b'{"id": 1, "jsonrpc": "2.0", "method": "echo", "params": {"data": "x"}}', raw=True)
+    assert resp == {'id': None, 'jsonrpc': '2.0', 'error': {'code': -32700, 'message': 'Parse error'}}
+
+
+def test_cbor(app_client, ep_path):
+    cbor2 = pytest.importorskip('cbor2')
+    resp = app_client.post(ep_path, data=cbor2.dumps(make_req()), headers={
+        'Content-Type': 'application/cbor',
+        'Accept': 'application/cbor',
+    })
+    assert resp.headers['content-type'] == 'application/cbor'
+    assert cbor2.loads(resp.content) == {'id': 1, 'jsonrpc': '2.0', 'result': 'x'}
+
+
+def test_disabled(ep, app_client, ep_path):
+    ep.media_types = []
+    resp = app_client.post(ep_path, data=msgpack.packb(make_req()), headers={
+        'Content-Type': 'application/msgpack',
+        'Accept': 'application/msgpack',
+    })
+    assert resp.json() == {'id': None, 'jsonrpc': '2.0', 'error': {'code': -32700, 'message': 'Parse error'}}
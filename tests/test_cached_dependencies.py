@@ -0,0 +1,205 @@
+import asyncio
+from json import dumps as json_dumps
+
+import pytest
+from fastapi import BackgroundTasks, Body, Depends, Header, Request, Response, WebSocket
+from fastapi.security import SecurityScopes
+from starlette.testclient import TestClient
+
+import fastapi_jsonrpc as jsonrpc
+
+
+class AuthError(jsonrpc.BaseError):
+    CODE = 7000
+    MESSAGE = "Auth error"
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def get_principal(calls):
+    async def get_principal(x_token: str = Header(...)) -> str:
+        calls.append(x_token)
+        if x_token == 'bad':
+            raise AuthError
+        return f'user-{x_token}'
+
+    return get_principal
+
+
+@pytest.fixture
+def ep(ep_path, get_principal):
+    principal = jsonrpc.CachedDepends(get_principal, ttl=60, maxsize=2, errors_ttl=60)
+    ep = jsonrpc.Entrypoint(ep_path, dependencies=[principal])
+
+    @ep.method(errors=[AuthError])
+    def whoami(principal: str = principal) -> str:
+        return principal
+
+    return ep
+
+
+@pytest.fixture
+def whoami(app_client, ep_path):
+    def requester(token):
+        return app_client.post(
+            ep_path,
+            data=json_dumps({'id': 1, 'jsonrpc': '2.0', 'method': 'whoami'}),
+            headers={'X-Token': token},
+        ).json()
+    return requester
+
+
+def test_cached(whoami, calls):
+    assert whoami('one') == {'id': 1, 'jsonrpc': '2.0', 'result': 'user-one'}
+    assert whoami('one') == {'id': 1, 'jsonrpc': '2.0', 'result': 'user-one'}
+    assert whoami('two') == {'id': 1, 'jsonrpc': '2.0', 'result': 'user-two'}
+    assert calls == ['one', 'two']
+
+
+def test_errors_cached(whoami, calls):
+    error = {'id': 1, 'jsonrpc': '2.0', 'error': {'code': 7000, 'message': 'Auth error'}}
+    assert whoami('bad') == error
+    assert whoami('bad') == error
+    assert calls == ['bad']
+
+
+def test_maxsize(whoami, calls):
+    whoami('one')
+    whoami('two')
+    whoami('three')
+    whoami('one')
+    assert calls == ['one', 'two', 'three', 'one']
+
+
+def test_ttl(whoami, calls, get_principal, monkeypatch):
+    whoami('one')
+    cached = jsonrpc.CachedDepends(get_principal, ttl=60, maxsize=2, errors_ttl=60).dependency
+    monkeypatch.setattr(jsonrpc.time, 'monotonic', lambda: cached.cache[('one', )][0] + 1)
+    whoami('one')
+    assert calls == ['one', 'one']
+
+
+def test_overrides_bypass_cache(app, whoami, calls, get_principal):
+    app.dependency_overrides[get_principal] = lambda: 'fake'
+    assert whoami('one') == {'id': 1, 'jsonrpc': '2.0', 'result': 'fake'}
+    assert whoami('one') == {'id': 1, 'jsonrpc': '2.0', 'result': 'fake'}
+    assert calls == []
+
+
+def test_overrides_bypass_cache_of_each_wrapper(ep_path, calls, get_principal):
+    short = jsonrpc.CachedDepends(get_principal, ttl=1)
+    long = jsonrpc.CachedDepends(get_principal, ttl=60)
+    assert short.dependency != long.dependency
+
+    ep = jsonrpc.Entrypoint(ep_path)
+
+    @ep.method()
+    def whoami(principal: str = short, principal_long: str = long) -> str:
+        return f'{principal}:{principal_long}'
+
+    app = jsonrpc.API()
+    app.bind_entrypoint(ep)
+    app.dependency_overrides[get_principal] = lambda: 'fake'
+    resp = TestClient(app).post(ep_path, json={'id': 1, 'jsonrpc': '2.0', 'method': 'whoami'})
+    assert resp.json() == {'id': 1, 'jsonrpc': '2.0', 'result': 'fake:fake'}
+    assert calls == []
+
+
+def test_errors_raised_as_new_instances(get_principal):
+    cached = jsonrpc.CachedDependency(get_principal, ttl=60, errors_ttl=60)
+
+    async def call():
+        try:
+            await cached(x_token='bad')
+        except AuthError as error:
+            return error
+
+    first, second = asyncio.run(call()), asyncio.run(call())
+    assert isinstance(second, AuthError)
+    assert first is not second
+
+
+def test_body_params_in_key(ep_path):
+    calls = []
+
+    def get_item(item_id: int = Body(...)) -> str:
+        calls.append(item_id)
+        return f'item-{item_id}'
+
+    ep = jsonrpc.Entrypoint(ep_path)
+
+    @ep.method()
+    def get_name(item: str = jsonrpc.CachedDepends(get_item, ttl=60)) -> str:
+        return item
+
+    app = jsonrpc.API()
+    app.bind_entrypoint(ep)
+    client = TestClient(app)
+
+    for item_id in [1, 2, 1]:
+        resp = client.post(ep_path, json={
+            'id': 1, 'jsonrpc': '2.0', 'method': 'get_name', 'params': {'item_id': item_id},
+        })
+        assert resp.json() == {'id': 1, 'jsonrpc': '2.0', 'result': f'item-{item_id}'}
+    assert calls == [1, 2]
+
+
+def test_yield_dependency_not_allowed():
+    def get_resource():
+        yield 1
+
+    with pytest.raises(RuntimeError, match="can't be cached"):
+        jsonrpc.CachedDepends(get_resource, ttl=1)
+
+
+@pytest.mark.parametrize('param_type', [Request, WebSocket, Response, BackgroundTasks, SecurityScopes])
+def test_request_bound_params_not_allowed(param_type):
+    def get_principal(param: param_type) -> str:
+        return 'principal'
+
+    with pytest.raises(RuntimeError, match="with param 'param' can't be cached"):
+        jsonrpc.CachedDepends(get_principal, ttl=1)
+
+
+def test_request_in_sub_dependency(ep_path):
+    def get_user(request: Request) -> str:
+        return request.headers['x-user']
+
+    def get_principal(user: str = Depends(get_user)) -> str:
+        return f'principal-{user}'
+
+    ep = jsonrpc.Entrypoint(ep_path)
+
+    @ep.method()
+    def whoami(principal: str = jsonrpc.CachedDepends(get_principal, ttl=60)) -> str:
+        return principal
+
+    app = jsonrpc.API()
+    app.bind_entrypoint(ep)
+    client = TestClient(app)
+
+    for user in ['alice', 'bob', 'alice']:
+        resp = client.post(ep_path, json={'id': 1, 'jsonrpc': '2.0', 'method': 'whoami'}, headers={'X-User': user})
+        assert resp.json() == {'id': 1, 'jsonrpc': '2.0', 'result': f'principal-{user}'}
+
+
+def test_unhashable_inputs_not_cached():
+    calls = []
+
+    def get_config() -> dict:
+        return {}
+
+    def get_limit(config: dict = Depends(get_config)) -> int:
+        calls.append(config)
+        return 1
+
+    cached = jsonrpc.CachedDependency(get_limit, ttl=60)
+
+    assert asyncio.run(cached(config={})) == 1
+    assert asyncio.run(cached(config={})) == 1
+    assert len(calls) == 2
+    assert not cached.cache
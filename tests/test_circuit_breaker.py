@@ -0,0 +1,160 @@
+import asyncio
+
+import pytest
+from fastapi import Body, Depends
+
+import fastapi_jsonrpc as jsonrpc
+
+
+class DownstreamError(jsonrpc.BaseError):
+    CODE = 5020
+    MESSAGE = "Downstream error"
+
+
+@pytest.fixture
+def now(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(jsonrpc.time, 'monotonic', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def downstream():
+    return {'failing': False}
+
+
+@pytest.fixture
+def breaker():
+    return jsonrpc.CircuitBreaker(
+        'billing',
+        min_calls=4,
+        failure_rate=0.5,
+        window=10,
+        open_timeout=5,
+        failure_errors=[DownstreamError],
+    )
+
+
+@pytest.fixture
+def ep(ep_path, calls, downstream, breaker):
+    ep = jsonrpc.Entrypoint(ep_path)
+
+    def get_connection():
+        calls.append('connect')
+        return 'connection'
+
+    @ep.method(circuit_breaker=breaker, errors=[DownstreamError])
+    def charge(
+        amount: int = Body(...),
+        connection: str = Depends(get_connection),
+    ) -> int:
+        if downstream['failing']:
+            raise DownstreamError
+        if amount == 0:
+            raise asyncio.TimeoutError()
+        return amount
+
+    @ep.method(circuit_breaker=breaker)
+    def refund(
+        amount: int = Body(...),
+    ) -> int:
+        return -amount
+
+    return ep
+
+
+def charge(method_request, amount=1):
+    return method_request('charge', {'amount': amount})
+
+
+def test_open(ep, method_request, downstream, calls, now):
+    for _ in range(3):
+        assert charge(method_request)['result'] == 1
+    downstream['failing'] = True
+    for _ in range(2):
+        assert charge(method_request)['error']['code'] == 5020
+    # 2 of 5 failed
+    assert ep.circuit_breakers['billing'].state == 'closed'
+    assert charge(method_request)['error']['code'] == 5020
+    assert ep.circuit_breakers['billing'].state == 'open'
+
+    calls.clear()
+    now[0] += 1
+    assert charge(method_request)['error'] == {
+        'code': -32012,
+        'message': 'Circuit open',
+        'data': {'circuit': 'billing', 'retry_after': 4.0},
+    }
+    # Breaker is shared with other method
+    assert method_request('refund', {'amount': 1})['error']['code'] == -32012
+    # Method and its dependencies are not called
+    assert calls == []
+
+
+def test_half_open(ep, method_request, downstream, now):
+    breaker = ep.circuit_breakers['billing']
+    downstream['failing'] = True
+    for _ in range(4):
+        charge(method_request)
+    assert breaker.state == 'open'
+
+    # Failed probe opens circuit again
+    now[0] += 5
+    assert charge(method_request)['error']['code'] == 5020
+    assert breaker.state == 'open'
+
+    now[0] += 5
+    downstream['failing'] = False
+    assert charge(method_request)['result'] == 1
+    assert breaker.state == 'closed'
+    assert ep.circuit_breakers_metrics() == {
+        'billing': {
+            'state': 'closed',
+            'calls': 6,
+            'failed_calls': 5,
+            'timeouts': 0,
+            'rejected_calls': 0,
+            'window_calls': 0,
+            'window_failures': 0,
+            'transitions': {'closed->open': 1, 'open->half_open': 2, 'half_open->open': 1, 'half_open->closed': 1},
+        },
+    }
+
+
+def test_window(ep, method_request, downstream, now):
+    breaker = ep.circuit_breakers['billing']
+    downstream['failing'] = True
+    for _ in range(3):
+        charge(method_request)
+    now[0] += 11
+    charge(method_request)
+    assert breaker.state == 'closed'
+    assert breaker.metrics()['window_calls'] == 1
+
+
+def test_client_errors_not_counted(ep, method_request):
+    for _ in range(5):
+        assert method_request('charge', {'amount': 'many'})['error']['code'] == -32602
+    assert ep.circuit_breakers['billing'].metrics()['failed_calls'] == 0
+
+
+def test_timeouts(ep, method_request, assert_log_errors):
+    for _ in range(4):
+        assert charge(method_request, amount=0)['error']['code'] == -32603
+    metrics = ep.circuit_breakers['billing'].metrics()
+    assert metrics['state'] == 'open'
+    assert metrics['timeouts'] == 4
+    assert_log_errors(*[''] * 4)
+
+
+def test_default_name(ep):
+    @ep.method(circuit_breaker=jsonrpc.CircuitBreaker())
+    def probe() -> int:
+        return 1
+
+    assert ep.circuit_breakers['probe'].name == 'probe'
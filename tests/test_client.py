@@ -0,0 +1,184 @@
+import asyncio
+from typing import List
+
+import pytest
+from fastapi import Body
+from pydantic import BaseModel
+
+import fastapi_jsonrpc as jsonrpc
+from fastapi_jsonrpc.client import AutoBatcher, JsonRpcClient
+
+httpx = pytest.importorskip('httpx')
+
+
+class Account(BaseModel):
+    id: str
+    amount: int
+
+
+class NotEnoughMoney(jsonrpc.BaseError):
+    CODE = 6001
+    MESSAGE = "Not enough money"
+
+    class DataModel(BaseModel):
+        balance: int
+
+
+@pytest.fixture
+def posts():
+    return []
+
+
+@pytest.fixture
+def ep(ep_path):
+    ep = jsonrpc.Entrypoint(ep_path)
+
+    @ep.method()
+    def echo(
+        data: str = Body(...),
+    ) -> str:
+        return data
+
+    @ep.method(errors=[NotEnoughMoney])
+    def withdraw(
+        account_id: str = Body(...),
+        amount: int = Body(...),
+        comment: str = Body('none'),
+    ) -> Account:
+        if amount > 100:
+            raise NotEnoughMoney(data={'balance': 100})
+        return Account(id=f'{account_id}:{comment}', amount=100 - amount)
+
+    @ep.method()
+    def numbers() -> List[int]:
+        return [1, 2, 3]
+
+    return ep
+
+
+@pytest.fixture
+def make_client(app, ep, ep_path, posts):
+    async def handle_request(request):
+        posts.append(request.content)
+
+    def make_client(**kwargs):
+        http_client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app),
+            base_url='http://testserver',
+            event_hooks={'request': [handle_request]},
+        )
+        return JsonRpcClient(ep_path, http_client=http_client, entrypoint=ep, **kwargs)
+
+    return make_client
+
+
+def test_call(make_client):
+    async def main():
+        async with make_client() as client:
+            assert await client.call('echo', {'data': 'one'}) == 'one'
+            with pytest.raises(jsonrpc.MethodNotFound):
+                await client.call('unknown')
+
+    asyncio.run(main())
+
+
+def test_stubs(make_client):
+    async def main():
+        async with make_client() as client:
+            assert await client.methods.withdraw(account_id='a', amount=10) == Account(id='a:none', amount=90)
+            assert await client.methods.numbers() == [1, 2, 3]
+            with pytest.raises(NotEnoughMoney) as exc_info:
+                await client.methods.withdraw(account_id='a', amount=200)
+            assert exc_info.value.data == NotEnoughMoney.DataModel(balance=100)
+            # Validated before sending
+            with pytest.raises(jsonrpc.InvalidParams):
+                await client.methods.withdraw(account_id='a', amount='many')
+            assert sorted(client.methods) == ['echo', 'numbers', 'withdraw']
+
+    asyncio.run(main())
+
+
+def test_unknown_error_code(make_client):
+    async def main():
+        async with make_client() as client:
+            client.error_classes.pop(NotEnoughMoney.CODE)
+            with pytest.raises(jsonrpc.RemoteError) as exc_info:
+                await client.call('withdraw', {'account_id': 'a', 'amount': 200})
+            assert exc_info.value.CODE == 6001
+            assert exc_info.value.MESSAGE == 'Not enough money'
+            assert exc_info.value.data == {'balance': 100}
+
+    asyncio.run(main())
+
+
+def test_call_batch(make_client, posts):
+    async def main():
+        async with make_client() as client:
+            results = await client.call_batch([
+                ('echo', {'data': 'one'}),
+                ('withdraw', {'account_id': 'a', 'amount': 200}),
+                ('echo', {'data': 'two'}),
+            ])
+            assert results[0] == 'one'
+            assert isinstance(results[1], NotEnoughMoney)
+            assert results[2] == 'two'
+
+    asyncio.run(main())
+    assert len(posts) == 1
+
+
+def test_auto_batching(make_client, posts):
+    async def main():
+        async with make_client(batch_window=0.01, max_batch_size=3) as client:
+            results = await asyncio.gather(
+                *(client.methods.echo(data=str(idx)) for idx in range(5)),
+                client.methods.withdraw(account_id='a', amount=200),
+                return_exceptions=True,
+            )
+            assert results[:5] == ['0', '1', '2', '3', '4']
+            assert isinstance(results[5], NotEnoughMoney)
+            await client.notify('echo', {'data': 'x'})
+
+    asyncio.run(main())
+    # 3 + 3 requests by max_batch_size, then notification by window
+    assert len(posts) == 3
+
+
+def test_auto_batching_rejected(ep, make_client):
+    ep.max_batch_size = 2
+
+    async def main():
+        async with make_client(batch_window=0.01) as client:
+            results = await asyncio.gather(
+                *(client.call('echo', {'data': str(idx)}) for idx in range(3)),
+                return_exceptions=True,
+            )
+            assert all(isinstance(r, jsonrpc.InvalidRequest) for r in results)
+
+    asyncio.run(main())
+
+
+def test_connection_pool():
+    client = JsonRpcClient('http://localhost/api', max_connections=7)
+    pool = client.http_client._transport._pool
+    assert pool._max_connections == 7
+    asyncio.run(client.aclose())
+    assert client.http_client.is_closed
+
+
+def test_auto_batching_cancelled():
+    async def send(body):
+        await asyncio.sleep(10)
+
+    async def main():
+        batcher = AutoBatcher(send, window=0.01)
+        fut = batcher.submit({'jsonrpc': '2.0', 'method': 'echo', 'id': 1})
+        await asyncio.sleep(0.05)
+        task, = batcher.tasks
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await fut
+        # Cancellation is not swallowed
+        assert task.cancelled()
+
+    asyncio.run(main())
@@ -0,0 +1,68 @@
+import pytest
+from fastapi import Body
+from starlette.testclient import TestClient
+
+import fastapi_jsonrpc as jsonrpc
+
+
+def make_ep(ep_path, collapse_method_routes):
+    ep = jsonrpc.Entrypoint(ep_path, collapse_method_routes=collapse_method_routes)
+
+    @ep.method()
+    def probe(
+        data: str = Body(..., example='123'),
+    ) -> str:
+        return data
+
+    @ep.method()
+    def probe2(
+        data: int = Body(..., example=123),
+    ) -> int:
+        return data
+
+    return ep
+
+
+@pytest.fixture
+def ep(ep_path):
+    return make_ep(ep_path, collapse_method_routes=True)
+
+
+def test_app_routes(app, ep):
+    assert not any(isinstance(route, jsonrpc.MethodRoute) for route in app.routes)
+    assert sum(isinstance(route, jsonrpc.MethodRoutesDispatcher) for route in app.routes) == 1
+    assert ep.entrypoint_route in app.routes
+
+
+def test_basic(method_request):
+    assert method_request('probe', {'data': 'one'}) == {'id': 0, 'jsonrpc': '2.0', 'result': 'one'}
+    assert method_request('probe2', {'data': 2}) == {'id': 0, 'jsonrpc': '2.0', 'result': 2}
+
+
+def test_method_not_found(app_client, ep_path):
+    assert app_client.post(ep_path + '/unknown', json={}).status_code == 404
+    assert app_client.post(ep_path + '/probe/more', json={}).status_code == 404
+
+
+def test_method_not_allowed(app_client, ep_path):
+    assert app_client.get(ep_path + '/probe').status_code == 405
+
+
+def test_url_path_for(app, ep_path):
+    assert app.url_path_for('probe2') == ep_path + '/probe2'
+
+
+def test_method_added_after_bind(ep, json_request):
+    @ep.method()
+    def probe3() -> str:
+        return 'late'
+
+    resp = json_request({'id': 1, 'jsonrpc': '2.0', 'method': 'probe3'}, path_postfix='/probe3')
+    assert resp == {'id': 1, 'jsonrpc': '2.0', 'result': 'late'}
+
+
+def test_openapi(app, ep_path):
+    expected_app = jsonrpc.API()
+    expected_app.bind_entrypoint(make_ep(ep_path, collapse_method_routes=False))
+
+    assert TestClient(app).get('/openapi.json').json() == TestClient(expected_app).get('/openapi.json').json()
@@ -0,0 +1,82 @@
+import gc
+
+import pytest
+from fastapi import Body
+from pydantic import BaseModel
+
+import fastapi_jsonrpc as jsonrpc
+
+
+def make_model(annotation=int):
+    class Model(BaseModel):
+        value: annotation
+
+    return Model
+
+
+def test_identity():
+    registry = {}
+    model = jsonrpc.component_name('Model', __name__, registry)(make_model())
+    assert jsonrpc.component_name('Model', __name__, registry)(model) is model
+
+
+def test_same_structure_no_schema(monkeypatch):
+    registry = {}
+    model = jsonrpc.component_name('Model', __name__, registry)(make_model())
+
+    def schema(*args, **kwargs):
+        raise AssertionError("schema() must not be called for structurally equal models")
+
+    other = make_model()
+    monkeypatch.setattr(model, 'schema', schema)
+    monkeypatch.setattr(other, 'schema', schema)
+    assert jsonrpc.component_name('Model', __name__, registry)(other) is model
+
+
+def test_fingerprint_cached():
+    model = make_model()
+    assert jsonrpc.component_fingerprint(model) is jsonrpc.component_fingerprint(model)
+
+
+def test_different_models():
+    registry = {}
+    jsonrpc.component_name('Model', __name__, registry)(make_model())
+    with pytest.raises(RuntimeError, match="Different models with the same name detected"):
+        jsonrpc.component_name('Model', __name__, registry)(make_model(str))
+
+
+def test_global_registry_is_weak():
+    jsonrpc.component_name('TestGlobalRegistryIsWeak', __name__)(make_model())
+    assert ('TestGlobalRegistryIsWeak', __name__) in jsonrpc.components
+    gc.collect()
+    assert ('TestGlobalRegistryIsWeak', __name__) not in jsonrpc.components
+
+
+def make_entrypoint(annotation, **kwargs):
+    ep = jsonrpc.Entrypoint('/api/v1/jsonrpc', **kwargs)
+
+    @ep.method()
+    def probe_scoped(data: annotation = Body(...)) -> annotation:
+        return data
+
+    return ep
+
+
+def test_scoped_registry():
+    ep1 = make_entrypoint(int, components={})
+    ep2 = make_entrypoint(str, components={})
+    assert set(ep1.components) == set(ep2.components) == {
+        ('_Params[probe_scoped]', __name__),
+        ('_Request[probe_scoped]', __name__),
+        ('_Response[probe_scoped]', __name__),
+    }
+    key = ('_Request[probe_scoped]', __name__)
+    assert ep1.components[key] is not ep2.components[key]
+
+
+def test_shared_registry():
+    ep1 = make_entrypoint(int)
+    ep2 = make_entrypoint(int)
+    assert ep1.routes[1].response_model is ep2.routes[1].response_model
+    with pytest.raises(RuntimeError, match="Different models with the same name detected"):
+        make_entrypoint(str)
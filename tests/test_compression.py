@@ -0,0 +1,213 @@
+import asyncio
+import gzip
+import zlib
+from json import dumps as json_dumps
+
+import pytest
+from fastapi import Body, Depends, Request
+
+import fastapi_jsonrpc as jsonrpc
+
+
+@pytest.fixture(params=[False, True])
+def asgi_fast_path(request):
+    return request.param
+
+
+@pytest.fixture
+def ep(ep_path, asgi_fast_path):
+    ep = jsonrpc.Entrypoint(
+        ep_path,
+        compression_threshold=100,
+        max_body_bytes=1000,
+        asgi_fast_path=asgi_fast_path,
+    )
+
+    @ep.method()
+    def echo(
+        data: str = Body(...),
+    ) -> str:
+        return data
+
+    async def get_raw_body(http_request: Request) -> dict:
+        return {
+            'size': len(await http_request.body()),
+            'content_encoding': http_request.headers.get('content-encoding'),
+        }
+
+    @ep.method()
+    def raw_body(
+        data: str = Body(...),
+        raw_body: dict = Depends(get_raw_body),
+    ) -> dict:
+        return raw_body
+
+    return ep
+
+
+def make_body(data, request_id=1):
+    req = {'jsonrpc': '2.0', 'method': 'echo', 'params': {'data': data}}
+    if request_id is not None:
+        req['id'] = request_id
+    return json_dumps(req).encode()
+
+
+@pytest.mark.parametrize('path_postfix', ['', '/echo'])
+def test_response_compressed(app_client, ep_path, path_postfix):
+    resp = app_client.post(ep_path + path_postfix, data=make_body('x' * 200), headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['content-encoding'] == 'gzip'
+    assert resp.headers['vary'] == 'Accept-Encoding'
+    assert int(resp.headers['content-length']) < 200
+    assert resp.json() == {'id': 1, 'jsonrpc': '2.0', 'result': 'x' * 200}
+
+
+@pytest.mark.parametrize('path_postfix', ['', '/echo'])
+def test_response_below_threshold(app_client, ep_path, path_postfix):
+    resp = app_client.post(ep_path + path_postfix, data=make_body('x'), headers={'Accept-Encoding': 'gzip'})
+    assert 'content-encoding' not in resp.headers
+    # Response still depends on Accept-Encoding
+    assert resp.headers['vary'] == 'Accept-Encoding'
+    assert resp.json() == {'id': 1, 'jsonrpc': '2.0', 'result': 'x'}
+
+
+def test_compression_disabled(ep, app_client, ep_path):
+    ep.compression_threshold = None
+    resp = app_client.post(ep_path, data=make_body('x' * 200), headers={'Accept-Encoding': 'gzip'})
+    assert 'content-encoding' not in resp.headers
+    assert 'vary' not in resp.headers
+
+
+def test_notification_not_compressed(ep, app_client, ep_path):
+    ep.compression_threshold = 0
+    resp = app_client.post(ep_path, data=make_body('x' * 200, request_id=None), headers={'Accept-Encoding': 'gzip'})
+    assert 'content-encoding' not in resp.headers
+    assert resp.content == b''
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    ('identity', None),
+    ('gzip;q=0, deflate', 'deflate'),
+    ('deflate;q=0.5, gzip', 'gzip'),
+    ('*', 'gzip'),
+    ('*, gzip;q=0', 'deflate'),
+    ('br;q=1', None),
+])
+def test_accept_encoding(ep, app_client, ep_path, accept_encoding, expected):
+    ep.content_encodings = ['gzip', 'deflate']
+    resp = app_client.post(ep_path, data=make_body('x' * 200), headers={'Accept-Encoding': accept_encoding})
+    assert resp.headers.get('content-encoding') == expected
+    assert resp.headers['vary'] == 'Accept-Encoding'
+    assert resp.json()['result'] == 'x' * 200
+
+
+@pytest.mark.parametrize('content_encoding, compress', [
+    ('gzip', gzip.compress),
+    ('deflate', zlib.compress),
+])
+def test_request_compressed(app_client, ep_path, content_encoding, compress):
+    resp = app_client.post(ep_path, data=compress(make_body('x' * 200)), headers={
+        'Content-Encoding': content_encoding,
+    })
+    assert resp.json() == {'id': 1, 'jsonrpc': '2.0', 'result': 'x' * 200}
+
+
+def test_request_body_decoded_for_dependencies(app_client, ep_path):
+    body = json_dumps({'id': 1, 'jsonrpc': '2.0', 'method': 'raw_body', 'params': {'data': 'x' * 200}}).encode()
+    resp = app_client.post(ep_path, data=gzip.compress(body), headers={'Content-Encoding': 'gzip'})
+    assert resp.json()['result'] == {'size': len(body), 'content_encoding': None}
+
+
+def test_request_too_large_decompressed(app_client, ep_path):
+    body = gzip.compress(make_body('x' * 2000))
+    assert len(body) < 1000
+    resp = app_client.post(ep_path, data=body, headers={'Content-Encoding': 'gzip'}).json()
+    assert resp['error']['data']['errors'][0]['type'] == 'value_error.body_too_large'
+
+
+def test_request_compression_bomb(app_client, ep_path, monkeypatch):
+    coding = jsonrpc.content_codings['gzip']
+    outputs = []
+
+    class Decompressor(jsonrpc.ZlibDecompressor):
+        def decompress(self, data, max_length=0):
+            data = super().decompress(data, max_length)
+            outputs.append(len(data))
+            return data
+
+    monkeypatch.setattr(coding, 'decompressor_factory', lambda: Decompressor(31))
+    body = gzip.compress(make_body('x' * 50_000_000))
+    assert len(body) < 100_000
+    resp = app_client.post(ep_path, data=body, headers={'Content-Encoding': 'gzip'}).json()
+    assert resp['error']['data']['errors'][0]['type'] == 'value_error.body_too_large'
+    assert sum(outputs) == 1001
+
+
+@pytest.mark.parametrize('body', [
+    gzip.compress(make_body('x' * 200))[:-10],
+    gzip.compress(make_body('x' * 200)) + b'garbage',
+])
+def test_request_truncated(app_client, ep_path, body):
+    resp = app_client.post(ep_path, data=body, headers={'Content-Encoding': 'gzip'}).json()
+    assert resp == {'id': None, 'jsonrpc': '2.0', 'error': {'code': -32700, 'message': 'Parse error'}}
+
+
+def test_request_corrupted(app_client, ep_path):
+    resp = app_client.post(ep_path, data=b'not gzip', headers={'Content-Encoding': 'gzip'}).json()
+    assert resp == {'id': None, 'jsonrpc': '2.0', 'error': {'code': -32700, 'message': 'Parse error'}}
+
+
+def test_request_unsupported_encoding(app_client, ep_path):
+    resp = app_client.post(ep_path, data=make_body('x'), headers={'Content-Encoding': 'compress'}).json()
+    assert resp == {
+        'id': None,
+        'jsonrpc': '2.0',
+        'error': {
+            'code': -32600,
+            'message': 'Invalid Request',
+            'data': {'errors': [
+                {'loc': [], 'type': 'value_error.content_encoding', 'msg': 'unsupported content encoding: compress'},
+            ]},
+        },
+    }
+
+
+@pytest.mark.parametrize('name', ['gzip', 'deflate', 'br', 'zstd'])
+def test_content_coding_roundtrip(name):
+    if name not in jsonrpc.content_codings:
+        pytest.skip(f'{name} is not available')
+    coding = jsonrpc.content_codings[name]
+    data = make_body('x' * 200)
+    decompressor = coding.decompressor()
+    assert decompressor.decompress(coding.compress(data)) == data
+    assert decompressor.eof
+
+
+@pytest.mark.parametrize('name', ['gzip', 'deflate', 'br', 'zstd'])
+def test_decompress_max_length(name):
+    if name not in jsonrpc.content_codings:
+        pytest.skip(f'{name} is not available')
+    coding = jsonrpc.content_codings[name]
+    bomb = coding.compress(bytes(50_000_000))
+    assert len(bomb) < 100_000
+    decompressor = coding.decompressor()
+    data = decompressor.decompress(bomb, 1001)
+    assert 1001 <= len(data) < 3_000_000
+    assert not decompressor.eof
+
+
+def test_compress_stream(ep):
+    coding = jsonrpc.content_codings['gzip']
+    items = [make_body('x' * 50, request_id=idx) for idx in range(3)]
+
+    async def chunks():
+        for item in items:
+            yield item
+
+    async def collect():
+        return [chunk async for chunk in ep.compress_stream(coding, chunks())]
+
+    decompressor = coding.decompressor()
+    decoded = [decompressor.decompress(chunk) for chunk in asyncio.run(collect())]
+    # every item can be decoded as soon as it is received
+    assert decoded[:3] == items
+    assert b''.join(decoded) == b''.join(items)
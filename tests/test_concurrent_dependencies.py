@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+from fastapi import Depends, Header
+from starlette.testclient import TestClient
+
+import fastapi_jsonrpc as jsonrpc
+
+
+class DependencyError(jsonrpc.BaseError):
+    CODE = 5001
+    MESSAGE = "Dependency error"
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def ep(ep_path, calls):
+    ready = {}
+
+    def get_event(name):
+        return ready.setdefault(name, asyncio.Event())
+
+    async def get_counter():
+        calls.append('counter')
+        return len(calls)
+
+    async def get_auth(
+        x_auth: str = Header('guest'),
+        counter: int = Depends(get_counter),
+    ):
+        calls.append('auth enter')
+        get_event('auth').set()
+        # Sequential solving never gets here: config is declared after auth
+        await asyncio.wait_for(get_event('config').wait(), timeout=1)
+        await asyncio.sleep(0.01)
+        yield x_auth
+        calls.append('auth exit')
+
+    async def get_config(
+        counter: int = Depends(get_counter),
+    ):
+        calls.append('config enter')
+        get_event('config').set()
+        await asyncio.wait_for(get_event('auth').wait(), timeout=1)
+        yield 'config'
+        calls.append('config exit')
+
+    async def get_failing(
+        auth: str = Depends(get_auth),
+    ):
+        raise DependencyError
+
+    ep = jsonrpc.Entrypoint(ep_path, concurrent_dependencies=True)
+
+    @ep.method()
+    def probe(
+        auth: str = Depends(get_auth),
+        config: str = Depends(get_config),
+    ) -> str:
+        return f'{auth}:{config}'
+
+    @ep.method(errors=[DependencyError])
+    def probe_error(
+        failing: str = Depends(get_failing),
+        config: str = Depends(get_config),
+    ) -> str:
+        return failing
+
+    @ep.method(concurrent_dependencies=False)
+    def probe_sequential(
+        counter: int = Depends(get_counter),
+    ) -> int:
+        return counter
+
+    return ep
+
+
+def test_concurrent(ep, method_request, calls):
+    assert isinstance(ep.method_routes['probe'].dependencies_solver, jsonrpc.ConcurrentDependencySolver)
+    assert method_request('probe', {}) == {'id': 0, 'jsonrpc': '2.0', 'result': 'guest:config'}
+    # cached dependency solved once, teardown in reverse declaration order
+    assert calls == ['counter', 'auth enter', 'config enter', 'config exit', 'auth exit']
+
+
+def test_error(method_request, calls):
+    assert method_request('probe_error', {}) == {
+        'id': 0,
+        'jsonrpc': '2.0',
+        'error': {'code': 5001, 'message': 'Dependency error'},
+    }
+    assert calls[-2:] == ['config exit', 'auth exit']
+
+
+def test_opt_out(ep, method_request):
+    assert ep.method_routes['probe_sequential'].dependencies_solver is jsonrpc.solve_dependencies
+    assert method_request('probe_sequential', {}) == {'id': 0, 'jsonrpc': '2.0', 'result': 1}
+
+
+def test_shared_dependencies(ep_path, json_request, calls):
+    async def get_principal(x_auth: str = Header('guest')) -> str:
+        calls.append('principal')
+        return x_auth
+
+    ep = jsonrpc.Entrypoint(ep_path, concurrent_dependencies=True, dependencies=[Depends(get_principal)])
+
+    @ep.method()
+    def whoami(principal: str = Depends(get_principal)) -> str:
+        return principal
+
+    assert isinstance(ep.entrypoint_route.dependencies_solver, jsonrpc.ConcurrentDependencySolver)
+
+    app = jsonrpc.API()
+    app.bind_entrypoint(ep)
+
+    resp = TestClient(app).post(ep_path, json=[
+        {'id': 1, 'jsonrpc': '2.0', 'method': 'whoami'},
+        {'id': 2, 'jsonrpc': '2.0', 'method': 'whoami'},
+    ]).json()
+    assert resp == [
+        {'id': 1, 'jsonrpc': '2.0', 'result': 'guest'},
+        {'id': 2, 'jsonrpc': '2.0', 'result': 'guest'},
+    ]
+    assert calls == ['principal']
@@ -1,7 +1,10 @@
+import asyncio
 from unittest.mock import ANY
 
 import pytest
 from fastapi import Depends, Body, Header
+from fastapi.dependencies.utils import get_dependant, solve_dependencies
+from starlette.requests import Request
 from typing import Tuple
 
 import fastapi_jsonrpc as jsonrpc
@@ -80,3 +83,35 @@ def test_batch(json_request):
         {'id': 333, 'jsonrpc': '2.0', 'result': ['shared-1', 'three', ANY]},
     ]
     assert set(r['result'][2] for r in resp) == {1, 2, 3}
+
+
+def test_layered_dependency_cache():
+    shared = {'shared': 1}
+    cache = jsonrpc.LayeredDependencyCache({}, shared)
+    cache['own'] = 2
+    cache.update(cache)
+    assert cache['shared'] == 1
+    assert 'own' in cache
+    assert cache.maps[0] == {'own': 2}
+    assert shared == {'shared': 1}
+
+
+def test_layered_dependency_cache_empty_overlay():
+    def get_value():
+        return 'value'
+
+    def probe(value: str = Depends(get_value)) -> str:
+        return value
+
+    async def solve(cache):
+        request = Request({'type': 'http', 'method': 'POST', 'path': '/', 'headers': [], 'query_string': b''})
+        dependant = get_dependant(path='', call=probe)
+        return await solve_dependencies(request=request, dependant=dependant, dependency_cache=cache)
+
+    shared = {}
+    cache = jsonrpc.LayeredDependencyCache({}, shared)
+    values, errors, _, _, solved_cache = asyncio.run(solve(cache))
+    assert values == {'value': 'value'}
+    assert solved_cache is cache
+    assert list(cache.maps[0].values()) == ['value']
+    assert shared == {}
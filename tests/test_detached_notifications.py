@@ -0,0 +1,132 @@
+import asyncio
+
+import pytest
+from fastapi import Body, Depends, Header
+from starlette.testclient import TestClient
+
+import fastapi_jsonrpc as jsonrpc
+
+
+class AuthError(jsonrpc.BaseError):
+    CODE = 7000
+    MESSAGE = "Auth error"
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def gate():
+    return {}
+
+
+@pytest.fixture
+def ep(ep_path, calls, gate):
+    async def get_auth(x_auth: str = Header('guest')) -> str:
+        if x_auth == 'bad':
+            raise AuthError
+        return x_auth
+
+    async def get_session():
+        calls.append('session enter')
+        yield 'session'
+        calls.append('session exit')
+
+    ep = jsonrpc.Entrypoint(
+        ep_path,
+        errors=[AuthError],
+        dependencies=[Depends(get_auth)],
+        detach_notifications=True,
+        notifications_scheduler_kwargs={'limit': 1, 'pending_limit': 10},
+    )
+
+    @ep.method()
+    async def track(
+        event: str = Body(...),
+        auth: str = Depends(get_auth),
+        session: str = Depends(get_session),
+    ) -> str:
+        if 'event' in gate:
+            await gate['event'].wait()
+        if event == 'fail':
+            raise RuntimeError('track failed')
+        calls.append(f'{auth}:{event}')
+        return event
+
+    return ep
+
+
+async def make_event() -> asyncio.Event:
+    # Before python 3.10 event is bound to loop of its creation, it must be the loop of client
+    return asyncio.Event()
+
+
+def notification(event):
+    return {'jsonrpc': '2.0', 'method': 'track', 'params': {'event': event}}
+
+
+def test_detached(ep, app, ep_path, calls, gate):
+    with TestClient(app) as client:
+        gate['event'] = client.portal.call(make_event)
+        resp = client.post(ep_path, json=notification('one'))
+        assert resp.content == b''
+        # Acknowledged before execution
+        assert 'guest:one' not in calls
+        assert ep.notifications_metrics() == {'active': 1, 'pending': 0, 'completed': 0, 'failed': 0}
+
+        resp = client.post(ep_path, json=[
+            notification('two'),
+            {'id': 1, 'jsonrpc': '2.0', 'method': 'unknown'},
+        ], headers={'X-Auth': 'user'})
+        assert resp.json() == [{'id': 1, 'jsonrpc': '2.0', 'error': {'code': -32601, 'message': 'Method not found'}}]
+        assert ep.notifications_metrics()['pending'] == 1
+
+        client.portal.call(gate['event'].set)
+    # Drained on shutdown
+    assert ep.notifications_metrics() == {'active': 0, 'pending': 0, 'completed': 2, 'failed': 0}
+    assert calls == [
+        'session enter', 'guest:one', 'session exit',
+        'session enter', 'user:two', 'session exit',
+    ]
+
+
+def test_requests_not_detached(json_request, calls):
+    assert json_request({'id': 1, 'jsonrpc': '2.0', 'method': 'track', 'params': {'event': 'one'}}) == {
+        'id': 1, 'jsonrpc': '2.0', 'result': 'one',
+    }
+    assert calls == ['session enter', 'guest:one', 'session exit']
+
+
+def test_shared_dependencies_error(app_client, ep_path, ep, calls):
+    resp = app_client.post(ep_path, json=notification('one'), headers={'X-Auth': 'bad'})
+    assert resp.json() == {'id': None, 'jsonrpc': '2.0', 'error': {'code': 7000, 'message': 'Auth error'}}
+    assert ep.notifications_scheduler is None
+
+
+def test_failed(ep, app, ep_path, assert_log_errors):
+    with TestClient(app) as client:
+        client.post(ep_path, json=notification('fail'))
+    assert ep.notifications_metrics()['failed'] == 1
+    assert_log_errors('track failed', pytest.raises(RuntimeError))
+
+
+def test_drain_timeout(ep, app, ep_path, calls, gate):
+    ep.notifications_drain_timeout = 0.01
+    with TestClient(app) as client:
+        gate['event'] = client.portal.call(make_event)
+        client.post(ep_path, json=notification('one'))
+    assert ep.notifications_metrics() == {'active': 0, 'pending': 0, 'completed': 0, 'failed': 0}
+    assert calls == ['session enter']
+
+
+def test_after_drain(ep, app, ep_path, calls):
+    with TestClient(app) as client:
+        client.portal.call(ep.drain_notifications)
+        resp = client.post(ep_path, json=notification('one'))
+        assert resp.content == b''
+        # Executed before response, no scheduler is left to close
+        assert calls == ['session enter', 'guest:one', 'session exit']
+        assert ep.notifications_scheduler is None
+    assert ep.notifications_metrics()['completed'] == 1
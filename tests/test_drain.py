@@ -0,0 +1,202 @@
+import asyncio
+import json
+import logging
+from typing import AsyncIterator
+
+import pytest
+from fastapi import Body
+
+import fastapi_jsonrpc as jsonrpc
+
+
+class Maintenance(jsonrpc.BaseError):
+    CODE = 5030
+    MESSAGE = "Maintenance"
+
+
+@pytest.fixture
+def gate():
+    return {}
+
+
+@pytest.fixture
+def ep(ep_path, gate):
+    ep = jsonrpc.Entrypoint(ep_path, drain_timeout=1)
+
+    @ep.method()
+    async def slow(
+        data: str = Body(...),
+    ) -> str:
+        await gate['event'].wait()
+        return data
+
+    @ep.method()
+    async def slow_items(
+        data: str = Body(...),
+    ) -> AsyncIterator[str]:
+        yield data
+        gate['streamed'] = True
+        await gate['event'].wait()
+        yield data
+
+    return ep
+
+
+async def post(app, path, body) -> dict:
+    """Call ASGI app directly to have concurrent requests in the same event loop"""
+    body = json.dumps(body).encode()
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # Client stays connected while response is streamed
+        await asyncio.get_running_loop().create_future()
+
+    async def send(message):
+        sent.append(message)
+
+    await app({
+        'type': 'http',
+        'method': 'POST',
+        'path': path,
+        'root_path': '',
+        'scheme': 'http',
+        'query_string': b'',
+        'headers': [(b'content-type', b'application/json')],
+        'server': ('testserver', 80),
+        'client': ('testclient', 50000),
+    }, receive, send)
+    return json.loads(b''.join(m.get('body', b'') for m in sent if m['type'] == 'http.response.body'))
+
+
+async def wait_for(predicate):
+    for _ in range(100):
+        if predicate():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError('timeout')
+
+
+def make_req(data, req_id=1, method='slow'):
+    return {'id': req_id, 'jsonrpc': '2.0', 'method': method, 'params': {'data': data}}
+
+
+def test_drain(ep, app, ep_path, gate, caplog):
+    caplog.set_level(logging.INFO, logger='fastapi_jsonrpc')
+
+    async def main():
+        gate['event'] = asyncio.Event()
+        await ep.startup()
+        in_flight = asyncio.ensure_future(post(app, ep_path, [make_req('one', 1), make_req('two', 2)]))
+        await wait_for(lambda: ep.in_flight_calls == 1)
+
+        shutdown = asyncio.ensure_future(ep.shutdown())
+        await wait_for(lambda: ep.draining)
+        assert await post(app, ep_path, make_req('three')) == {
+            'id': 1, 'jsonrpc': '2.0', 'error': {'code': -32010, 'message': 'Server busy'},
+        }
+        metrics = ep.drain_metrics()
+        assert metrics['in_flight_calls'] == 1
+        assert metrics['scheduler_jobs'] == 2
+        assert metrics['refused_calls'] == 1
+        assert not shutdown.done()
+
+        gate['event'].set()
+        assert [r['result'] for r in await in_flight] == ['one', 'two']
+        await shutdown
+
+    asyncio.run(main())
+    messages = [r.message for r in caplog.records if r.name == 'fastapi_jsonrpc']
+    assert messages[0].startswith('Draining entrypoint /api/v1/jsonrpc')
+    assert messages[-1].startswith('Drained entrypoint /api/v1/jsonrpc')
+
+
+def test_deadline(ep, app, ep_path, gate, caplog):
+    ep.drain_timeout = 0.05
+
+    async def main():
+        gate['event'] = asyncio.Event()
+        in_flight = asyncio.ensure_future(post(app, ep_path, [make_req('one', 1), make_req('two', 2)]))
+        await wait_for(lambda: ep.in_flight_calls == 1)
+        assert await ep.drain() is False
+        await ep.shutdown()
+        # Scheduler jobs are cancelled after deadline
+        with pytest.raises(asyncio.CancelledError):
+            await in_flight
+
+    asyncio.run(main())
+    assert [r.message for r in caplog.records if r.levelno == logging.WARNING][0].startswith(
+        'Drain deadline of entrypoint /api/v1/jsonrpc exceeded',
+    )
+
+
+def test_custom_busy_error(ep, app, ep_path):
+    ep.busy_error = Maintenance
+
+    async def main():
+        assert await ep.drain() is True
+        assert await post(app, ep_path, make_req('one')) == {
+            'id': 1, 'jsonrpc': '2.0', 'error': {'code': 5030, 'message': 'Maintenance'},
+        }
+        await ep.startup()
+        assert not ep.draining
+
+    asyncio.run(main())
+
+
+def test_disabled(ep_path):
+    ep = jsonrpc.Entrypoint(ep_path)
+    asyncio.run(ep.shutdown())
+    assert not ep.draining
+
+
+def test_refused_batch(ep, app, ep_path):
+    async def main():
+        await ep.drain()
+        notification = {'jsonrpc': '2.0', 'method': 'slow', 'params': {'data': 'three'}}
+        resp = await post(app, ep_path, [make_req('one', 1), make_req('two', 'b'), notification])
+        assert [r['id'] for r in resp] == [1, 'b', None]
+        assert {r['error']['code'] for r in resp} == {-32010}
+        assert ep.refused_calls == 3
+
+    asyncio.run(main())
+
+
+def test_method_route(ep, app, ep_path, gate):
+    async def main():
+        gate['event'] = asyncio.Event()
+        in_flight = asyncio.ensure_future(post(app, ep_path + '/slow', make_req('one')))
+        await wait_for(lambda: ep.in_flight_calls == 1)
+
+        shutdown = asyncio.ensure_future(ep.shutdown())
+        await wait_for(lambda: ep.draining)
+        assert await post(app, ep_path + '/slow', make_req('two', 2)) == {
+            'id': 2, 'jsonrpc': '2.0', 'error': {'code': -32010, 'message': 'Server busy'},
+        }
+        assert ep.refused_calls == 1
+        assert not shutdown.done()
+
+        gate['event'].set()
+        assert (await in_flight)['result'] == 'one'
+        await shutdown
+        assert ep.in_flight_calls == 0
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize('path_postfix', ['', '/slow_items'])
+def test_streamed_call_in_flight(ep, app, ep_path, gate, path_postfix):
+    async def main():
+        gate['event'] = asyncio.Event()
+        in_flight = asyncio.ensure_future(post(app, ep_path + path_postfix, make_req('one', method='slow_items')))
+        # Response is started, but call is not finished
+        await wait_for(lambda: gate.get('streamed'))
+        assert ep.in_flight_calls == 1
+
+        gate['event'].set()
+        assert (await in_flight)['result'] == ['one', 'one']
+        assert ep.in_flight_calls == 0
+
+    asyncio.run(main())
@@ -0,0 +1,233 @@
+import asyncio
+
+import pytest
+from fastapi import Body, Header
+from pydantic import BaseModel
+from starlette.testclient import TestClient
+
+import fastapi_jsonrpc as jsonrpc
+
+
+class TransferError(jsonrpc.BaseError):
+    CODE = 5000
+    MESSAGE = "Transfer error"
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def ep(ep_path, calls):
+    ep = jsonrpc.Entrypoint(ep_path)
+
+    @ep.method(idempotent=True, shared_idempotency_keys=True, errors=[TransferError])
+    async def transfer(
+        amount: int = Body(...),
+    ) -> str:
+        calls.append(amount)
+        await asyncio.sleep(0.01)
+        if amount < 0:
+            raise TransferError
+        if amount == 0:
+            raise RuntimeError('zero amount')
+        return f'transfer-{len(calls)}'
+
+    def get_user(user: str = Header(None)) -> str:
+        return user
+
+    @ep.method(idempotent=True, idempotency_scope=get_user)
+    async def pay(
+        amount: int = Body(...),
+    ) -> str:
+        calls.append(amount)
+        return f'pay-{len(calls)}'
+
+    @ep.method()
+    def echo(
+        data: str = Body(...),
+    ) -> str:
+        calls.append(data)
+        return data
+
+    return ep
+
+
+def make_req(method, params, req_id=1, key=None):
+    req = {'id': req_id, 'jsonrpc': '2.0', 'method': method, 'params': params}
+    if key is not None:
+        req['meta'] = {'idempotency_key': key}
+    return req
+
+
+def test_header_retry(app_client, ep_path, calls):
+    req = make_req('transfer', {'amount': 10})
+    first = app_client.post(ep_path, json=req, headers={'Idempotency-Key': 'k1'}).json()
+    second = app_client.post(ep_path, json=req, headers={'Idempotency-Key': 'k1'}).json()
+    assert first == second == {'id': 1, 'jsonrpc': '2.0', 'result': 'transfer-1'}
+    assert calls == [10]
+
+    # Other request id in the same batch is other call
+    resp = app_client.post(ep_path, json=[req, make_req('transfer', {'amount': 10}, req_id=2)], headers={
+        'Idempotency-Key': 'k1',
+    }).json()
+    assert [r['result'] for r in resp] == ['transfer-1', 'transfer-2']
+    assert calls == [10, 10]
+
+
+def test_in_flight_duplicate(json_request, calls):
+    resp = json_request([
+        make_req('transfer', {'amount': 10}, req_id=1, key='k1'),
+        make_req('transfer', {'amount': 10}, req_id=2, key='k1'),
+        make_req('transfer', {'amount': 10}, req_id=3, key='k2'),
+    ])
+    assert resp == [
+        {'id': 1, 'jsonrpc': '2.0', 'result': 'transfer-2'},
+        {'id': 2, 'jsonrpc': '2.0', 'result': 'transfer-2'},
+        {'id': 3, 'jsonrpc': '2.0', 'result': 'transfer-2'},
+    ]
+    assert calls == [10, 10]
+
+
+def test_params_mismatch(json_request, calls):
+    json_request(make_req('transfer', {'amount': 10}, key='k1'))
+    resp = json_request(make_req('transfer', {'amount': 20}, key='k1'))
+    assert resp['error']['data']['errors'] == [
+        {'loc': [], 'type': 'value_error.idempotency_key', 'msg': 'idempotency key is reused with other params'},
+    ]
+    assert calls == [10]
+
+
+def test_error_kept(json_request, calls):
+    req = make_req('transfer', {'amount': -1}, key='k1')
+    error_resp = {'id': 1, 'jsonrpc': '2.0', 'error': {'code': 5000, 'message': 'Transfer error'}}
+    assert json_request(req) == error_resp
+    assert json_request(req) == error_resp
+    assert calls == [-1]
+
+
+def test_unhandled_error_not_kept(json_request, calls, assert_log_errors):
+    req = make_req('transfer', {'amount': 0}, key='k1')
+    assert json_request(req)['error']['code'] == -32603
+    assert json_request(req)['error']['code'] == -32603
+    assert calls == [0, 0]
+    assert_log_errors(
+        'zero amount', pytest.raises(RuntimeError),
+        'zero amount', pytest.raises(RuntimeError),
+    )
+
+
+def test_not_idempotent(app_client, ep_path, calls):
+    req = make_req('echo', {'data': 'x'})
+    app_client.post(ep_path, json=req, headers={'Idempotency-Key': 'k1'})
+    app_client.post(ep_path, json=req, headers={'Idempotency-Key': 'k1'})
+    assert calls == ['x', 'x']
+
+
+def test_meta_not_accepted(json_request, calls):
+    resp = json_request(make_req('echo', {'data': 'x'}, key='k1'))
+    assert resp['error']['code'] == -32600
+    assert resp['error']['data']['errors'] == [
+        {'loc': ['meta'], 'type': 'value_error.extra', 'msg': 'extra fields not permitted'},
+    ]
+    assert calls == []
+
+
+def test_invalid_meta(json_request, calls):
+    req = make_req('transfer', {'amount': 10})
+    req['meta'] = 'k1'
+    resp = json_request(req)
+    assert resp['error']['code'] == -32600
+    assert resp['error']['data']['errors'][0]['loc'] == ['meta']
+    assert calls == []
+
+
+def test_scope_required(ep):
+    with pytest.raises(RuntimeError, match='requires idempotency_scope'):
+        @ep.method(idempotent=True)
+        async def refund() -> str:
+            return 'refund'
+
+
+def test_store_bounded(ep, json_request, calls):
+    ep.idempotency_store.maxsize = 1
+    json_request(make_req('transfer', {'amount': 1}, key='k1'))
+    json_request(make_req('transfer', {'amount': 2}, key='k2'))
+    json_request(make_req('transfer', {'amount': 1}, key='k1'))
+    assert calls == [1, 2, 1]
+    assert len(ep.idempotency_store.entries) == 1
+
+
+def test_store_ttl(ep, json_request, calls):
+    ep.idempotency_store.ttl = 0
+    json_request(make_req('transfer', {'amount': 1}, key='k1'))
+    json_request(make_req('transfer', {'amount': 1}, key='k1'))
+    assert calls == [1, 1]
+
+
+def test_scope(app_client, ep_path, calls):
+    req = make_req('pay', {'amount': 10}, key='k1')
+    alice = app_client.post(ep_path, json=req, headers={'User': 'alice'}).json()
+    bob = app_client.post(ep_path, json=req, headers={'User': 'bob'}).json()
+    alice_retry = app_client.post(ep_path, json=req, headers={'User': 'alice'}).json()
+    assert alice['result'] == alice_retry['result'] == 'pay-1'
+    assert bob['result'] == 'pay-2'
+    assert calls == [10, 10]
+
+
+def test_entrypoint_scope(ep_path, calls):
+    def get_tenant(tenant: str = Header(None)) -> dict:
+        # Unhashable values are keyed by repr
+        return {'tenant': tenant}
+
+    ep = jsonrpc.Entrypoint(ep_path, idempotency_scope=get_tenant)
+
+    @ep.method(idempotent=True)
+    async def refund(
+        amount: int = Body(...),
+    ) -> int:
+        calls.append(amount)
+        return len(calls)
+
+    app = jsonrpc.API()
+    app.bind_entrypoint(ep)
+    with TestClient(app) as client:
+        req = make_req('refund', {'amount': 10}, key='k1')
+        results = [
+            client.post(ep_path, json=req, headers={'Tenant': tenant}).json()['result']
+            for tenant in ['a', 'b', 'a']
+        ]
+    assert results == [1, 2, 1]
+    assert calls == [10, 10]
+
+
+def test_meta_in_openapi(app_client):
+    schemas = app_client.get('/openapi.json').json()['components']['schemas']
+    assert 'meta' in schemas['_Request_transfer_']['properties']
+    assert 'meta' not in schemas['_Request_echo_']['properties']
+
+
+def test_request_class_without_meta(ep_path, calls):
+    class PlainRequest(BaseModel):
+        jsonrpc: str
+        id: int
+        method: str
+        params: dict
+
+    ep = jsonrpc.Entrypoint(ep_path, request_class=PlainRequest)
+
+    @ep.method(idempotent=True, shared_idempotency_keys=True)
+    async def withdraw(
+        amount: int = Body(...),
+    ) -> int:
+        calls.append(amount)
+        return len(calls)
+
+    app = jsonrpc.API()
+    app.bind_entrypoint(ep)
+    with TestClient(app) as client:
+        req = make_req('withdraw', {'amount': 10})
+        assert client.post(ep_path, json=req, headers={'Idempotency-Key': 'k1'}).json()['result'] == 1
+        assert client.post(ep_path, json=req, headers={'Idempotency-Key': 'k1'}).json()['result'] == 1
+    assert calls == [10]
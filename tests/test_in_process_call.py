@@ -0,0 +1,114 @@
+import asyncio
+import contextlib
+from typing import AsyncIterator, List
+
+import pytest
+from fastapi import Body, Depends, Header
+from pydantic import BaseModel
+
+import fastapi_jsonrpc as jsonrpc
+
+
+class Account(BaseModel):
+    account_id: str
+    amount: int
+
+
+class AccountNotFound(jsonrpc.BaseError):
+    CODE = 6000
+    MESSAGE = "Account not found"
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def ep(ep_path, calls):
+    @contextlib.asynccontextmanager
+    async def mw(ctx: jsonrpc.JsonRpcContext):
+        calls.append(('mw', ctx.request.method, ctx.in_process))
+        yield
+
+    ep = jsonrpc.Entrypoint(ep_path, middlewares=[mw])
+
+    def get_user(x_user: str = Header('guest')) -> str:
+        return x_user
+
+    @ep.method(errors=[AccountNotFound])
+    def get_account(
+        account_id: str = Body(...),
+        amount: int = Body(0),
+        user: str = Depends(get_user),
+    ) -> Account:
+        if account_id == 'unknown':
+            raise AccountNotFound
+        if account_id == 'crash':
+            raise RuntimeError('crash')
+        return Account(account_id=f'{user}:{account_id}', amount=amount)
+
+    @ep.method()
+    async def get_accounts(
+        account_ids: List[str] = Body(...),
+    ) -> List[Account]:
+        return await ep.call_batch([('get_account', {'account_id': account_id}) for account_id in account_ids])
+
+    @ep.method()
+    async def iter_numbers(
+        count: int = Body(...),
+    ) -> AsyncIterator[int]:
+        for idx in range(count):
+            yield idx
+
+    return ep
+
+
+def test_call(ep, calls):
+    result = asyncio.run(ep.call('get_account', {'account_id': 'one', 'amount': '10'}))
+    assert result == Account(account_id='guest:one', amount=10)
+    assert calls == [('mw', 'get_account', True)]
+
+
+def test_streaming_collected(ep):
+    assert asyncio.run(ep.call('iter_numbers', {'count': 3})) == [0, 1, 2]
+
+
+@pytest.mark.parametrize('method, params, error_class', [
+    ('get_account', {'account_id': 'unknown'}, AccountNotFound),
+    ('get_account', {'amount': 'many'}, jsonrpc.InvalidParams),
+    ('unknown', {}, jsonrpc.MethodNotFound),
+])
+def test_errors(ep, method, params, error_class):
+    with pytest.raises(error_class):
+        asyncio.run(ep.call(method, params))
+
+
+def test_unhandled_error(ep, assert_log_errors):
+    with pytest.raises(jsonrpc.InternalError):
+        asyncio.run(ep.call('get_account', {'account_id': 'crash'}))
+    assert_log_errors('crash', pytest.raises(RuntimeError))
+
+
+def test_call_batch(ep):
+    one, unknown = asyncio.run(ep.call_batch([
+        ('get_account', {'account_id': 'one'}),
+        ('get_account', {'account_id': 'unknown'}),
+    ]))
+    assert one == Account(account_id='guest:one', amount=0)
+    assert isinstance(unknown, AccountNotFound)
+
+
+def test_nested_call_inherits_request(app_client, ep_path, calls):
+    resp = app_client.post(ep_path, json={
+        'id': 1, 'jsonrpc': '2.0', 'method': 'get_accounts', 'params': {'account_ids': ['one', 'two']},
+    }, headers={'X-User': 'admin'}).json()
+    assert resp == {'id': 1, 'jsonrpc': '2.0', 'result': [
+        {'account_id': 'admin:one', 'amount': 0},
+        {'account_id': 'admin:two', 'amount': 0},
+    ]}
+    assert calls == [
+        ('mw', 'get_accounts', False),
+        ('mw', 'get_account', True),
+        ('mw', 'get_account', True),
+    ]
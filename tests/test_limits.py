@@ -0,0 +1,110 @@
+import json
+from json import dumps as json_dumps
+
+import pytest
+from fastapi import Body
+
+import fastapi_jsonrpc as jsonrpc
+
+
+@pytest.fixture
+def ep(ep_path):
+    ep = jsonrpc.Entrypoint(ep_path, max_body_bytes=200, max_batch_size=3)
+
+    @ep.method()
+    def echo(
+        data: str = Body(...),
+    ) -> str:
+        return data
+
+    return ep
+
+
+def make_batch(count):
+    return [
+        {'id': idx, 'jsonrpc': '2.0', 'method': 'echo', 'params': {'data': str(idx)}}
+        for idx in range(count)
+    ]
+
+
+def test_body_ok(json_request):
+    resp = json_request({'id': 1, 'jsonrpc': '2.0', 'method': 'echo', 'params': {'data': 'x' * 100}})
+    assert resp == {'id': 1, 'jsonrpc': '2.0', 'result': 'x' * 100}
+
+
+def test_body_too_large(json_request, add_path_postfix):
+    resp = json_request(
+        {'id': 1, 'jsonrpc': '2.0', 'method': 'echo', 'params': {'data': 'x' * 200}},
+        path_postfix='/echo' if add_path_postfix else '',
+    )
+    assert resp == {
+        'id': None,
+        'jsonrpc': '2.0',
+        'error': {
+            'code': -32600,
+            'message': 'Invalid Request',
+            'data': {'errors': [
+                {'loc': [], 'type': 'value_error.body_too_large', 'msg': 'request body exceeds 200 bytes'},
+            ]},
+        },
+    }
+
+
+def test_body_too_large_streaming(app_client, ep_path):
+    def chunks():
+        yield b'{"id": 1, "jsonrpc": "2.0", '
+        yield b' ' * 300
+        yield b'"method": "echo", "params": {"data": "x"}}'
+
+    resp = app_client.post(ep_path, data=chunks()).json()
+    assert resp['error']['data']['errors'][0]['type'] == 'value_error.body_too_large'
+
+
+def test_batch_ok(ep, json_request):
+    ep.max_body_bytes = None
+    assert [r['result'] for r in json_request(make_batch(3))] == ['0', '1', '2']
+
+
+def test_batch_too_large(ep, json_request):
+    ep.max_body_bytes = None
+    resp = json_request(make_batch(4))
+    assert resp == {
+        'id': None,
+        'jsonrpc': '2.0',
+        'error': {
+            'code': -32600,
+            'message': 'Invalid Request',
+            'data': {'errors': [
+                {'loc': [], 'type': 'value_error.batch_too_large', 'msg': 'rpc call with more than 3 requests'},
+            ]},
+        },
+    }
+
+
+def test_batch_too_large_not_decoded(ep, raw_request):
+    ep.max_body_bytes = None
+    body = json_dumps(make_batch(4))[:-1] + ', not json at all'
+    resp = raw_request(body).json()
+    assert resp['error']['data']['errors'][0]['type'] == 'value_error.batch_too_large'
+
+
+@pytest.mark.parametrize('body', [
+    '[]',
+    ' [ 1 , {"a": [1, 2]} , "s" ] ',
+    '[1, 2, 3]',
+    '{"a": 1}',
+    '"s"',
+    '[1, 2,]',
+    '[1 2]',
+    '[1, 2',
+    '[1] 2',
+    '',
+])
+def test_loads_limited_batch(body):
+    try:
+        expected = json.loads(body)
+    except json.JSONDecodeError:
+        with pytest.raises(json.JSONDecodeError):
+            jsonrpc.loads_limited_batch(body.encode(), 3)
+    else:
+        assert jsonrpc.loads_limited_batch(body.encode(), 3) == expected
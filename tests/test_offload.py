@@ -0,0 +1,83 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from json import dumps as json_dumps
+
+import pytest
+from fastapi import Body
+
+import fastapi_jsonrpc as jsonrpc
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(max_workers=1)
+        self.calls = []
+
+    def submit(self, fn, *args, **kwargs):
+        self.calls.append(getattr(fn, '__name__', fn))
+        return super().submit(fn, *args, **kwargs)
+
+
+@pytest.fixture
+def executor():
+    executor = CountingExecutor()
+    yield executor
+    executor.shutdown()
+
+
+@pytest.fixture(params=[False, True])
+def asgi_fast_path(request):
+    return request.param
+
+
+@pytest.fixture
+def ep(ep_path, executor, asgi_fast_path):
+    ep = jsonrpc.Entrypoint(
+        ep_path,
+        offload_threshold=100,
+        offload_executor=executor,
+        asgi_fast_path=asgi_fast_path,
+    )
+
+    @ep.method()
+    def echo(
+        data: str = Body(...),
+    ) -> str:
+        return data
+
+    return ep
+
+
+def test_small(json_request, executor):
+    resp = json_request({'id': 1, 'jsonrpc': '2.0', 'method': 'echo', 'params': {'data': 'small'}})
+    assert resp == {'id': 1, 'jsonrpc': '2.0', 'result': 'small'}
+    assert executor.calls == []
+
+
+@pytest.mark.parametrize('path_postfix', ['', '/echo'])
+def test_large(json_request, executor, path_postfix):
+    data = 'x' * 200
+    resp = json_request({'id': 1, 'jsonrpc': '2.0', 'method': 'echo', 'params': {'data': data}}, path_postfix)
+    assert resp == {'id': 1, 'jsonrpc': '2.0', 'result': data}
+    assert executor.calls == ['loads', 'render']
+
+
+def test_large_parse_error(raw_request, executor):
+    resp = raw_request('[' + ' ' * 200)
+    assert resp.json() == {'id': None, 'jsonrpc': '2.0', 'error': {'code': -32700, 'message': 'Parse error'}}
+    assert executor.calls == ['loads']
+
+
+def test_large_batch(json_request, executor):
+    batch = [
+        {'id': idx, 'jsonrpc': '2.0', 'method': 'echo', 'params': {'data': str(idx)}}
+        for idx in range(10)
+    ]
+    assert len(json_dumps(batch)) > 100
+    resp = json_request(batch)
+    assert [r['result'] for r in resp] == [str(idx) for idx in range(10)]
+    assert executor.calls == ['loads', 'render']
+
+
+def test_process_pool_rejected(ep_path):
+    with pytest.raises(ValueError):
+        jsonrpc.Entrypoint(ep_path, offload_executor=ProcessPoolExecutor())
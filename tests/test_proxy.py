@@ -0,0 +1,146 @@
+import pytest
+from fastapi import Body, Depends, Header
+from starlette.testclient import TestClient
+
+import fastapi_jsonrpc as jsonrpc
+
+httpx = pytest.importorskip('httpx')
+
+
+UPSTREAM_URL = 'http://upstream/api/v1/jsonrpc'
+
+
+class AuthError(jsonrpc.BaseError):
+    CODE = 7000
+    MESSAGE = "Auth error"
+
+
+def get_auth(x_auth: str = Header('guest')) -> str:
+    if x_auth == 'bad':
+        raise AuthError
+    return x_auth
+
+
+@pytest.fixture
+def upstream_posts():
+    return []
+
+
+@pytest.fixture
+def upstream_app(upstream_posts):
+    ep = jsonrpc.Entrypoint('/api/v1/jsonrpc')
+
+    @ep.method(name='billing.charge')
+    def charge(
+        amount: int = Body(...),
+    ) -> int:
+        return amount * 2
+
+    @ep.method(name='billing.fail')
+    def fail() -> int:
+        raise AuthError
+
+    @ep.method()
+    def upstream_echo(
+        data: str = Body(...),
+    ) -> str:
+        return f'upstream:{data}'
+
+    app = jsonrpc.API()
+    app.bind_entrypoint(ep)
+
+    async def count_posts(scope, receive, send):
+        upstream_posts.append(scope['path'])
+        await app(scope, receive, send)
+
+    return count_posts
+
+
+@pytest.fixture
+def ep(ep_path, upstream_app):
+    ep = jsonrpc.Entrypoint(ep_path, errors=[AuthError], dependencies=[Depends(get_auth)])
+
+    @ep.method()
+    def echo(
+        data: str = Body(...),
+    ) -> str:
+        return data
+
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=upstream_app))
+    ep.add_proxy_route(UPSTREAM_URL, namespace='billing', http_client=http_client)
+    ep.add_proxy_route(UPSTREAM_URL, name='upstream_echo')
+    ep.add_proxy_route('http://missing/api', name='missing')
+    return ep
+
+
+def test_single(json_request, upstream_posts):
+    resp = json_request({'id': 1, 'jsonrpc': '2.0', 'method': 'billing.charge', 'params': {'amount': 2}})
+    assert resp == {'id': 1, 'jsonrpc': '2.0', 'result': 4}
+    assert upstream_posts == ['/api/v1/jsonrpc']
+
+
+def test_batch_grouped(ep, json_request, upstream_posts):
+    assert len(ep.upstream_clients) == 2
+    resp = json_request([
+        {'id': 1, 'jsonrpc': '2.0', 'method': 'billing.charge', 'params': {'amount': 2}},
+        {'id': 2, 'jsonrpc': '2.0', 'method': 'echo', 'params': {'data': 'local'}},
+        {'id': 3, 'jsonrpc': '2.0', 'method': 'upstream_echo', 'params': {'data': 'x'}},
+        {'id': 4, 'jsonrpc': '2.0', 'method': 'billing.fail'},
+        {'jsonrpc': '2.0', 'method': 'billing.charge', 'params': {'amount': 1}},
+        {'id': 5, 'jsonrpc': '2.0', 'method': 'billing.unknown'},
+        {'id': 6, 'jsonrpc': '2.0', 'method': 'unknown'},
+    ])
+    assert resp == [
+        {'id': 1, 'jsonrpc': '2.0', 'result': 4},
+        {'id': 2, 'jsonrpc': '2.0', 'result': 'local'},
+        {'id': 3, 'jsonrpc': '2.0', 'result': 'upstream:x'},
+        {'id': 4, 'jsonrpc': '2.0', 'error': {'code': 7000, 'message': 'Auth error'}},
+        {'id': 5, 'jsonrpc': '2.0', 'error': {'code': -32601, 'message': 'Method not found'}},
+        {'id': 6, 'jsonrpc': '2.0', 'error': {'code': -32601, 'message': 'Method not found'}},
+    ]
+    # One upstream batch for all proxied calls
+    assert upstream_posts == ['/api/v1/jsonrpc']
+
+
+def test_notification(app_client, ep_path, upstream_posts):
+    resp = app_client.post(ep_path, json={'jsonrpc': '2.0', 'method': 'billing.charge', 'params': {'amount': 1}})
+    assert resp.content == b''
+    assert upstream_posts == ['/api/v1/jsonrpc']
+
+
+def test_shared_dependencies(app_client, ep_path, upstream_posts):
+    resp = app_client.post(ep_path, json=[
+        {'id': 1, 'jsonrpc': '2.0', 'method': 'billing.charge', 'params': {'amount': 2}},
+        {'id': 2, 'jsonrpc': '2.0', 'method': 'echo', 'params': {'data': 'local'}},
+    ], headers={'X-Auth': 'bad'}).json()
+    assert resp == [
+        {'id': 1, 'jsonrpc': '2.0', 'error': {'code': 7000, 'message': 'Auth error'}},
+        {'id': 2, 'jsonrpc': '2.0', 'error': {'code': 7000, 'message': 'Auth error'}},
+    ]
+    assert upstream_posts == []
+
+
+def test_upstream_unavailable(ep, json_request, assert_log_errors):
+    async def send(body):
+        raise ConnectionError('upstream is down')
+
+    ep.upstream_clients['http://missing/api'].send = send
+
+    resp = json_request({'id': 1, 'jsonrpc': '2.0', 'method': 'missing'})
+    assert resp == {'id': 1, 'jsonrpc': '2.0', 'error': {'code': -32603, 'message': 'Internal error'}}
+    assert_log_errors('upstream is down', pytest.raises(ConnectionError))
+
+
+def test_shutdown(ep, app):
+    with TestClient(app):
+        pass
+    # Only clients created by entrypoint are closed
+    assert ep.upstream_clients['http://missing/api'].http_client.is_closed
+    assert not ep.upstream_clients[UPSTREAM_URL].http_client.is_closed
+
+
+def test_name_or_namespace(ep):
+    with pytest.raises(RuntimeError):
+        ep.add_proxy_route(UPSTREAM_URL)
+    with pytest.raises(RuntimeError):
+        ep.add_proxy_route(UPSTREAM_URL, name='a', namespace='b')
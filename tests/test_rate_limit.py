@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+from fastapi import Body, Depends, Header
+from starlette.testclient import TestClient
+
+import fastapi_jsonrpc as jsonrpc
+
+
+def get_principal(x_api_key: str = Header('anonymous')) -> str:
+    return x_api_key
+
+
+@pytest.fixture
+def ep(ep_path):
+    ep = jsonrpc.Entrypoint(ep_path, rate_limit=jsonrpc.RateLimit(1, burst=5, key=get_principal))
+
+    @ep.method(rate_limit=jsonrpc.RateLimit(1, burst=2, key=get_principal))
+    def expensive(
+        data: str = Body(...),
+    ) -> str:
+        return data
+
+    @ep.method()
+    def cheap(
+        data: str = Body(...),
+    ) -> str:
+        return data
+
+    return ep
+
+
+def make_req(method, req_id=1):
+    return {'id': req_id, 'jsonrpc': '2.0', 'method': method, 'params': {'data': str(req_id)}}
+
+
+def test_method_limit(app_client, ep_path):
+    for req_id in (1, 2):
+        assert app_client.post(ep_path, json=make_req('expensive', req_id)).json()['result'] == str(req_id)
+
+    resp = app_client.post(ep_path, json=make_req('expensive', 3))
+    assert resp.json() == {
+        'id': 3,
+        'jsonrpc': '2.0',
+        'error': {'code': -32011, 'message': 'Rate limit exceeded', 'data': {'retry_after': pytest.approx(1, abs=0.1)}},
+    }
+    assert resp.headers['retry-after'] == '1'
+
+    # Other key has own bucket
+    resp = app_client.post(ep_path, json=make_req('expensive', 4), headers={'X-API-Key': 'other'})
+    assert resp.json()['result'] == '4'
+
+
+def test_batch_items_counted(app_client, ep_path):
+    resp = app_client.post(ep_path, json=[make_req('expensive', req_id) for req_id in range(3)]).json()
+    assert sorted('result' in r for r in resp) == [False, True, True]
+
+
+def test_entrypoint_limit(app_client, ep_path):
+    resp = app_client.post(ep_path, json=[
+        make_req('cheap', 1),
+        make_req('cheap', 2),
+        make_req('expensive', 3),
+        make_req('cheap', 4),
+        make_req('cheap', 5),
+        make_req('cheap', 6),
+    ]).json()
+    # Entrypoint bucket is common for methods
+    assert [r['id'] for r in resp if 'error' in r] == [6]
+
+
+def test_refill(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(jsonrpc.time, 'monotonic', lambda: now[0])
+    backend = jsonrpc.MemoryRateLimitBackend(shards=1)
+
+    async def main():
+        assert await backend.acquire('k', 2, 2) == 0
+        assert await backend.acquire('k', 2, 2) == 0
+        assert await backend.acquire('k', 2, 2) == pytest.approx(0.5)
+        now[0] += 0.5
+        assert await backend.acquire('k', 2, 2) == 0
+        # Full again, evicted when shard is used
+        now[0] += 10
+        assert await backend.acquire('other', 2, 2) == 0
+        assert list(backend.shards[0]) == ['other']
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize('concurrent_dependencies', [False, True])
+def test_checked_before_dependencies(ep_path, concurrent_dependencies):
+    solved = []
+
+    async def lookup_account() -> str:
+        solved.append('account')
+        return 'account'
+
+    ep = jsonrpc.Entrypoint(
+        ep_path,
+        concurrent_dependencies=concurrent_dependencies,
+        rate_limit=jsonrpc.RateLimit(1, burst=1),
+    )
+
+    @ep.method(dependencies=[Depends(lookup_account)])
+    def limited(
+        data: str = Body(...),
+    ) -> str:
+        return data
+
+    app = jsonrpc.API()
+    app.bind_entrypoint(ep)
+    with TestClient(app) as client:
+        req = {'id': 1, 'jsonrpc': '2.0', 'method': 'limited', 'params': {'data': 'x'}}
+        assert client.post(ep_path, json=req).json()['result'] == 'x'
+        assert client.post(ep_path, json=req).json()['error']['code'] == -32011
+    # Limited call solves no other dependencies
+    assert solved == ['account']
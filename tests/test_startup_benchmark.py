@@ -0,0 +1,53 @@
+import inspect
+import time
+
+import pytest
+from fastapi import Body
+
+import fastapi_jsonrpc as jsonrpc
+
+
+def make_entrypoint(idx: int, methods_count: int) -> jsonrpc.Entrypoint:
+    ep = jsonrpc.Entrypoint(f'/api/v{idx}/jsonrpc')
+
+    for method_idx in range(methods_count):
+        def probe(data: str = Body(..., example='123')) -> str:
+            return data
+
+        ep.add_method_route(probe, name=f'probe_{method_idx}')
+
+    return ep
+
+
+def registration_time(entrypoints_count: int, methods_count: int) -> float:
+    started_at = time.perf_counter()
+    for idx in range(entrypoints_count):
+        make_entrypoint(idx, methods_count)
+    return time.perf_counter() - started_at
+
+
+def test_callee_module():
+    ep = jsonrpc.Entrypoint('/api/v1/jsonrpc')
+    assert ep.callee_module == __name__
+
+
+def test_no_inspect_stack(monkeypatch):
+    def stack(*args, **kwargs):
+        raise AssertionError("inspect.stack() must not be called on Entrypoint construction")
+
+    monkeypatch.setattr(inspect, 'stack', stack)
+
+    ep = make_entrypoint(1, 3)
+    assert ep.callee_module == __name__
+
+
+@pytest.mark.parametrize('count', [5, 20])
+def test_registration_time_grows_linearly(count):
+    # warm up pydantic/fastapi internals
+    registration_time(2, 2)
+
+    small = registration_time(count, 3) / count
+    large = registration_time(count, 12) / count
+
+    # 4 times more methods per entrypoint must not cost much more than 4 times more time
+    assert large < small * 4 * 3
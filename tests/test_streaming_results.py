@@ -0,0 +1,280 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from typing import AsyncIterator
+
+import pytest
+from fastapi import Body, Depends
+from pydantic import BaseModel
+from starlette.testclient import TestClient
+
+import fastapi_jsonrpc as jsonrpc
+
+
+class Item(BaseModel):
+    idx: int
+    name: str
+
+
+class ExportError(jsonrpc.BaseError):
+    CODE = 5000
+    MESSAGE = "Export error"
+
+
+@pytest.fixture(params=[False, True])
+def asgi_fast_path(request):
+    return request.param
+
+
+@pytest.fixture
+def ep(ep_path, asgi_fast_path):
+    ep = jsonrpc.Entrypoint(ep_path, asgi_fast_path=asgi_fast_path, stream_chunk_size=50)
+
+    @ep.method(errors=[ExportError])
+    async def export(
+        count: int = Body(...),
+        fail_at: int = Body(None),
+    ) -> AsyncIterator[Item]:
+        for idx in range(count):
+            if idx == fail_at:
+                raise ExportError
+            yield {'idx': str(idx), 'name': f'item {idx}', 'extra': 'dropped'}
+
+    @ep.method()
+    async def broken() -> AsyncIterator[int]:
+        yield 1
+        raise RuntimeError('broken')
+
+    ep.add_websocket_entrypoint_route()
+    return ep
+
+
+def call(count, fail_at=None, request_id=1):
+    return {'id': request_id, 'jsonrpc': '2.0', 'method': 'export', 'params': {'count': count, 'fail_at': fail_at}}
+
+
+def items(count):
+    return [{'idx': idx, 'name': f'item {idx}'} for idx in range(count)]
+
+
+@pytest.mark.parametrize('count', [0, 1, 10])
+@pytest.mark.parametrize('path_postfix', ['', '/export'])
+def test_streaming(app_client, ep_path, count, path_postfix):
+    resp = app_client.post(ep_path + path_postfix, json=call(count))
+    # response is started with the first item
+    assert ('content-length' not in resp.headers) == bool(count)
+    assert resp.json() == {'id': 1, 'jsonrpc': '2.0', 'result': items(count)}
+
+
+def test_error_before_first_item(app_client, ep_path):
+    resp = app_client.post(ep_path, json=call(3, fail_at=0))
+    assert resp.json() == {'id': 1, 'jsonrpc': '2.0', 'error': {'code': 5000, 'message': 'Export error'}}
+
+
+def test_error_truncates_result(app_client, ep_path):
+    resp = app_client.post(ep_path, json=call(3, fail_at=2))
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(resp.text)
+    assert resp.text == '{"jsonrpc":"2.0","id":1,"result":[{"idx":0,"name":"item 0"},{"idx":1,"name":"item 1"}'
+
+
+@pytest.mark.parametrize('path_postfix', ['', '/count_up'])
+def test_within_context(ep, app_client, ep_path, path_postfix, asgi_fast_path):
+    events = []
+
+    @asynccontextmanager
+    async def middleware(ctx: jsonrpc.JsonRpcContext):
+        events.append('mw enter')
+        try:
+            yield
+        finally:
+            events.append(('mw exit', ctx.exception.__class__.__name__))
+
+    async def get_resource():
+        events.append('dep enter')
+        yield
+        events.append('dep exit')
+
+    ep = jsonrpc.Entrypoint(
+        ep_path, asgi_fast_path=asgi_fast_path, stream_chunk_size=1, middlewares=[middleware],
+    )
+
+    @ep.method(errors=[ExportError])
+    async def count_up(
+        count: int = Body(...),
+        fail_at: int = Body(None),
+        resource: None = Depends(get_resource),
+    ) -> AsyncIterator[int]:
+        for idx in range(count):
+            if idx == fail_at:
+                raise ExportError
+            ctx = jsonrpc.get_jsonrpc_context()
+            events.append((f'item {idx}', jsonrpc.get_jsonrpc_request_id(), ctx.method_route.name))
+            yield idx
+
+    app = jsonrpc.API()
+    app.bind_entrypoint(ep)
+    client = TestClient(app)
+
+    def count_up_call(count, fail_at=None):
+        return dict(call(count, fail_at), method='count_up')
+
+    resp = client.post(ep_path + path_postfix, json=count_up_call(2))
+    assert resp.json() == {'id': 1, 'jsonrpc': '2.0', 'result': [0, 1]}
+    assert events == [
+        'mw enter',
+        'dep enter',
+        ('item 0', 1, 'count_up'),
+        ('item 1', 1, 'count_up'),
+        ('mw exit', 'NoneType'),
+        'dep exit',
+    ]
+
+    events.clear()
+    resp = client.post(ep_path + path_postfix, json=count_up_call(3, fail_at=1), headers={
+        'Accept': 'application/x-ndjson',
+    })
+    assert [json.loads(line) for line in resp.text.splitlines()] == [
+        {'id': 1, 'jsonrpc': '2.0', 'result': 0},
+        {'id': 1, 'jsonrpc': '2.0', 'error': {'code': 5000, 'message': 'Export error'}},
+    ]
+    # error of iteration is seen by middleware
+    assert events == ['mw enter', 'dep enter', ('item 0', 1, 'count_up'), ('mw exit', 'ExportError'), 'dep exit']
+
+
+def test_unhandled_error(app_client, ep_path, assert_log_errors):
+    resp = app_client.post(
+        ep_path, json={'id': 1, 'jsonrpc': '2.0', 'method': 'broken'}, headers={'Accept': 'application/x-ndjson'},
+    )
+    assert [json.loads(line) for line in resp.text.splitlines()] == [
+        {'id': 1, 'jsonrpc': '2.0', 'result': 1},
+        {'id': 1, 'jsonrpc': '2.0', 'error': {'code': -32603, 'message': 'Internal error'}},
+    ]
+    assert_log_errors('broken', pytest.raises(RuntimeError))
+
+
+def test_ndjson(app_client, ep_path):
+    resp = app_client.post(ep_path, json=call(3), headers={'Accept': 'application/x-ndjson'})
+    assert resp.headers['content-type'] == 'application/x-ndjson'
+    assert [json.loads(line) for line in resp.text.splitlines()] == [
+        {'id': 1, 'jsonrpc': '2.0', 'result': item} for item in items(3)
+    ]
+
+
+def test_ndjson_error(app_client, ep_path):
+    resp = app_client.post(ep_path, json=call(3, fail_at=2), headers={'Accept': 'application/x-ndjson'})
+    assert [json.loads(line) for line in resp.text.splitlines()] == [
+        {'id': 1, 'jsonrpc': '2.0', 'result': item} for item in items(2)
+    ] + [
+        {'id': 1, 'jsonrpc': '2.0', 'error': {'code': 5000, 'message': 'Export error'}},
+    ]
+
+
+def test_batch_collected(json_request):
+    assert json_request([call(2, request_id=1), call(3, fail_at=1, request_id=2)]) == [
+        {'id': 1, 'jsonrpc': '2.0', 'result': items(2)},
+        {'id': 2, 'jsonrpc': '2.0', 'error': {'code': 5000, 'message': 'Export error'}},
+    ]
+
+
+def test_compressed(ep, app_client, ep_path):
+    ep.compression_threshold = 1000
+    resp = app_client.post(ep_path, json=call(10), headers={'Accept-Encoding': 'gzip'})
+    assert resp.headers['content-encoding'] == 'gzip'
+    assert resp.json() == {'id': 1, 'jsonrpc': '2.0', 'result': items(10)}
+
+
+@pytest.mark.parametrize('accept_encoding', ['gzip', 'identity'])
+def test_compression_vary(ep, app_client, ep_path, accept_encoding):
+    ep.compression_threshold = 1000
+    resp = app_client.post(ep_path, json=call(1), headers={'Accept-Encoding': accept_encoding})
+    assert resp.headers['vary'] == 'Accept-Encoding'
+
+
+def test_websocket_collected(app_client, ep_path):
+    with app_client.websocket_connect(ep_path) as websocket:
+        websocket.send_json(call(2))
+        assert websocket.receive_json() == {'id': 1, 'jsonrpc': '2.0', 'result': items(2)}
+
+
+def test_openapi(app_client):
+    schemas = app_client.get('/openapi.json').json()['components']['schemas']
+    assert schemas['_Response_export_']['properties']['result'] == {
+        'title': 'Result',
+        'type': 'array',
+        'items': {'$ref': '#/components/schemas/Item'},
+    }
+
+
+def run_stream(ep, events, send_timeout=None):
+    async def produce():
+        try:
+            for idx in range(10):
+                yield {'idx': idx, 'name': f'item {idx}'}
+        finally:
+            events.append('closed')
+
+    async def call(result_stream):
+        ctx = SimpleNamespace(request=SimpleNamespace(id=1))
+        result = jsonrpc.StreamingResult(ep.method_routes['export'], produce())
+        return {'jsonrpc': '2.0', 'result': await result_stream.send(ctx, result)}
+
+    async def run():
+        result_stream = jsonrpc.ResultStream(send_timeout=send_timeout)
+        resp = await result_stream.run(await ep.get_scheduler(), call)
+        assert resp == {'jsonrpc': '2.0', 'id': 1, 'result': result_stream}
+        return result_stream
+
+    return run()
+
+
+def test_client_gone(ep):
+    events = []
+
+    async def main():
+        result_stream = await run_stream(ep, events)
+        iterator = result_stream.__aiter__()
+        assert await iterator.__anext__() == items(1)[0]
+        await iterator.aclose()
+        assert result_stream.job.closed
+        assert result_stream.finished.done()
+        await ep.shutdown()
+
+    asyncio.run(main())
+    assert events == ['closed']
+
+
+def test_response_never_iterated(ep):
+    events = []
+
+    async def main():
+        result_stream = await run_stream(ep, events)
+        response = jsonrpc.ResultStreamResponse(result_stream, result_stream.__aiter__())
+
+        async def receive():
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            await asyncio.sleep(1)
+
+        # Client is gone before the first item is sent
+        await response({'type': 'http'}, receive, send)
+        assert result_stream.job.closed
+        assert result_stream.finished.done()
+        await ep.shutdown()
+
+    asyncio.run(main())
+    assert events == ['closed']
+
+
+def test_send_timeout(ep):
+    events = []
+
+    async def main():
+        result_stream = await run_stream(ep, events, send_timeout=0.01)
+        await asyncio.wait_for(result_stream.finished, 1)
+        await ep.shutdown()
+
+    asyncio.run(main())
+    assert events == ['closed']
@@ -0,0 +1,259 @@
+import asyncio
+import json
+from contextlib import AsyncExitStack
+from types import SimpleNamespace
+from typing import AsyncIterator
+
+import pytest
+from fastapi import Body, Depends
+from pydantic import BaseModel
+
+import fastapi_jsonrpc as jsonrpc
+
+
+class TickError(jsonrpc.BaseError):
+    CODE = 5000
+    MESSAGE = "Tick error"
+
+
+class Tick(BaseModel):
+    idx: int
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def ep(ep_path, calls):
+    async def get_session():
+        calls.append('session enter')
+        yield 'session'
+        calls.append('session exit')
+
+    ep = jsonrpc.Entrypoint(ep_path)
+
+    @ep.subscription()
+    async def ticks(
+        count: int = Body(...),
+        session: str = Depends(get_session),
+    ) -> AsyncIterator[int]:
+        for idx in range(count):
+            calls.append(f'tick {session}')
+            yield idx
+
+    @ep.subscription()
+    async def tick_models() -> AsyncIterator[Tick]:
+        yield {'idx': '1', 'extra': 'dropped'}
+
+    @ep.subscription()
+    async def forever() -> AsyncIterator[int]:
+        idx = 0
+        try:
+            while True:
+                yield idx
+                idx += 1
+                await asyncio.sleep(0.01)
+        finally:
+            calls.append('forever exit')
+
+    @ep.method()
+    async def scheduler_jobs() -> int:
+        return ep.drain_metrics()['scheduler_jobs']
+
+    @ep.method()
+    async def start_drain() -> bool:
+        asyncio.ensure_future(ep.drain(1))
+        return True
+
+    @ep.subscription(errors=[TickError])
+    async def failing() -> AsyncIterator[int]:
+        yield 1
+        raise TickError
+
+    ep.add_websocket_entrypoint_route()
+    return ep
+
+
+def call(method, params=None, request_id=0):
+    return {'id': request_id, 'jsonrpc': '2.0', 'method': method, 'params': params or {}}
+
+
+def test_subscription(app_client, ep_path, calls):
+    with app_client.websocket_connect(ep_path) as websocket:
+        websocket.send_json(call('ticks', {'count': 3}, request_id=1))
+        resp = websocket.receive_json()
+        subscription_id = resp['result']
+        assert resp == {'id': 1, 'jsonrpc': '2.0', 'result': subscription_id}
+        for idx in range(3):
+            assert websocket.receive_json() == {
+                'jsonrpc': '2.0',
+                'method': 'ticks',
+                'params': {'subscription': subscription_id, 'result': idx},
+            }
+    assert calls == ['session enter', 'tick session', 'tick session', 'tick session', 'session exit']
+
+
+def test_items_validated(app_client, ep_path):
+    with app_client.websocket_connect(ep_path) as websocket:
+        websocket.send_json(call('tick_models'))
+        subscription_id = websocket.receive_json()['result']
+        assert websocket.receive_json()['params'] == {'subscription': subscription_id, 'result': {'idx': 1}}
+
+
+def receive_resp(websocket):
+    """Skip notifications of subscriptions"""
+    while True:
+        resp = websocket.receive_json()
+        if 'id' in resp:
+            return resp
+
+
+def test_unsubscribe(app_client, ep_path):
+    with app_client.websocket_connect(ep_path) as websocket:
+        websocket.send_json(call('forever', request_id=1))
+        subscription_id = websocket.receive_json()['result']
+        assert websocket.receive_json()['params'] == {'subscription': subscription_id, 'result': 0}
+
+        websocket.send_json(call('rpc.unsubscribe', {'subscription': subscription_id}, request_id=2))
+        while True:
+            resp = websocket.receive_json()
+            if 'id' in resp:
+                break
+            assert resp['params']['subscription'] == subscription_id
+        assert resp == {'id': 2, 'jsonrpc': '2.0', 'result': True}
+
+        websocket.send_json(call('rpc.unsubscribe', {'subscription': subscription_id}, request_id=3))
+        assert websocket.receive_json() == {'id': 3, 'jsonrpc': '2.0', 'result': False}
+
+
+def test_error(app_client, ep_path):
+    with app_client.websocket_connect(ep_path) as websocket:
+        websocket.send_json(call('failing'))
+        subscription_id = websocket.receive_json()['result']
+        assert websocket.receive_json()['params'] == {'subscription': subscription_id, 'result': 1}
+        assert websocket.receive_json()['params'] == {
+            'subscription': subscription_id,
+            'error': {'code': 5000, 'message': 'Tick error'},
+        }
+
+
+@pytest.mark.parametrize('method', ['ticks', 'rpc.unsubscribe'])
+def test_http_not_supported(json_request, method):
+    resp = json_request(call(method, {'count': 1, 'subscription': 'unknown'}))
+    assert resp == {
+        'id': 0,
+        'jsonrpc': '2.0',
+        'error': {
+            'code': -32600,
+            'message': 'Invalid Request',
+            'data': {'errors': [
+                {'loc': [], 'type': 'value_error.subscription', 'msg': 'subscriptions require persistent connection'},
+            ]},
+        },
+    }
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.close_code = None
+
+    async def send_text(self, data):
+        self.sent.append(json.loads(data)['params']['result'])
+
+    async def close(self, code):
+        self.close_code = code
+
+
+@pytest.mark.parametrize('policy, sent, dropped_count, close_code', [
+    ('drop', [0, 1], 3, None),
+    ('coalesce', [0, 4], 0, None),
+    ('disconnect', [], 0, 1008),
+])
+def test_slow_consumer(policy, sent, dropped_count, close_code):
+    websocket = FakeWebSocket()
+
+    async def run():
+        connection = jsonrpc.WebSocketConnection(
+            websocket, jsonrpc.JSONResponse(None),
+            max_buffer=2, slow_consumer_policy=policy,
+        )
+        subscription = connection.subscribe(SimpleNamespace(name='ticks'), None, AsyncExitStack())
+        # sender has no chance to run until all items are pushed
+        for idx in range(5):
+            connection.push(subscription, {'subscription': subscription.id, 'result': idx})
+        await asyncio.sleep(0.01)
+        return connection
+
+    connection = asyncio.run(run())
+    assert websocket.sent == sent
+    assert connection.dropped_count == dropped_count
+    assert websocket.close_code == close_code
+
+
+def test_notification_rejected(app_client, ep_path):
+    with app_client.websocket_connect(ep_path) as websocket:
+        websocket.send_json({'jsonrpc': '2.0', 'method': 'forever', 'params': {}})
+        assert websocket.receive_json() == {
+            'id': None,
+            'jsonrpc': '2.0',
+            'error': {
+                'code': -32600,
+                'message': 'Invalid Request',
+                'data': {'errors': [
+                    {'loc': ['id'], 'type': 'value_error.subscription', 'msg': 'subscription requires request id'},
+                ]},
+            },
+        }
+
+
+def test_max_subscriptions(ep, app_client, ep_path, calls):
+    ep.websocket_routes[0].max_subscriptions = 1
+    with app_client.websocket_connect(ep_path) as websocket:
+        websocket.send_json(call('forever', request_id=1))
+        subscription_id = receive_resp(websocket)['result']
+
+        websocket.send_json(call('ticks', {'count': 1}, request_id=2))
+        assert receive_resp(websocket) == {
+            'id': 2,
+            'jsonrpc': '2.0',
+            'error': {
+                'code': -32600,
+                'message': 'Invalid Request',
+                'data': {'errors': [
+                    {'loc': [], 'type': 'value_error.subscription', 'msg': 'connection has 1 subscriptions'},
+                ]},
+            },
+        }
+        # Dependencies of refused subscription are closed
+        assert calls == ['session enter', 'session exit']
+
+        websocket.send_json(call('rpc.unsubscribe', {'subscription': subscription_id}, request_id=3))
+        assert receive_resp(websocket)['result'] is True
+        websocket.send_json(call('ticks', {'count': 1}, request_id=4))
+        assert isinstance(receive_resp(websocket)['result'], str)
+
+
+def test_runs_on_scheduler(app_client, ep_path):
+    with app_client.websocket_connect(ep_path) as websocket:
+        websocket.send_json(call('scheduler_jobs', request_id=1))
+        # The call itself is a job
+        assert receive_resp(websocket)['result'] == 1
+        websocket.send_json(call('forever', request_id=2))
+        receive_resp(websocket)
+        websocket.send_json(call('scheduler_jobs', request_id=3))
+        assert receive_resp(websocket)['result'] == 2
+
+
+def test_drain_ends_subscriptions(app_client, ep_path, calls):
+    with app_client.websocket_connect(ep_path) as websocket:
+        websocket.send_json(call('forever', request_id=1))
+        receive_resp(websocket)
+        websocket.send_json(call('start_drain', request_id=2))
+        assert receive_resp(websocket)['result'] is True
+        websocket.send_json(call('scheduler_jobs', request_id=3))
+        # Draining entrypoint refuses calls
+        assert receive_resp(websocket)['error']['code'] == jsonrpc.ServerBusy.CODE
+    assert calls == ['forever exit']
@@ -0,0 +1,180 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import Body, Depends, Header
+from starlette.websockets import WebSocket
+
+import fastapi_jsonrpc as jsonrpc
+
+
+@pytest.fixture
+def calls():
+    return []
+
+
+@pytest.fixture
+def ep(ep_path, calls):
+    async def get_principal(x_auth: str = Header('guest')) -> str:
+        calls.append('principal')
+        return x_auth
+
+    async def get_session():
+        calls.append('session enter')
+        yield 'session'
+        calls.append('session exit')
+
+    ep = jsonrpc.Entrypoint(ep_path, dependencies=[Depends(get_principal)])
+    events = {}
+    running = []
+
+    @ep.method()
+    def whoami(
+        principal: str = Depends(get_principal),
+        session: str = Depends(get_session),
+    ) -> str:
+        return f'{principal}:{session}'
+
+    @ep.method()
+    async def wait(
+        name: str = Body(...),
+    ) -> str:
+        await asyncio.wait_for(events.setdefault(name, asyncio.Event()).wait(), timeout=1)
+        return name
+
+    @ep.method()
+    async def release(
+        name: str = Body(...),
+    ) -> str:
+        events.setdefault(name, asyncio.Event()).set()
+        return name
+
+    @ep.method()
+    async def work() -> int:
+        running.append(None)
+        concurrency = len(running)
+        await asyncio.sleep(0.02)
+        running.pop()
+        return concurrency
+
+    ep.add_websocket_entrypoint_route()
+    return ep
+
+
+def call(method, params=None, request_id=0):
+    req = {'jsonrpc': '2.0', 'method': method, 'params': params or {}}
+    if request_id is not None:
+        req['id'] = request_id
+    return req
+
+
+def test_call(app_client, ep_path, calls):
+    with app_client.websocket_connect(ep_path, headers={'X-Auth': 'user'}) as websocket:
+        websocket.send_json(call('whoami', request_id=1))
+        assert websocket.receive_json() == {'id': 1, 'jsonrpc': '2.0', 'result': 'user:session'}
+        websocket.send_json([call('whoami', request_id=2), call('whoami', request_id=None)])
+        assert websocket.receive_json() == [{'id': 2, 'jsonrpc': '2.0', 'result': 'user:session'}]
+    # shared dependencies solved once per connection, own dependencies closed after each message
+    assert calls == [
+        'principal',
+        'session enter', 'session exit',
+        'session enter', 'session enter', 'session exit', 'session exit',
+    ]
+
+
+def test_errors(app_client, ep_path):
+    with app_client.websocket_connect(ep_path) as websocket:
+        websocket.send_text('not json')
+        assert websocket.receive_json() == {
+            'id': None, 'jsonrpc': '2.0', 'error': {'code': -32700, 'message': 'Parse error'},
+        }
+        websocket.send_json(call('unknown'))
+        assert websocket.receive_json() == {
+            'id': 0, 'jsonrpc': '2.0', 'error': {'code': -32601, 'message': 'Method not found'},
+        }
+
+
+def test_binary_message(app_client, ep_path):
+    with app_client.websocket_connect(ep_path) as websocket:
+        websocket.send_bytes(json.dumps(call('whoami')).encode())
+        assert json.loads(websocket.receive_bytes()) == {'id': 0, 'jsonrpc': '2.0', 'result': 'guest:session'}
+
+
+def test_concurrent_calls(app_client, ep_path):
+    with app_client.websocket_connect(ep_path) as websocket:
+        websocket.send_json(call('wait', {'name': 'first'}, request_id=1))
+        websocket.send_json(call('release', {'name': 'first'}, request_id=2))
+        # responses are sent as soon as they are ready
+        assert websocket.receive_json() == {'id': 2, 'jsonrpc': '2.0', 'result': 'first'}
+        assert websocket.receive_json() == {'id': 1, 'jsonrpc': '2.0', 'result': 'first'}
+
+
+def test_max_in_flight(ep, app_client, ep_path):
+    ep.websocket_routes[0].max_in_flight = 2
+    with app_client.websocket_connect(ep_path) as websocket:
+        for idx in range(5):
+            websocket.send_json(call('work', request_id=idx))
+        results = [websocket.receive_json()['result'] for _ in range(5)]
+    assert max(results) == 2
+
+
+def test_openapi_unchanged(app_client):
+    paths = app_client.get('/openapi.json').json()['paths']
+    assert all(list(operations) == ['post'] for operations in paths.values())
+
+
+def run_websocket(ep, on_receive):
+    """Handle WebSocket connection without client, on_receive(count) returns received message"""
+    received = []
+
+    async def receive():
+        if not received:
+            received.append({'type': 'websocket.connect'})
+            return received[-1]
+        received.append(await on_receive(len(received)))
+        return received[-1]
+
+    async def send(message):
+        pass
+
+    websocket = WebSocket({
+        'type': 'websocket',
+        'path': '/',
+        'headers': [],
+        'query_string': b'',
+        'server': ('testserver', 80),
+        'client': ('testclient', 50000),
+    }, receive, send)
+
+    async def main():
+        await asyncio.wait_for(ep.websocket_routes[0].handle_websocket(websocket), timeout=1)
+
+    asyncio.run(main())
+
+
+def message(method, params=None, request_id=0):
+    return {'type': 'websocket.receive', 'text': json.dumps(call(method, params, request_id=request_id))}
+
+
+def test_spawn_failed(ep):
+    async def on_receive(count):
+        # Scheduler is closed on shutdown
+        await ep.scheduler.close()
+        return message('work')
+
+    with pytest.raises(RuntimeError):
+        run_websocket(ep, on_receive)
+
+
+def test_pending_job_closed(ep):
+    ep.scheduler_kwargs = {'limit': 1}
+
+    async def on_receive(count):
+        if count < 3:
+            return message('work', request_id=count)
+        # Pending job is closed without execution
+        assert ep.scheduler.pending_count == 1
+        await ep.scheduler.close()
+        return {'type': 'websocket.disconnect'}
+
+    run_websocket(ep, on_receive)